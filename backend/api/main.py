@@ -1,10 +1,22 @@
-from fastapi import FastAPI, HTTPException, status
+from fastapi import Depends, FastAPI, Header, HTTPException, Query, Request, Response, status
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel
 import uvicorn
+import asyncio
+import functools
 import sys
+import threading
 import os
+import base64
+import csv
+import io
 import json
-from datetime import datetime
+from datetime import date, datetime
+from decimal import Decimal
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from typing import List, Optional
 
 # 添加backend目录到Python路径
 # main.py在backend/api/目录下，需要添加backend目录本身到路径
@@ -12,13 +24,150 @@ backend_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
 sys.path.insert(0, backend_dir)
 
 from db.db_connection import DatabaseConnection
-from calculation.main_calculator import MainCalculator
+from db.db_pool import DatabasePool
+from db.response_cache import ResponseCache
+from db.write_events import add_write_listener, to_datetime
+from db.time_series_query import build_time_series_query
+from db import time_keys
+from db.columnar_encoding import compress, encode_json, to_columnar
+from db.rollups import ROLLUP_METRICS, ROLLUP_TABLES
+from calculation.job_queue import CalculationJobQueue
+from calculation.event_broadcaster import EventBroadcaster
+
+# 加载配置
+# 使用相对于backend目录的路径
+CONFIG_FILE = os.path.join(backend_dir, "config", "config.json")
+with open(CONFIG_FILE, 'r', encoding='utf-8') as f:
+    config = json.load(f)
+# 天数和小时按配置的基准日期换算为真实时间
+time_keys.configure(config)
+
+# 计算器在后台预热线程中创建（导入numpy/pandas/pyfluids并连接数据库），完成前为None
+calculator = None
+DEFAULT_HEAT_EXCHANGER_ID = None
+# 预热状态，供就绪探针查询
+warmup_state = {
+    "ready": False,
+    "attempts": 0,
+    "error": None,
+    "started_at": None,
+    "ready_at": None
+}
+warmup_stop_event = threading.Event()
+
+def warm_up():
+    """后台预热：创建计算器，数据库暂时不可用时按间隔重试，不影响进程启动"""
+    global calculator, DEFAULT_HEAT_EXCHANGER_ID
+    from calculation.main_calculator import MainCalculator
+    
+    retry_seconds = config.get('warmup_retry_seconds', 5)
+    warmup_state["started_at"] = datetime.now().isoformat()
+    while not warmup_stop_event.is_set():
+        warmup_state["attempts"] += 1
+        try:
+            new_calculator = MainCalculator(CONFIG_FILE)
+            if new_calculator.db_conn.test_db is None or new_calculator.db_conn.prod_db is None:
+                new_calculator.close()
+                raise ConnectionError("数据库连接失败")
+            new_calculator.set_hour_processed_callback(publish_hour_processed)
+            new_calculator.set_model_updated_callback(publish_model_updated)
+            DEFAULT_HEAT_EXCHANGER_ID = new_calculator.heat_exchanger.get('id', 1)
+            calculator = new_calculator
+            warmup_state.update(ready=True, error=None, ready_at=datetime.now().isoformat())
+            print(f"API预热完成，共尝试{warmup_state['attempts']}次")
+            return
+        except Exception as e:
+            warmup_state["error"] = str(e)
+            print(f"API预热失败（第{warmup_state['attempts']}次），{retry_seconds}秒后重试: {e}")
+            warmup_stop_event.wait(retry_seconds)
+
+def require_ready():
+    """依赖项：计算器未就绪时返回503"""
+    if calculator is None:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail={
+                "code": "SERVICE_WARMING_UP",
+                "type": "ServiceUnavailable",
+                "message": "服务正在预热，请稍后重试",
+                "timestamp": datetime.now().isoformat()
+            }
+        )
+
+# API查询使用独立的连接池和线程池，避免阻塞的数据库调用占用事件循环（连接池在首次查询时创建）
+db_pool = DatabasePool(config, config.get('api_db_pool_size', 8))
+# 查询线程数与连接数一致，线程借用连接时不会等待
+db_executor = ThreadPoolExecutor(max_workers=db_pool.pool_size, thread_name_prefix="api-db")
+# CPU密集的计算（如假设工况预测）使用单独的小线程池，不占用查询线程
+compute_executor = ThreadPoolExecutor(max_workers=max(1, config.get('api_compute_workers') or 2), thread_name_prefix="api-compute")
+# 流式查询每次使用独立连接，这里只提供连接配置
+stream_db_conn = DatabaseConnection(config)
+
+# 新处理小时和模型更新通过SSE推送给客户端
+event_broadcaster = EventBroadcaster(
+    config.get('sse_client_queue_size', 100),
+    config.get('sse_history_size', 500),
+    config.get('sse_heartbeat_seconds', 15)
+)
+
+def publish_hour_processed(day, hour, hour_results):
+    """推送某小时提交后的k_management和性能参数摘要"""
+    k_management_data = hour_results['k_management_data']
+    performance_data = hour_results['performance_data']
+    rows = k_management_data or performance_data
+    heat_exchanger_id = rows[0]['heat_exchanger_id'] if rows else None
+    event_broadcaster.publish('hour_processed', {
+        'heat_exchanger_id': heat_exchanger_id,
+        'day': day,
+        'hour': hour,
+        'timestamp': hour_results['hour_start'],
+        'k_management': [
+            {key: row.get(key) for key in ('points', 'side', 'K_LMTD', 'K_predicted', 'K_actual')}
+            for row in k_management_data
+        ],
+        'performance': [
+            {key: row.get(key) for key in ('points', 'side', 'K', 'alpha_i', 'alpha_o', 'heat_duty', 'lmtd')}
+            for row in performance_data
+        ]
+    }, heat_exchanger_id)
+
+def publish_model_updated(info):
+    """推送阶段1训练、阶段2优化或误差超限重新训练后的模型参数"""
+    event_broadcaster.publish('model_updated', info, info.get('heat_exchanger_id'))
+
+def create_job_calculator(heat_exchanger_id):
+    """为任务队列创建计算器，默认换热器复用全局计算器"""
+    if heat_exchanger_id == DEFAULT_HEAT_EXCHANGER_ID:
+        return calculator
+    from calculation.main_calculator import MainCalculator
+    job_calculator = MainCalculator(CONFIG_FILE, heat_exchanger_id=heat_exchanger_id)
+    job_calculator.set_hour_processed_callback(publish_hour_processed)
+    job_calculator.set_model_updated_callback(publish_model_updated)
+    return job_calculator
+
+# 数据处理和性能计算作为后台任务执行，每个换热器一个工作线程、一个计算器
+job_queue = CalculationJobQueue(create_job_calculator, config.get('job_history_size', 1000))
+
+@asynccontextmanager
+async def lifespan(app):
+    """应用生命周期：启动时只绑定事件循环并启动后台预热，立即开始接受请求"""
+    # SSE事件由计算线程发布，需要在事件循环中分发
+    event_broadcaster.bind_loop(asyncio.get_running_loop())
+    warmup_thread = threading.Thread(target=warm_up, name="api-warmup", daemon=True)
+    warmup_thread.start()
+    yield
+    warmup_stop_event.set()
+    db_executor.shutdown(wait=False)
+    compute_executor.shutdown(wait=False)
+    if calculator is not None:
+        calculator.close()
 
 # 创建FastAPI应用
 app = FastAPI(
     title="Heat Exchanger Monitor API",
     description="换热器性能监测API",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # 配置CORS
@@ -30,14 +179,504 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# 加载配置
-# 使用相对于backend目录的路径
-CONFIG_FILE = os.path.join(backend_dir, "config", "config.json")
-with open(CONFIG_FILE, 'r', encoding='utf-8') as f:
-    config = json.load(f)
+async def run_in_executor(executor, func, *args):
+    """在指定线程池中执行阻塞调用并等待结果"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(executor, functools.partial(func, *args))
+
+async def resolve_job_heat_exchanger_id(heat_exchanger_id):
+    """返回任务使用的换热器ID，指定的换热器不存在时抛出ValueError，不登记任务"""
+    if heat_exchanger_id is None or heat_exchanger_id == DEFAULT_HEAT_EXCHANGER_ID:
+        return DEFAULT_HEAT_EXCHANGER_ID
+    rows = await run_in_executor(
+        db_executor, db_pool.fetch_all, "SELECT id FROM heat_exchanger WHERE id = %s", [heat_exchanger_id]
+    )
+    if rows is None:
+        raise RuntimeError("读取换热器信息失败")
+    if not rows:
+        raise ValueError(f"换热器{heat_exchanger_id}不存在")
+    return heat_exchanger_id
+
+# 查询接口的响应缓存，本进程内的数据写入会精确淘汰受影响的条目
+response_cache = ResponseCache(config.get('response_cache_size', 512), config.get('response_cache_ttl', 30))
+add_write_listener(response_cache.invalidate)
+
+# 查询接口支持的输出格式：json/columnar为一次性返回，ndjson/csv为流式返回
+OUTPUT_FORMATS = ("json", "columnar", "ndjson", "csv")
+STREAM_MEDIA_TYPES = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv; charset=utf-8"
+}
+# 流式输出时每次从数据库读取的行数
+STREAM_CHUNK_SIZE = config.get('stream_chunk_size', 1000)
+
+def json_default(value):
+    """序列化数据库返回的日期和小数类型"""
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return float(value)
+    return str(value)
+
+def columnar_response(request, body, headers=None):
+    """以列式JSON返回查询结果
+    
+    data中的行字典转换为{columns, arrays}，列名只出现一次；优先用orjson序列化，
+    并按Accept-Encoding进行br或gzip压缩。
+    
+    参数:
+        request: 当前请求，用于读取Accept-Encoding
+        body: 响应内容，data为行字典列表或已转换的列式结构
+        headers: 额外的响应头（如ETag）
+    
+    返回值: Response
+    """
+    if isinstance(body.get("data"), list):
+        body = dict(body, data=to_columnar(body["data"]))
+    content, content_encoding = compress(encode_json(body, json_default), request.headers.get("accept-encoding"))
+    response_headers = dict(headers or {})
+    response_headers["Vary"] = "Accept-Encoding"
+    if content_encoding:
+        response_headers["Content-Encoding"] = content_encoding
+    return Response(content=content, media_type="application/json", headers=response_headers)
+
+# 分页查询每页的最大行数
+PAGE_SIZE_MAX = config.get('page_size_max', 5000)
+
+def encode_page_cursor(row):
+    """把一页最后一行的(timestamp, points, side)编码为不透明游标"""
+    key = [str(row['timestamp']), row['points'], row['side']]
+    return base64.urlsafe_b64encode(json.dumps(key).encode('utf-8')).decode('ascii')
+
+def decode_page_cursor(cursor):
+    """解析分页游标，返回(timestamp, points, side)"""
+    try:
+        timestamp, points, side = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+        datetime.strptime(timestamp, "%Y-%m-%d %H:%M:%S")
+        return timestamp, int(points), str(side)
+    except Exception:
+        raise ValueError("cursor参数无效")
+
+def paginate_query(query, params, limit, cursor):
+    """为查询追加键集分页条件
+    
+    按(timestamp, points, side)排序，从游标之后继续读取，配合唯一索引
+    (heat_exchanger_id, timestamp, points, side)每页都是一次索引范围扫描，不使用OFFSET。
+    
+    参数:
+        query: 不含ORDER BY的SQL查询语句
+        params: 查询参数
+        limit: 每页行数，为None时使用PAGE_SIZE_MAX，超过上限时按上限处理
+        cursor: 上一页返回的next_cursor，为None时从第一行开始
+    
+    返回值: (分页后的查询语句, 查询参数, 每页行数)
+    """
+    if limit is not None and limit < 1:
+        raise ValueError("limit参数必须大于0")
+    page_size = min(limit or PAGE_SIZE_MAX, PAGE_SIZE_MAX)
+    params = list(params)
+    if cursor:
+        timestamp, points, side = decode_page_cursor(cursor)
+        # MySQL不对行构造器的不等比较做范围扫描，另加timestamp >= %s作为索引的起点，
+        # 行比较只排除同一时间戳中已返回的行
+        query += " AND timestamp >= %s AND (timestamp, points, side) > (%s, %s, %s)"
+        params.extend([timestamp, timestamp, points, side])
+    # 多取一行用于判断是否还有下一页
+    query += " ORDER BY timestamp, points, side LIMIT %s"
+    params.append(page_size + 1)
+    return query, params, page_size
+
+def split_page(result, page_size):
+    """截取一页结果并生成下一页游标，page_size为None时表示未分页"""
+    if page_size is None or len(result) <= page_size:
+        return result, None
+    result = result[:page_size]
+    return result, encode_page_cursor(result[-1])
+
+def run_query(query, params, overlay_table=None, page_size=None):
+    """在查询线程中用连接池的连接执行查询
+    
+    参数:
+        query: SQL查询语句
+        params: 查询参数
+        overlay_table: 需要叠加待刷新K_predicted的表名，为None时不叠加
+        page_size: 分页时的每页行数，为None时不分页
+    
+    返回值: (结果列表, 下一页游标)，查询失败时返回None
+    """
+    with db_pool.connection() as db_conn:
+        if not db_conn.execute_query(db_conn.prod_cursor, query, params):
+            return None
+        result = db_conn.fetch_all(db_conn.prod_cursor)
+        result, next_cursor = split_page(result, page_size)
+        if overlay_table:
+            from db.data_loader import DataLoader
+            # 对仍在待刷新区间内的记录即时计算K_predicted
+            result = calculator.k_materializer.apply_stale_overlay(result, DataLoader(db_conn), overlay_table)
+        return result, next_cursor
 
-# 初始化计算器
-calculator = MainCalculator(CONFIG_FILE)
+def has_stale_ranges(heat_exchanger_id, start_time, end_time):
+    """时间范围内是否有尚未物化的K_predicted待刷新区间"""
+    from db.data_loader import DataLoader
+    with db_pool.connection() as db_conn:
+        return bool(DataLoader(db_conn, heat_exchanger_id).get_pending_k_predicted_ranges(
+            *time_keys.closed_bounds((start_time, end_time))
+        ))
+
+def overlay_row_chunks(row_chunks, table):
+    """对流式读取的每块结果叠加待刷新区间的K_predicted，叠加查询使用连接池中的连接"""
+    from db.data_loader import DataLoader
+    for rows in row_chunks:
+        with db_pool.connection() as db_conn:
+            yield calculator.k_materializer.apply_stale_overlay(rows, DataLoader(db_conn), table)
+
+async def cached_query(request, response, cache_key, table, heat_exchanger_id, start_time, end_time,
+                       query, params, overlay_table=None, page_size=None, output_format="json"):
+    """通过响应缓存执行查询
+    
+    参数:
+        request, response: 当前请求和响应，用于If-None-Match和ETag
+        cache_key: 缓存键（接口名和全部查询参数，含输出格式）
+        table: 查询的表名
+        heat_exchanger_id: 查询的换热器ID
+        start_time, end_time: 查询覆盖的时间范围，为None表示不限时间
+        query, params, overlay_table, page_size: 同run_query
+        output_format: 'json' 或 'columnar'，columnar时缓存列式结构并返回压缩后的响应
+    
+    返回值: 响应内容；客户端缓存仍有效时返回304响应；查询失败时返回None
+    """
+    entry = response_cache.get(cache_key)
+    if entry is None:
+        generation = response_cache.generation
+        page = await run_in_executor(db_executor, run_query, query, params, overlay_table, page_size)
+        if page is None:
+            return None
+        result, next_cursor = page
+        body = {
+            "status": "success",
+            "count": len(result),
+            "data": to_columnar(result) if output_format == "columnar" else result
+        }
+        if page_size is not None:
+            body["next_cursor"] = next_cursor
+        entry = response_cache.put(
+            cache_key, body, table, heat_exchanger_id,
+            to_datetime(start_time) if start_time else None,
+            to_datetime(end_time) if end_time else None,
+            generation, json_default
+        )
+    
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match:
+        client_etags = [tag.strip() for tag in if_none_match.split(",")]
+        if "*" in client_etags or entry['etag'] in client_etags:
+            return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": entry['etag']})
+    if output_format == "columnar":
+        return columnar_response(request, entry['body'], {"ETag": entry['etag']})
+    response.headers["ETag"] = entry['etag']
+    return entry['body']
+
+# 趋势接口允许的指标列和聚合粒度
+TREND_METRICS = ("K", "alpha_i", "alpha_o", "heat_duty", "effectiveness", "lmtd")
+# 由模型预测、模型更新后需要刷新的指标
+STALE_METRICS = ("K", "alpha_i")
+TREND_BUCKETS = {
+    "hour": "TIMESTAMP(DATE(timestamp), MAKETIME(hour_of_day, 0, 0))",
+    "day": "DATE(timestamp)",
+    # 按周聚合时以第1天为每周的起点，{base_date}在查询时替换
+    "week": "DATE_ADD('{base_date}', INTERVAL FLOOR(DATEDIFF(timestamp, '{base_date}') / 7) * 7 DAY)"
+}
+# LTTB模式下每条曲线的最大点数
+TREND_MAX_POINTS = config.get('trend_max_points', 2000)
+
+def build_trend(heat_exchanger_id, start_time, end_time, metric, mode, bucket, target_points, points=None, side=None):
+    """在查询线程中计算性能指标趋势
+    
+    参数:
+        heat_exchanger_id: 换热器ID
+        start_time, end_time: 时间范围（半开区间[start_time, end_time)）
+        metric: 指标列名，取值见TREND_METRICS
+        mode: 'aggregate'按bucket聚合为min/mean/max，'lttb'按LTTB降采样到target_points个点
+        bucket: 聚合粒度，取值见TREND_BUCKETS
+        target_points: LTTB模式下每条曲线的目标点数
+        points: 测量点列表，为None时不过滤
+        side: 侧标识，为None时不过滤
+    
+    返回值: (按(points, side)分组的列式曲线列表, 尚未物化的待刷新区间列表)，查询失败时返回None
+    """
+    # 只读接口不物化待刷新区间：原始数据在读取时叠加当前模型的结果，聚合结果标注仍待刷新的区间
+    stale_ranges = []
+    if metric in STALE_METRICS:
+        from db.data_loader import DataLoader
+        with db_pool.connection() as db_conn:
+            stale_ranges = DataLoader(db_conn, heat_exchanger_id).get_pending_k_predicted_ranges(
+                *time_keys.closed_bounds((start_time, end_time))
+            )
+        if stale_ranges and mode == "aggregate":
+            # 通知后台线程尽快物化，之后的请求读到刷新后的汇总
+            calculator.k_materializer.notify()
+    
+    where = "heat_exchanger_id = %s AND timestamp >= %s AND timestamp < %s"
+    params = [heat_exchanger_id, start_time, end_time]
+    if points:
+        where += f" AND points IN ({', '.join(['%s'] * len(points))})"
+        params.extend(points)
+    if side:
+        where += " AND side = %s"
+        params.append(side)
+    
+    import numpy as np
+    from calculation.downsampling import lttb_indices
+    base_date = f"{time_keys.get_base_date():%Y-%m-%d}"
+    
+    rows = None
+    if mode == "aggregate" and metric in ROLLUP_METRICS:
+        # 从汇总表读取：小时/日粒度直接读取对应汇总行，周粒度由日汇总按样本数加权合并
+        rollup_table = ROLLUP_TABLES["hour" if bucket == "hour" else "day"]
+        if bucket == "week":
+            bucket_expr = TREND_BUCKETS["week"].replace("timestamp", "bucket_start").format(base_date=base_date)
+        else:
+            bucket_expr = "bucket_start"
+        query = f"""
+        SELECT points, side, {bucket_expr} AS bucket_time,
+               MIN(`{metric}_min`) AS min_value,
+               SUM(`{metric}_mean` * `{metric}_count`) / NULLIF(SUM(`{metric}_count`), 0) AS mean_value,
+               MAX(`{metric}_max`) AS max_value, SUM(`{metric}_count`) AS sample_count
+        FROM {rollup_table}
+        WHERE {where.replace("timestamp", "bucket_start")} AND `{metric}_count` > 0
+        GROUP BY points, side, bucket_time
+        ORDER BY points, side, bucket_time
+        """
+        rows = db_pool.fetch_all(query, params)
+    
+    if mode == "aggregate" and not rows:
+        # 汇总表中没有的指标，或汇总表尚未重建时，从原始数据聚合
+        bucket_expr = TREND_BUCKETS[bucket].format(base_date=base_date)
+        query = f"""
+        SELECT points, side, {bucket_expr} AS bucket_time,
+               MIN(`{metric}`) AS min_value, AVG(`{metric}`) AS mean_value,
+               MAX(`{metric}`) AS max_value, COUNT(`{metric}`) AS sample_count
+        FROM performance_parameters
+        WHERE {where}
+        GROUP BY points, side, bucket_time
+        ORDER BY points, side, bucket_time
+        """
+        rows = db_pool.fetch_all(query, params)
+    elif mode != "aggregate":
+        query = f"""
+        SELECT heat_exchanger_id, points, side, timestamp, `{metric}`
+        FROM performance_parameters
+        WHERE {where} AND `{metric}` IS NOT NULL
+        ORDER BY points, side, timestamp
+        """
+        if stale_ranges:
+            from db.data_loader import DataLoader
+            with db_pool.connection() as db_conn:
+                rows = None
+                if db_conn.execute_query(db_conn.prod_cursor, query, params):
+                    rows = calculator.k_materializer.apply_stale_overlay(
+                        db_conn.fetch_all(db_conn.prod_cursor), DataLoader(db_conn), 'performance_parameters'
+                    )
+        else:
+            rows = db_pool.fetch_all(query, params)
+    if rows is None:
+        return None
+    
+    grouped = {}
+    for row in rows:
+        grouped.setdefault((row['points'], row['side']), []).append(row)
+    
+    series = []
+    for (series_points, series_side), series_rows in grouped.items():
+        if mode == "aggregate":
+            series.append({
+                "points": series_points,
+                "side": series_side,
+                "timestamp": [str(row['bucket_time']) for row in series_rows],
+                "min": [float(row['min_value']) if row['min_value'] is not None else None for row in series_rows],
+                "mean": [float(row['mean_value']) if row['mean_value'] is not None else None for row in series_rows],
+                "max": [float(row['max_value']) if row['max_value'] is not None else None for row in series_rows],
+                "count": [int(row['sample_count']) for row in series_rows]
+            })
+        else:
+            x = np.array([row['timestamp'].timestamp() for row in series_rows], dtype=float)
+            y = np.array([row[metric] for row in series_rows], dtype=float)
+            keep = lttb_indices(x, y, target_points)
+            series.append({
+                "points": series_points,
+                "side": series_side,
+                "timestamp": [str(series_rows[i]['timestamp']) for i in keep],
+                "value": y[keep].tolist(),
+                "raw_count": len(series_rows)
+            })
+    return series, [
+        {
+            "start_time": str(stale_range['start_time']),
+            "end_time": str(stale_range['end_time']),
+            "points": stale_range['points']
+        }
+        for stale_range in stale_ranges
+    ]
+
+# 全机组快照：每台换热器取k_management最新时间戳的一小时记录，
+# MAX(timestamp) ... GROUP BY heat_exchanger_id在唯一索引(heat_exchanger_id, timestamp, points, side)上
+# 为松散索引扫描，每台换热器只读取一个索引项，耗时不随历史长度增长
+FLEET_SNAPSHOT_QUERY = """
+SELECT he.id AS heat_exchanger_id, k.timestamp, k.points, k.side,
+       k.K_LMTD, k.K_predicted, k.K_actual, p.K, p.heat_duty, m.model_time
+FROM heat_exchanger he
+LEFT JOIN (
+    SELECT heat_exchanger_id, MAX(timestamp) AS latest_time
+    FROM k_management GROUP BY heat_exchanger_id
+) latest ON latest.heat_exchanger_id = he.id
+LEFT JOIN k_management k
+    ON k.heat_exchanger_id = latest.heat_exchanger_id AND k.timestamp = latest.latest_time
+LEFT JOIN performance_parameters p
+    ON p.heat_exchanger_id = k.heat_exchanger_id AND p.timestamp = k.timestamp
+    AND p.points = k.points AND p.side = k.side
+LEFT JOIN (
+    SELECT heat_exchanger_id, MAX(timestamp) AS model_time
+    FROM model_parameters GROUP BY heat_exchanger_id
+) m ON m.heat_exchanger_id = he.id
+ORDER BY he.id, k.points, k.side
+"""
+
+def build_fleet_snapshot():
+    """在查询线程中计算全部换热器的最新指标
+    
+    返回值: 每台换热器一项的列表，查询失败时返回None
+    """
+    from db.data_loader import DataLoader
+    with db_pool.connection() as db_conn:
+        if not db_conn.execute_query(db_conn.prod_cursor, FLEET_SNAPSHOT_QUERY):
+            return None
+        rows = db_conn.fetch_all(db_conn.prod_cursor)
+        
+        grouped = {}
+        for row in rows:
+            grouped.setdefault(row['heat_exchanger_id'], []).append(row)
+        
+        snapshot = []
+        for heat_exchanger_id, he_rows in grouped.items():
+            data_rows = [row for row in he_rows if row['timestamp'] is not None]
+            if data_rows:
+                # 最新一小时仍在待刷新区间内时即时计算K_predicted
+                stored_predictions = [row['K_predicted'] for row in data_rows]
+                data_rows = calculator.k_materializer.apply_stale_overlay(
+                    data_rows, DataLoader(db_conn, heat_exchanger_id), 'k_management'
+                )
+                # performance_parameters的K由K_predicted填写（finalize_hour_performance），随之更新
+                for row, stored in zip(data_rows, stored_predictions):
+                    if row['K_predicted'] != stored and row['K'] is not None:
+                        row['K'] = row['K_predicted']
+            
+            # 与阶段判断一致，误差为管侧K_predicted相对K_actual的平均相对误差（百分比）
+            errors = [
+                abs(row['K_predicted'] - row['K_actual']) / row['K_actual'] * 100
+                for row in data_rows
+                if str(row['side']).lower() == 'tube' and row['K_predicted'] and row['K_actual']
+            ]
+            latest_time = data_rows[0]['timestamp'] if data_rows else None
+            model_time = he_rows[0]['model_time']
+            model_age_hours = None
+            if latest_time is not None and model_time is not None:
+                # 数据为历史回放，模型年龄按最新数据时间而不是当前时间计算
+                model_age_hours = (latest_time - model_time).total_seconds() / 3600
+            
+            snapshot.append({
+                "heat_exchanger_id": heat_exchanger_id,
+                "timestamp": latest_time,
+                "model_time": model_time,
+                "model_age_hours": model_age_hours,
+                "error": sum(errors) / len(errors) if errors else None,
+                "points": [
+                    {
+                        "points": row['points'],
+                        "side": row['side'],
+                        "K": row['K'],
+                        "K_LMTD": row['K_LMTD'],
+                        "K_predicted": row['K_predicted'],
+                        "K_actual": row['K_actual'],
+                        "heat_duty": row['heat_duty']
+                    }
+                    for row in data_rows
+                ]
+            })
+        return snapshot
+
+async def stream_rows_response(query, params, output_format, overlay_table=None):
+    """以NDJSON或CSV流式返回查询结果
+    
+    参数:
+        query: SQL查询语句
+        params: 查询参数
+        output_format: 'ndjson' 或 'csv'
+        overlay_table: 需要叠加待刷新K_predicted的表名，为None时不叠加
+    
+    返回值: StreamingResponse
+    """
+    def iter_chunks():
+        overlay_conn = None
+        overlay_loader = None
+        try:
+            for rows in stream_db_conn.stream_query(query, params, STREAM_CHUNK_SIZE):
+                if overlay_table:
+                    # 流式游标占用查询连接，待刷新区间需要另开连接查询
+                    if overlay_conn is None:
+                        from db.data_loader import DataLoader
+                        overlay_conn = DatabaseConnection(config)
+                        if overlay_conn.connect_prod_db():
+                            overlay_loader = DataLoader(overlay_conn)
+                        else:
+                            print("流式输出叠加K_predicted的连接建立失败，返回数据库中的原值")
+                    if overlay_loader:
+                        rows = calculator.k_materializer.apply_stale_overlay(rows, overlay_loader, overlay_table)
+                yield rows
+        finally:
+            if overlay_conn:
+                overlay_conn.disconnect_prod_db()
+    
+    chunks = iter_chunks()
+    # 先读取第一块，使连接和查询错误能按普通错误返回，而不是在响应头发出后中断
+    first_chunk = await run_in_executor(db_executor, next, chunks, None)
+    
+    def iter_all_chunks():
+        if first_chunk is None:
+            return
+        yield first_chunk
+        yield from chunks
+    
+    def ndjson_body():
+        for rows in iter_all_chunks():
+            yield "".join(json.dumps(row, default=json_default, ensure_ascii=False) + "\n" for row in rows)
+    
+    def csv_body():
+        buffer = io.StringIO()
+        writer = None
+        for rows in iter_all_chunks():
+            if writer is None:
+                writer = csv.DictWriter(buffer, fieldnames=list(rows[0].keys()))
+                writer.writeheader()
+            for row in rows:
+                writer.writerow({
+                    key: json_default(value) if isinstance(value, (datetime, date, Decimal)) else value
+                    for key, value in row.items()
+                })
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate(0)
+    
+    body = ndjson_body() if output_format == "ndjson" else csv_body()
+    return StreamingResponse(body, media_type=STREAM_MEDIA_TYPES[output_format])
+
+@app.get("/events", summary="事件推送", description="以Server-Sent Events推送新处理完成的小时和模型更新")
+async def stream_events(request: Request, heat_exchanger_id: Optional[int] = None,
+                        last_event_id: Optional[int] = Header(None, alias="Last-Event-ID")):
+    return StreamingResponse(
+        event_broadcaster.subscribe(last_event_id, heat_exchanger_id, request.is_disconnected),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
 
 @app.get("/health", summary="健康检查", description="检查API是否正常运行")
 async def health_check():
@@ -47,24 +686,134 @@ async def health_check():
         "service": "heat_exchanger_monitor_api"
     }
 
-@app.post("/process-data/{day}/{hour}", summary="处理指定时间的数据", description="处理指定天数和小时的数据")
-async def process_data(day: int, hour: int):
+@app.get("/health/live", summary="存活探针", description="进程能响应请求即返回200，不访问数据库")
+async def liveness_check():
+    return {
+        "status": "alive",
+        "timestamp": datetime.now().isoformat()
+    }
+
+@app.get("/health/ready", summary="就绪探针", description="后台预热完成（计算器已创建、数据库已连接）后返回200，否则返回503")
+async def readiness_check(response: Response):
+    if not warmup_state["ready"]:
+        response.status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    return {
+        "status": "ready" if warmup_state["ready"] else "warming_up",
+        "timestamp": datetime.now().isoformat(),
+        "warmup": dict(warmup_state)
+    }
+
+@app.post("/process-data/{day}/{hour}", dependencies=[Depends(require_ready)],
+          status_code=status.HTTP_202_ACCEPTED, summary="处理指定时间的数据",
+          description="提交处理指定天数和小时数据的后台任务，立即返回任务ID")
+async def process_data(day: int, hour: int, heat_exchanger_id: Optional[int] = None):
     try:
-        success = calculator.process_data_by_hour(day, hour)
-        if success:
-            return {
+        # 验证参数
+        max_days = config.get('max_days', 800)
+        if day < 1 or day > max_days:
+            raise ValueError(f"day参数必须在1-{max_days}之间")
+        if hour < 0 or hour > 23:
+            raise ValueError("hour参数必须在0-23之间")
+        
+        # 登记为后台任务后立即返回，通过/jobs/{job_id}查询状态
+        heat_exchanger_id = await resolve_job_heat_exchanger_id(heat_exchanger_id)
+        job = job_queue.submit("process-data", heat_exchanger_id, day, hour)
+        return {
+            "status": "accepted",
+            "message": f"第{day}天第{hour}小时的数据处理任务已提交",
+            "job_id": job["job_id"],
+            "job": job
+        }
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail={
+                "code": "INVALID_PARAMETERS",
+                "type": "BadRequest",
+                "message": str(e),
+                "timestamp": datetime.now().isoformat()
+            }
+        )
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail={
+                "code": "INTERNAL_SERVER_ERROR",
+                "type": "InternalServerError",
+                "message": str(e),
+                "timestamp": datetime.now().isoformat()
+            }
+        )
+
+@app.get("/jobs/{job_id}", summary="查询任务", description="查询后台任务的状态、进度和耗时")
+async def get_job(job_id: str):
+    job = job_queue.get_job(job_id)
+    if job is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail={
+                "code": "JOB_NOT_FOUND",
+                "type": "NotFound",
+                "message": f"任务{job_id}不存在",
+                "timestamp": datetime.now().isoformat()
+            }
+        )
+    return {
+        "status": "success",
+        "data": job
+    }
+
+@app.get("/jobs", summary="列出任务", description="按提交顺序列出后台任务，可按换热器和状态过滤")
+async def list_jobs(heat_exchanger_id: Optional[int] = None, job_status: Optional[str] = Query(None, alias="status")):
+    jobs = job_queue.list_jobs(heat_exchanger_id, job_status)
+    return {
+        "status": "success",
+        "count": len(jobs),
+        "data": jobs
+    }
+
+@app.get("/operation-parameters", summary="获取运行参数", description="获取运行参数数据")
+async def get_operation_parameters(request: Request, heat_exchanger_id: int = 1, day: int = None, hour: int = None,
+                                   output_format: str = Query("json", alias="format"),
+                                   limit: Optional[int] = None, cursor: Optional[str] = None):
+    try:
+        # 验证参数
+        if output_format not in OUTPUT_FORMATS:
+            raise ValueError("format参数必须是json、columnar、ndjson或csv")
+        
+        # 构建查询条件，只给出hour时走hour_of_day索引
+        query, params, start_time, end_time = build_time_series_query("operation_parameters", heat_exchanger_id, day, hour)
+        
+        # 流式输出：逐块读取非缓冲游标，不在内存中构建完整结果
+        if output_format in STREAM_MEDIA_TYPES:
+            return await stream_rows_response(query, params, output_format)
+        
+        # 分页：按(timestamp, points, side)键集定位下一页
+        page_size = None
+        if limit is not None or cursor is not None:
+            query, params, page_size = paginate_query(query, params, limit, cursor)
+        
+        # 在查询线程池中执行，不阻塞事件循环
+        page = await run_in_executor(db_executor, run_query, query, params, None, page_size)
+        if page is not None:
+            result, next_cursor = page
+            response = {
                 "status": "success",
-                "message": f"第{day}天第{hour}小时的数据处理完成",
-                "day": day,
-                "hour": hour
+                "count": len(result),
+                "data": result
             }
+            if page_size is not None:
+                response["next_cursor"] = next_cursor
+            if output_format == "columnar":
+                return columnar_response(request, response)
+            return response
         else:
             raise HTTPException(
                 status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
                 detail={
-                    "code": "DATA_PROCESSING_FAILED",
+                    "code": "QUERY_EXECUTION_FAILED",
                     "type": "InternalServerError",
-                    "message": "数据处理失败",
+                    "message": "数据库查询执行失败",
                     "timestamp": datetime.now().isoformat()
                 }
             )
@@ -89,50 +838,41 @@ async def process_data(day: int, hour: int):
             }
         )
 
-@app.get("/operation-parameters", summary="获取运行参数", description="获取运行参数数据")
-async def get_operation_parameters(heat_exchanger_id: int = 1, day: int = None, hour: int = None):
+@app.get("/physical-parameters", summary="获取物理参数", description="获取物理参数数据")
+async def get_physical_parameters(request: Request, heat_exchanger_id: int = 1, day: int = None, hour: int = None,
+                                  output_format: str = Query("json", alias="format"),
+                                  limit: Optional[int] = None, cursor: Optional[str] = None):
     try:
         # 验证参数
-        if day and (day < 1 or day > 31):
-            raise ValueError("day参数必须在1-31之间")
-        if hour is not None and (hour < 0 or hour > 23):
-            raise ValueError("hour参数必须在0-23之间")
+        if output_format not in OUTPUT_FORMATS:
+            raise ValueError("format参数必须是json、columnar、ndjson或csv")
         
-        # 构建查询条件
-        query = "SELECT * FROM operation_parameters WHERE 1=1"
-        params = []
+        # 构建查询条件，只给出hour时走hour_of_day索引
+        query, params, start_time, end_time = build_time_series_query("physical_parameters", heat_exchanger_id, day, hour)
         
-        # 默认查询heat_exchanger_id=1的数据
-        query += " AND heat_exchanger_id = %s"
-        params.append(heat_exchanger_id)
+        # 流式输出：逐块读取非缓冲游标，不在内存中构建完整结果
+        if output_format in STREAM_MEDIA_TYPES:
+            return await stream_rows_response(query, params, output_format)
         
-        # 处理day和hour参数，转换为timestamp范围查询
-        if day:
-            if hour is not None:
-                # 查询特定天和小时的数据
-                start_time = f"2022-01-{day:02d} {hour:02d}:00:00"
-                end_time = f"2022-01-{day:02d} {hour:02d}:59:59"
-                query += " AND timestamp BETWEEN %s AND %s"
-                params.extend([start_time, end_time])
-            else:
-                # 查询特定天的数据
-                start_time = f"2022-01-{day:02d} 00:00:00"
-                end_time = f"2022-01-{day:02d} 23:59:59"
-                query += " AND timestamp BETWEEN %s AND %s"
-                params.extend([start_time, end_time])
-        elif hour is not None:
-            # 只查询特定小时的数据（所有天）
-            query += " AND HOUR(timestamp) = %s"
-            params.append(hour)
-        
-        # 执行查询
-        if calculator.db_conn.execute_query(calculator.db_conn.prod_cursor, query, params):
-            result = calculator.db_conn.fetch_all(calculator.db_conn.prod_cursor)
-            return {
+        # 分页：按(timestamp, points, side)键集定位下一页
+        page_size = None
+        if limit is not None or cursor is not None:
+            query, params, page_size = paginate_query(query, params, limit, cursor)
+        
+        # 在查询线程池中执行，不阻塞事件循环
+        page = await run_in_executor(db_executor, run_query, query, params, None, page_size)
+        if page is not None:
+            result, next_cursor = page
+            response = {
                 "status": "success",
                 "count": len(result),
                 "data": result
             }
+            if page_size is not None:
+                response["next_cursor"] = next_cursor
+            if output_format == "columnar":
+                return columnar_response(request, response)
+            return response
         else:
             raise HTTPException(
                 status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -164,50 +904,99 @@ async def get_operation_parameters(heat_exchanger_id: int = 1, day: int = None,
             }
         )
 
-@app.get("/physical-parameters", summary="获取物理参数", description="获取物理参数数据")
-async def get_physical_parameters(heat_exchanger_id: int = 1, day: int = None, hour: int = None):
+@app.get("/k-management", dependencies=[Depends(require_ready)],
+         summary="获取K管理数据", description="获取K_lmtd数据")
+async def get_k_management(request: Request, response: Response,
+                           heat_exchanger_id: int = 1, day: int = None, hour: int = None,
+                           output_format: str = Query("json", alias="format"),
+                           limit: Optional[int] = None, cursor: Optional[str] = None):
     try:
         # 验证参数
-        if day and (day < 1 or day > 31):
-            raise ValueError("day参数必须在1-31之间")
-        if hour is not None and (hour < 0 or hour > 23):
-            raise ValueError("hour参数必须在0-23之间")
+        if output_format not in OUTPUT_FORMATS:
+            raise ValueError("format参数必须是json、columnar、ndjson或csv")
         
-        # 构建查询条件
-        query = "SELECT * FROM physical_parameters WHERE 1=1"
-        params = []
+        # 构建查询条件，只给出hour时走hour_of_day索引
+        query, params, start_time, end_time = build_time_series_query("k_management", heat_exchanger_id, day, hour)
         
-        # 默认查询heat_exchanger_id=1的数据
-        query += " AND heat_exchanger_id = %s"
-        params.append(heat_exchanger_id)
+        # 流式输出：逐块读取非缓冲游标，不在内存中构建完整结果
+        if output_format in STREAM_MEDIA_TYPES:
+            return await stream_rows_response(query, params, output_format, 'k_management')
         
-        # 处理day和hour参数，转换为timestamp范围查询
-        if day:
-            if hour is not None:
-                # 查询特定天和小时的数据
-                start_time = f"2022-01-{day:02d} {hour:02d}:00:00"
-                end_time = f"2022-01-{day:02d} {hour:02d}:59:59"
-                query += " AND timestamp BETWEEN %s AND %s"
-                params.extend([start_time, end_time])
-            else:
-                # 查询特定天的数据
-                start_time = f"2022-01-{day:02d} 00:00:00"
-                end_time = f"2022-01-{day:02d} 23:59:59"
-                query += " AND timestamp BETWEEN %s AND %s"
-                params.extend([start_time, end_time])
-        elif hour is not None:
-            # 只查询特定小时的数据（所有天）
-            query += " AND HOUR(timestamp) = %s"
-            params.append(hour)
-        
-        # 执行查询
-        if calculator.db_conn.execute_query(calculator.db_conn.prod_cursor, query, params):
-            result = calculator.db_conn.fetch_all(calculator.db_conn.prod_cursor)
-            return {
-                "status": "success",
-                "count": len(result),
-                "data": result
+        # 分页：按(timestamp, points, side)键集定位下一页
+        page_size = None
+        if limit is not None or cursor is not None:
+            query, params, page_size = paginate_query(query, params, limit, cursor)
+        
+        # 在查询线程池中执行并缓存响应，客户端ETag未变化时返回304
+        body = await cached_query(
+            request, response, ("k-management", heat_exchanger_id, day, hour, limit, cursor, output_format),
+            'k_management', heat_exchanger_id, start_time, end_time,
+            query, params, 'k_management', page_size, output_format
+        )
+        if body is not None:
+            return body
+        else:
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail={
+                    "code": "QUERY_EXECUTION_FAILED",
+                    "type": "InternalServerError",
+                    "message": "数据库查询执行失败",
+                    "timestamp": datetime.now().isoformat()
+                }
+            )
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail={
+                "code": "INVALID_PARAMETERS",
+                "type": "BadRequest",
+                "message": str(e),
+                "timestamp": datetime.now().isoformat()
+            }
+        )
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail={
+                "code": "INTERNAL_SERVER_ERROR",
+                "type": "InternalServerError",
+                "message": str(e),
+                "timestamp": datetime.now().isoformat()
             }
+        )
+
+@app.get("/performance", dependencies=[Depends(require_ready)],
+         summary="获取性能数据", description="获取换热器性能数据")
+async def get_performance(request: Request, response: Response,
+                          heat_exchanger_id: int = 1, day: int = None, hour: int = None,
+                          output_format: str = Query("json", alias="format"),
+                          limit: Optional[int] = None, cursor: Optional[str] = None):
+    try:
+        # 验证参数
+        if output_format not in OUTPUT_FORMATS:
+            raise ValueError("format参数必须是json、columnar、ndjson或csv")
+        
+        # 构建查询条件，只给出hour时走hour_of_day索引
+        query, params, start_time, end_time = build_time_series_query("performance_parameters", heat_exchanger_id, day, hour)
+        
+        # 流式输出：逐块读取非缓冲游标，不在内存中构建完整结果
+        if output_format in STREAM_MEDIA_TYPES:
+            return await stream_rows_response(query, params, output_format, 'performance_parameters')
+        
+        # 分页：按(timestamp, points, side)键集定位下一页
+        page_size = None
+        if limit is not None or cursor is not None:
+            query, params, page_size = paginate_query(query, params, limit, cursor)
+        
+        # 在查询线程池中执行并缓存响应，客户端ETag未变化时返回304
+        body = await cached_query(
+            request, response, ("performance", heat_exchanger_id, day, hour, limit, cursor, output_format),
+            'performance_parameters', heat_exchanger_id, start_time, end_time,
+            query, params, 'performance_parameters', page_size, output_format
+        )
+        if body is not None:
+            return body
         else:
             raise HTTPException(
                 status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -239,50 +1028,63 @@ async def get_physical_parameters(heat_exchanger_id: int = 1, day: int = None, h
             }
         )
 
-@app.get("/k-management", summary="获取K管理数据", description="获取K_lmtd数据")
-async def get_k_management(heat_exchanger_id: int = 1, day: int = None, hour: int = None):
+@app.get("/performance/range", dependencies=[Depends(require_ready)],
+         summary="按时间范围获取性能数据", description="一次性获取起止天数/小时范围内的换热器性能数据，按时间和测点排序")
+async def get_performance_range(request: Request, start_day: int, end_day: int, start_hour: int = 0, end_hour: int = 23,
+                                heat_exchanger_id: int = 1, points: Optional[List[int]] = Query(None),
+                                side: Optional[str] = None, output_format: str = Query("json", alias="format"),
+                                limit: Optional[int] = None, cursor: Optional[str] = None):
     try:
         # 验证参数
-        if day and (day < 1 or day > 31):
-            raise ValueError("day参数必须在1-31之间")
-        if hour is not None and (hour < 0 or hour > 23):
-            raise ValueError("hour参数必须在0-23之间")
+        max_days = config.get('max_days', 800)
+        for day in (start_day, end_day):
+            if day < 1 or day > max_days:
+                raise ValueError(f"day参数必须在1-{max_days}之间")
+        for hour in (start_hour, end_hour):
+            if hour < 0 or hour > 23:
+                raise ValueError("hour参数必须在0-23之间")
+        if (start_day, start_hour) > (end_day, end_hour):
+            raise ValueError("起始时间不能晚于结束时间")
+        if output_format not in OUTPUT_FORMATS:
+            raise ValueError("format参数必须是json、columnar、ndjson或csv")
         
-        # 构建查询条件
-        query = "SELECT * FROM k_management WHERE 1=1"
-        params = []
+        start_time, end_time = time_keys.span_bounds(start_day, start_hour, end_day, end_hour)
+        query = "SELECT * FROM performance_parameters WHERE heat_exchanger_id = %s AND timestamp >= %s AND timestamp < %s"
+        params = [heat_exchanger_id, start_time, end_time]
         
-        # 默认查询heat_exchanger_id=1的数据
-        query += " AND heat_exchanger_id = %s"
-        params.append(heat_exchanger_id)
+        if points:
+            query += f" AND points IN ({', '.join(['%s'] * len(points))})"
+            params.extend(points)
+        if side:
+            query += " AND side = %s"
+            params.append(side)
         
-        # 处理day和hour参数，转换为timestamp范围查询
-        if day:
-            if hour is not None:
-                # 查询特定天和小时的数据
-                start_time = f"2022-01-{day:02d} {hour:02d}:00:00"
-                end_time = f"2022-01-{day:02d} {hour:02d}:59:59"
-                query += " AND timestamp BETWEEN %s AND %s"
-                params.extend([start_time, end_time])
-            else:
-                # 查询特定天的数据
-                start_time = f"2022-01-{day:02d} 00:00:00"
-                end_time = f"2022-01-{day:02d} 23:59:59"
-                query += " AND timestamp BETWEEN %s AND %s"
-                params.extend([start_time, end_time])
-        elif hour is not None:
-            # 只查询特定小时的数据（所有天）
-            query += " AND HOUR(timestamp) = %s"
-            params.append(hour)
-        
-        # 执行查询
-        if calculator.db_conn.execute_query(calculator.db_conn.prod_cursor, query, params):
-            result = calculator.db_conn.fetch_all(calculator.db_conn.prod_cursor)
-            return {
+        # 流式输出：逐块读取非缓冲游标，不在内存中构建完整结果
+        if output_format in STREAM_MEDIA_TYPES:
+            query += " ORDER BY timestamp, points, side"
+            return await stream_rows_response(query, params, output_format, 'performance_parameters')
+        
+        # 分页：按(timestamp, points, side)键集定位下一页
+        page_size = None
+        if limit is not None or cursor is not None:
+            query, params, page_size = paginate_query(query, params, limit, cursor)
+        else:
+            query += " ORDER BY timestamp, points, side"
+        
+        # 在查询线程池中执行，不阻塞事件循环
+        page = await run_in_executor(db_executor, run_query, query, params, 'performance_parameters', page_size)
+        if page is not None:
+            result, next_cursor = page
+            response = {
                 "status": "success",
                 "count": len(result),
                 "data": result
             }
+            if page_size is not None:
+                response["next_cursor"] = next_cursor
+            if output_format == "columnar":
+                return columnar_response(request, response)
+            return response
         else:
             raise HTTPException(
                 status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -314,49 +1116,49 @@ async def get_k_management(heat_exchanger_id: int = 1, day: int = None, hour: in
             }
         )
 
-@app.get("/performance", summary="获取性能数据", description="获取换热器性能数据")
-async def get_performance(heat_exchanger_id: int = 1, day: int = None, hour: int = None):
+@app.get("/performance/trend", dependencies=[Depends(require_ready)],
+         summary="获取性能指标趋势",
+         description="按小时/天/周聚合为min/mean/max，或用LTTB降采样到目标点数，用于长时间范围的趋势图")
+async def get_performance_trend(start_day: int, end_day: int, metric: str = "K", mode: str = "aggregate",
+                                bucket: str = "day", target_points: int = 500, heat_exchanger_id: int = 1,
+                                points: Optional[List[int]] = Query(None), side: Optional[str] = None):
     try:
         # 验证参数
-        if day and (day < 1 or day > 31):
-            raise ValueError("day参数必须在1-31之间")
-        if hour is not None and (hour < 0 or hour > 23):
-            raise ValueError("hour参数必须在0-23之间")
+        max_days = config.get('max_days', 800)
+        for day in (start_day, end_day):
+            if day < 1 or day > max_days:
+                raise ValueError(f"day参数必须在1-{max_days}之间")
+        if start_day > end_day:
+            raise ValueError("起始天数不能大于结束天数")
+        if metric not in TREND_METRICS:
+            raise ValueError(f"metric参数必须是{'、'.join(TREND_METRICS)}之一")
+        if mode not in ("aggregate", "lttb"):
+            raise ValueError("mode参数必须是aggregate或lttb")
+        if bucket not in TREND_BUCKETS:
+            raise ValueError("bucket参数必须是hour、day或week")
+        if target_points < 3 or target_points > TREND_MAX_POINTS:
+            raise ValueError(f"target_points参数必须在3-{TREND_MAX_POINTS}之间")
         
-        # 构建查询条件
-        query = "SELECT * FROM performance_parameters WHERE 1=1"
-        params = []
+        # 长时间范围跨月，按配置的基准日期计算半开区间[start_time, end_time)
+        start_time, end_time = time_keys.day_bounds(start_day, end_day)
         
-        # 默认查询heat_exchanger_id=1的数据
-        query += " AND heat_exchanger_id = %s"
-        params.append(heat_exchanger_id)
-        
-        # 处理day和hour参数，转换为timestamp范围查询
-        if day:
-            if hour is not None:
-                # 查询特定天和小时的数据
-                start_time = f"2022-01-{day:02d} {hour:02d}:00:00"
-                end_time = f"2022-01-{day:02d} {hour:02d}:59:59"
-                query += " AND timestamp BETWEEN %s AND %s"
-                params.extend([start_time, end_time])
-            else:
-                # 查询特定天的数据
-                start_time = f"2022-01-{day:02d} 00:00:00"
-                end_time = f"2022-01-{day:02d} 23:59:59"
-                query += " AND timestamp BETWEEN %s AND %s"
-                params.extend([start_time, end_time])
-        elif hour is not None:
-            # 只查询特定小时的数据（所有天）
-            query += " AND HOUR(timestamp) = %s"
-            params.append(hour)
-        
-        # 执行查询
-        if calculator.db_conn.execute_query(calculator.db_conn.prod_cursor, query, params):
-            result = calculator.db_conn.fetch_all(calculator.db_conn.prod_cursor)
+        # 在查询线程池中执行，不阻塞事件循环
+        trend = await run_in_executor(
+            db_executor, build_trend, heat_exchanger_id, start_time, end_time,
+            metric, mode, bucket, target_points, points, side
+        )
+        if trend is not None:
+            series, stale_ranges = trend
             return {
                 "status": "success",
-                "count": len(result),
-                "data": result
+                "metric": metric,
+                "mode": mode,
+                "bucket": bucket if mode == "aggregate" else None,
+                "count": len(series),
+                "data": series,
+                # 聚合结果中落在这些区间内的桶仍是上一版模型的预测值，后台物化完成后更新
+                "stale": mode == "aggregate" and bool(stale_ranges),
+                "stale_ranges": stale_ranges if mode == "aggregate" else []
             }
         else:
             raise HTTPException(
@@ -389,10 +1191,103 @@ async def get_performance(heat_exchanger_id: int = 1, day: int = None, hour: int
             }
         )
 
+@app.get("/export/{table}", dependencies=[Depends(require_ready)],
+         summary="导出列式数据",
+         description="按时间范围和列选择把k_management或performance_parameters导出为Arrow IPC流或Parquet文件")
+async def export_table(table: str, start_day: int, end_day: int, heat_exchanger_id: int = 1,
+                       columns: Optional[List[str]] = Query(None), export_format: str = Query("arrow", alias="format")):
+    try:
+        from db.arrow_export import EXPORT_COLUMNS, EXPORT_MEDIA_TYPES, arrow_available, iter_export
+        
+        # 验证参数
+        if not arrow_available():
+            raise HTTPException(
+                status_code=status.HTTP_501_NOT_IMPLEMENTED,
+                detail={
+                    "code": "PYARROW_NOT_INSTALLED",
+                    "type": "NotImplemented",
+                    "message": "导出Arrow/Parquet需要安装pyarrow",
+                    "timestamp": datetime.now().isoformat()
+                }
+            )
+        if table not in EXPORT_COLUMNS:
+            raise ValueError(f"table参数必须是{'、'.join(EXPORT_COLUMNS)}之一")
+        if export_format not in EXPORT_MEDIA_TYPES:
+            raise ValueError("format参数必须是arrow或parquet")
+        max_days = config.get('max_days', 800)
+        for day in (start_day, end_day):
+            if day < 1 or day > max_days:
+                raise ValueError(f"day参数必须在1-{max_days}之间")
+        if start_day > end_day:
+            raise ValueError("起始天数不能大于结束天数")
+        columns = columns or list(EXPORT_COLUMNS[table])
+        unknown_columns = [column for column in columns if column not in EXPORT_COLUMNS[table]]
+        if unknown_columns:
+            raise ValueError(f"{table}不支持导出列: {', '.join(unknown_columns)}")
+        
+        # 长时间范围跨月，按配置的基准日期计算半开区间[start_time, end_time)
+        start_time, end_time = time_keys.day_bounds(start_day, end_day)
+        
+        # 导出不物化待刷新区间，范围内有待刷新区间时逐块叠加当前模型的K_predicted和K
+        stale = await run_in_executor(db_executor, has_stale_ranges, heat_exchanger_id, start_time, end_time)
+        select_columns = list(columns)
+        if stale:
+            # 叠加时按(换热器, 时间, points, side)匹配，导出的列只取columns
+            select_columns += [column for column in ('heat_exchanger_id', 'timestamp', 'points', 'side')
+                               if column not in select_columns]
+        
+        column_list = ", ".join(f"`{column}`" for column in select_columns)
+        query = f"""
+        SELECT {column_list} FROM {table}
+        WHERE heat_exchanger_id = %s AND timestamp >= %s AND timestamp < %s
+        ORDER BY timestamp, points, side
+        """
+        row_chunks = stream_db_conn.stream_query(query, [heat_exchanger_id, start_time, end_time], STREAM_CHUNK_SIZE)
+        if stale:
+            row_chunks = overlay_row_chunks(row_chunks, table)
+        chunks = iter_export(row_chunks, table, columns, export_format)
+        # 先编码第一块，使连接和查询错误能按普通错误返回
+        first_chunk = await run_in_executor(db_executor, next, chunks, None)
+        
+        def body():
+            if first_chunk is not None:
+                yield first_chunk
+            yield from chunks
+        
+        extension = "arrows" if export_format == "arrow" else "parquet"
+        filename = f"{table}_{heat_exchanger_id}_day{start_day}-{end_day}.{extension}"
+        return StreamingResponse(
+            body(),
+            media_type=EXPORT_MEDIA_TYPES[export_format],
+            headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+        )
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail={
+                "code": "INVALID_PARAMETERS",
+                "type": "BadRequest",
+                "message": str(e),
+                "timestamp": datetime.now().isoformat()
+            }
+        )
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail={
+                "code": "INTERNAL_SERVER_ERROR",
+                "type": "InternalServerError",
+                "message": str(e),
+                "timestamp": datetime.now().isoformat()
+            }
+        )
+
 @app.get("/heat-exchangers", summary="获取所有换热器", description="获取所有换热器信息")
 async def get_heat_exchangers():
     try:
-        heat_exchangers = calculator.data_loader.get_all_heat_exchangers()
+        heat_exchangers = await run_in_executor(db_executor, db_pool.fetch_all, "SELECT * FROM heat_exchanger") or []
         return {
             "status": "success",
             "count": len(heat_exchangers),
@@ -409,12 +1304,45 @@ async def get_heat_exchangers():
             }
         )
 
+@app.get("/fleet/snapshot", dependencies=[Depends(require_ready)],
+         summary="全机组快照", description="一次查询返回所有换热器最新一小时的K、K_actual、热负荷、预测误差和模型年龄")
+async def get_fleet_snapshot():
+    try:
+        snapshot = await run_in_executor(db_executor, build_fleet_snapshot)
+        if snapshot is not None:
+            return {
+                "status": "success",
+                "count": len(snapshot),
+                "data": snapshot
+            }
+        else:
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail={
+                    "code": "QUERY_EXECUTION_FAILED",
+                    "type": "InternalServerError",
+                    "message": "数据库查询执行失败",
+                    "timestamp": datetime.now().isoformat()
+                }
+            )
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail={
+                "code": "INTERNAL_SERVER_ERROR",
+                "type": "InternalServerError",
+                "message": str(e),
+                "timestamp": datetime.now().isoformat()
+            }
+        )
+
 @app.get("/model-parameters", summary="获取模型参数", description="获取模型参数数据")
-async def get_model_parameters(heat_exchanger_id: int = 1, day: int = None):
+async def get_model_parameters(request: Request, response: Response, heat_exchanger_id: int = 1, day: int = None):
     try:
         # 验证参数
-        if day and (day < 1 or day > 365):
-            raise ValueError("day参数必须在1-365之间")
+        max_days = config.get('max_days', 800)
+        if day and (day < 1 or day > max_days):
+            raise ValueError(f"day参数必须在1-{max_days}之间")
         
         # 构建查询条件
         query = "SELECT * FROM model_parameters WHERE 1=1"
@@ -425,17 +1353,17 @@ async def get_model_parameters(heat_exchanger_id: int = 1, day: int = None):
         params.append(heat_exchanger_id)
         
         if day:
-            query += " AND day = %s"
-            params.append(day)
+            # model_parameters没有天数列，按该天的时间范围过滤
+            query += " AND timestamp >= %s AND timestamp < %s"
+            params.extend(time_keys.day_bounds(day))
         
-        # 执行查询
-        if calculator.db_conn.execute_query(calculator.db_conn.prod_cursor, query, params):
-            result = calculator.db_conn.fetch_all(calculator.db_conn.prod_cursor)
-            return {
-                "status": "success",
-                "count": len(result),
-                "data": result
-            }
+        # 在查询线程池中执行并缓存响应，客户端ETag未变化时返回304
+        body = await cached_query(
+            request, response, ("model-parameters", heat_exchanger_id, day),
+            'model_parameters', heat_exchanger_id, None, None, query, params
+        )
+        if body is not None:
+            return body
         else:
             raise HTTPException(
                 status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -467,33 +1395,94 @@ async def get_model_parameters(heat_exchanger_id: int = 1, day: int = None):
             }
         )
 
-@app.get("/calculate-performance/{day}/{hour}", summary="计算指定时间的性能", description="计算指定天数和小时的换热器性能")
-async def calculate_performance(day: int, hour: int):
+@app.get("/calculate-performance/{day}/{hour}", dependencies=[Depends(require_ready)],
+         status_code=status.HTTP_202_ACCEPTED, summary="计算指定时间的性能",
+         description="提交计算指定天数和小时换热器性能的后台任务，立即返回任务ID")
+async def calculate_performance(day: int, hour: int, heat_exchanger_id: Optional[int] = None):
     try:
         # 验证参数
-        if day < 1 or day > 365:
-            raise ValueError("day参数必须在1-365之间")
+        max_days = config.get('max_days', 800)
+        if day < 1 or day > max_days:
+            raise ValueError(f"day参数必须在1-{max_days}之间")
         if hour < 0 or hour > 23:
             raise ValueError("hour参数必须在0-23之间")
-            
-        success = calculator.run_calculation(day, hour)
-        if success:
-            return {
-                "status": "success",
-                "message": f"第{day}天第{hour}小时的性能计算完成",
-                "day": day,
-                "hour": hour
+        
+        # 登记为后台任务后立即返回，通过/jobs/{job_id}查询状态
+        heat_exchanger_id = await resolve_job_heat_exchanger_id(heat_exchanger_id)
+        job = job_queue.submit("calculate-performance", heat_exchanger_id, day, hour)
+        return {
+            "status": "accepted",
+            "message": f"第{day}天第{hour}小时的性能计算任务已提交",
+            "job_id": job["job_id"],
+            "job": job
+        }
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail={
+                "code": "INVALID_PARAMETERS",
+                "type": "BadRequest",
+                "message": str(e),
+                "timestamp": datetime.now().isoformat()
+            }
+        )
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail={
+                "code": "INTERNAL_SERVER_ERROR",
+                "type": "InternalServerError",
+                "message": str(e),
+                "timestamp": datetime.now().isoformat()
             }
+        )
+
+# 假设工况预测单次请求的最大工况数
+WHAT_IF_MAX_SCENARIOS = config.get('what_if_max_scenarios', 100000)
+
+class WhatIfRequest(BaseModel):
+    """假设工况预测请求，各数组按下标一一对应"""
+    points: List[int]
+    reynolds: Optional[List[float]] = None
+    velocity: Optional[List[float]] = None
+    temperature: Optional[List[float]] = None
+
+@app.post("/what-if", dependencies=[Depends(require_ready)],
+          summary="假设工况预测", description="按当前模型参数向量化预测给定流速/温度或雷诺数下的K_predicted和alpha_i，不读写数据库")
+async def predict_what_if(request: WhatIfRequest):
+    try:
+        # 验证参数
+        count = len(request.points)
+        if count == 0:
+            raise ValueError("points不能为空")
+        if count > WHAT_IF_MAX_SCENARIOS:
+            raise ValueError(f"单次最多预测{WHAT_IF_MAX_SCENARIOS}个工况")
+        if request.reynolds is None and request.velocity is None:
+            raise ValueError("必须提供reynolds或velocity")
+        for name in ("reynolds", "velocity", "temperature"):
+            values = getattr(request, name)
+            if values is not None and len(values) != count:
+                raise ValueError(f"{name}的长度必须与points相同")
+        
+        if request.reynolds is not None:
+            # 直接给出雷诺数时只有向量运算，在当前线程中执行即可
+            result = calculator.predict_scenarios(request.points, request.reynolds)
         else:
-            raise HTTPException(
-                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                detail={
-                    "code": "PERFORMANCE_CALCULATION_FAILED",
-                    "type": "InternalServerError",
-                    "message": "性能计算失败",
-                    "timestamp": datetime.now().isoformat()
-                }
+            # 按温度计算物性时较慢，放到计算线程池中执行，不占用查询线程
+            result = await run_in_executor(
+                compute_executor, calculator.predict_scenarios,
+                request.points, request.reynolds, request.velocity, request.temperature
             )
+        return {
+            "status": "success",
+            "count": count,
+            "data": {
+                "points": request.points,
+                "reynolds": result["reynolds"].tolist(),
+                "K_predicted": result["K_predicted"].tolist(),
+                "alpha_i": result["alpha_i"].tolist()
+            }
+        }
     except ValueError as e:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -0,0 +1,43 @@
+import numpy as np
+
+
+def lttb_indices(x, y, threshold):
+    """Largest-Triangle-Three-Buckets降采样，返回保留点的下标
+
+    首尾两点固定保留，其余点均分为threshold-2个桶，每个桶中保留与上一个保留点、
+    下一个桶平均点构成三角形面积最大的点，能在点数大幅减少时保持曲线的视觉形状。
+
+    参数:
+        x: 按升序排列的横坐标数组（如时间戳秒数）
+        y: 纵坐标数组
+        threshold: 目标点数
+
+    返回值: 保留点的下标数组（升序）
+    """
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+
+    # 第k个桶的起始下标，最后一个元素为n-1（最后一个点单独成桶）；用整数运算，避免浮点误差使边界偏移
+    edges = 1 + (np.arange(threshold - 1) * (n - 2)) // (threshold - 2)
+
+    indices = np.empty(threshold, dtype=int)
+    indices[0] = 0
+    indices[-1] = n - 1
+    a = 0
+    for i in range(threshold - 2):
+        start, end = edges[i], edges[i + 1]
+        next_end = edges[i + 2] if i + 2 < len(edges) else n
+        avg_x = x[end:next_end].mean()
+        avg_y = y[end:next_end].mean()
+
+        # 以上一个保留点a和下一桶平均点为顶点，计算桶内各点构成的三角形面积（省略常数1/2）
+        area = np.abs(
+            (x[a] - avg_x) * (y[start:end] - y[a])
+            - (x[a] - x[start:end]) * (avg_y - y[a])
+        )
+        a = start + int(np.argmax(area))
+        indices[i + 1] = a
+    return indices
@@ -0,0 +1,115 @@
+import asyncio
+import itertools
+import json
+import threading
+from collections import deque
+
+
+class _Subscriber:
+    """一个SSE客户端的有界事件队列"""
+    def __init__(self, queue_size, heat_exchanger_id=None):
+        self.queue = asyncio.Queue(maxsize=queue_size)
+        self.heat_exchanger_id = heat_exchanger_id
+        # 队列满时置位，客户端随后断开，重连时通过Last-Event-ID补发
+        self.lagged = False
+
+
+class EventBroadcaster:
+    """Server-Sent Events事件广播器
+
+    计算线程调用publish发布事件，事件在事件循环线程中分发给各客户端的有界队列。
+    客户端处理过慢导致队列满时断开该客户端，不阻塞发布方和其他客户端；最近的事件保存在
+    环形缓冲区中，客户端带Last-Event-ID重连即可补发断开期间的事件。
+    """
+    def __init__(self, client_queue_size=100, history_size=500, heartbeat_seconds=15):
+        """
+        参数:
+            client_queue_size: 每个客户端最多积压的事件数
+            history_size: 用于断线补发的最近事件数
+            heartbeat_seconds: 没有事件时发送心跳注释的间隔（秒）
+        """
+        self.client_queue_size = client_queue_size
+        self.heartbeat_seconds = heartbeat_seconds
+        self.loop = None
+
+        self._subscribers = set()
+        self._history = deque(maxlen=history_size)
+        self._event_ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def bind_loop(self, loop):
+        """绑定分发事件的事件循环，应在应用启动时调用"""
+        self.loop = loop
+
+    def publish(self, event, data, heat_exchanger_id=None):
+        """发布事件，可在任意线程中调用
+
+        参数:
+            event: 事件类型
+            data: 事件数据，可JSON序列化的字典
+            heat_exchanger_id: 事件所属换热器，用于客户端过滤
+        """
+        with self._lock:
+            item = (next(self._event_ids), event, json.dumps(data, default=str, ensure_ascii=False), heat_exchanger_id)
+            self._history.append(item)
+        if self.loop is not None and not self.loop.is_closed():
+            self.loop.call_soon_threadsafe(self._dispatch, item)
+
+    def _dispatch(self, item):
+        for subscriber in list(self._subscribers):
+            if subscriber.heat_exchanger_id is not None and item[3] not in (None, subscriber.heat_exchanger_id):
+                continue
+            try:
+                subscriber.queue.put_nowait(item)
+            except asyncio.QueueFull:
+                subscriber.lagged = True
+                self._subscribers.discard(subscriber)
+
+    @staticmethod
+    def format_event(item):
+        """格式化为SSE消息"""
+        event_id, event, data, _ = item
+        return f"id: {event_id}\nevent: {event}\ndata: {data}\n\n"
+
+    def client_count(self):
+        """当前连接的客户端数"""
+        return len(self._subscribers)
+
+    async def subscribe(self, last_event_id=None, heat_exchanger_id=None, is_disconnected=None):
+        """订阅事件流，产出SSE格式的字符串
+
+        参数:
+            last_event_id: 客户端收到的最后一个事件ID，提供时先补发之后的事件
+            heat_exchanger_id: 只接收该换热器的事件，为None时接收全部
+            is_disconnected: 返回客户端是否已断开的协程函数
+        """
+        subscriber = _Subscriber(self.client_queue_size, heat_exchanger_id)
+        # 先登记再读取历史，分发在同一事件循环线程中执行，不会漏掉事件
+        self._subscribers.add(subscriber)
+        last_sent = 0
+        try:
+            yield f"retry: {self.heartbeat_seconds * 1000}\n\n"
+            if last_event_id is not None:
+                with self._lock:
+                    missed = [item for item in self._history if item[0] > last_event_id]
+                for item in missed:
+                    if heat_exchanger_id is not None and item[3] not in (None, heat_exchanger_id):
+                        continue
+                    last_sent = item[0]
+                    yield self.format_event(item)
+
+            while not subscriber.lagged:
+                try:
+                    item = await asyncio.wait_for(subscriber.queue.get(), timeout=self.heartbeat_seconds)
+                except asyncio.TimeoutError:
+                    if is_disconnected is not None and await is_disconnected():
+                        break
+                    yield ": heartbeat\n\n"
+                    continue
+                # 补发的事件可能与队列中的重复
+                if item[0] <= last_sent:
+                    continue
+                last_sent = item[0]
+                yield self.format_event(item)
+        finally:
+            self._subscribers.discard(subscriber)
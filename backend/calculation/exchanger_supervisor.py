@@ -0,0 +1,166 @@
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from .main_calculator import MainCalculator
+from db.data_loader import DataLoader
+from db.db_connection import DatabaseConnection
+
+def _process_exchanger_chunk(config_file, heat_exchanger_id, hours, discard_no_k):
+    """在工作进程中处理某个换热器的一段连续小时
+
+    参数:
+        config_file: 配置文件路径
+        heat_exchanger_id: 换热器ID
+        hours: [(day, hour), ...]，按处理顺序排列
+        discard_no_k: 是否弃用没有K值的数据
+
+    返回值: 包含heat_exchanger_id, processed, succeeded, elapsed的统计字典
+    """
+    start_time = time.time()
+    # 每个分块新建计算器并在结束时关闭，工作进程不长期持有各换热器的数据库连接和物化线程；
+    # 上一个分块可能由其他工作进程处理，计算器创建时从数据库恢复该换热器最新的阶段状态
+    calculator = MainCalculator(config_file, heat_exchanger_id=heat_exchanger_id)
+    try:
+        results = calculator.process_hours_pipelined(hours, discard_no_k)
+    finally:
+        calculator.close()
+    return {
+        'heat_exchanger_id': heat_exchanger_id,
+        'processed': len(hours),
+        'succeeded': sum(1 for success in results.values() if success),
+        'elapsed': time.time() - start_time
+    }
+
+
+class ExchangerSupervisor:
+    """多换热器并行处理调度器
+
+    每个换热器是一条独立的处理流水线（几何参数、模型参数、阶段状态各自独立），
+    按小时顺序切成分块后提交到进程池。同一换热器同一时刻最多只有一个分块在执行，
+    保证其阶段切换顺序不变；不同换热器之间轮转调度，避免某个换热器长期占用工作进程。
+    """
+    def __init__(self, config_file, heat_exchanger_ids=None, max_workers=None, chunk_hours=None):
+        """
+        参数:
+            config_file: 配置文件路径
+            heat_exchanger_ids: 要处理的换热器ID列表，为None时处理heat_exchanger表中的全部换热器
+            max_workers: 工作进程数，为None时使用配置项supervisor_max_workers，仍为空则使用CPU核数
+            chunk_hours: 每个分块包含的小时数，为None时使用配置项supervisor_chunk_hours
+        """
+        self.config_file = config_file
+        with open(config_file, 'r', encoding='utf-8') as f:
+            self.config = json.load(f)
+
+        known_ids = self.load_heat_exchanger_ids()
+        if heat_exchanger_ids is None:
+            heat_exchanger_ids = known_ids or [1]
+        elif known_ids is not None:
+            # 不存在的换热器在工作进程中无法创建计算器，提交分块前拒绝
+            unknown_ids = [heat_exchanger_id for heat_exchanger_id in heat_exchanger_ids if heat_exchanger_id not in known_ids]
+            if unknown_ids:
+                raise ValueError(f"换热器{', '.join(str(heat_exchanger_id) for heat_exchanger_id in unknown_ids)}不存在")
+        self.heat_exchanger_ids = list(heat_exchanger_ids)
+
+        self.max_workers = max_workers or self.config.get('supervisor_max_workers') or os.cpu_count() or 1
+        self.chunk_hours = max(1, chunk_hours or self.config.get('supervisor_chunk_hours', 24))
+
+        # 各换热器的处理进度
+        self.progress = {
+            heat_exchanger_id: {'total': 0, 'processed': 0, 'succeeded': 0, 'elapsed': 0.0, 'running': False}
+            for heat_exchanger_id in self.heat_exchanger_ids
+        }
+
+    def load_heat_exchanger_ids(self):
+        """从生产数据库的heat_exchanger表读取全部换热器ID，连接失败时返回None"""
+        db_conn = DatabaseConnection(self.config)
+        if not db_conn.connect_prod_db():
+            print("读取换热器列表失败，未指定换热器时使用默认换热器ID 1")
+            return None
+        try:
+            heat_exchangers = DataLoader(db_conn).get_all_heat_exchangers()
+            return [he['id'] for he in heat_exchangers]
+        finally:
+            db_conn.disconnect_prod_db()
+
+    @staticmethod
+    def build_hours(start_day, start_hour, end_day, end_hour):
+        """生成从(start_day, start_hour)到(end_day, end_hour)（含）的小时列表"""
+        hours = []
+        day, hour = start_day, start_hour
+        while (day, hour) <= (end_day, end_hour):
+            hours.append((day, hour))
+            hour += 1
+            if hour > 23:
+                day, hour = day + 1, 0
+        return hours
+
+    def get_progress(self):
+        """返回各换热器处理进度的副本"""
+        return {heat_exchanger_id: dict(progress) for heat_exchanger_id, progress in self.progress.items()}
+
+    def run(self, start_day, start_hour, end_day, end_hour, discard_no_k=False):
+        """并行处理全部换热器在指定时间范围内的数据
+
+        参数:
+            start_day, start_hour: 起始天数和小时
+            end_day, end_hour: 结束天数和小时（含）
+            discard_no_k: 是否弃用没有K值的数据
+
+        返回值: 各换热器的处理进度
+        """
+        hours = self.build_hours(start_day, start_hour, end_day, end_hour)
+        chunks = [hours[i:i + self.chunk_hours] for i in range(0, len(hours), self.chunk_hours)]
+
+        # 每个换热器一个待处理分块队列
+        pending = {heat_exchanger_id: list(chunks) for heat_exchanger_id in self.heat_exchanger_ids}
+        for heat_exchanger_id in self.heat_exchanger_ids:
+            self.progress[heat_exchanger_id].update(
+                total=len(hours), processed=0, succeeded=0, elapsed=0.0, running=False
+            )
+
+        print(f"开始并行处理{len(self.heat_exchanger_ids)}个换热器，"
+              f"共{len(hours)}小时，{self.max_workers}个工作进程，每块{self.chunk_hours}小时")
+
+        with ProcessPoolExecutor(max_workers=self.max_workers) as executor:
+            in_flight = {}
+            # 轮转顺序：刚完成分块的换热器排到队尾
+            rotation = list(self.heat_exchanger_ids)
+
+            def submit_ready():
+                for heat_exchanger_id in list(rotation):
+                    if len(in_flight) >= self.max_workers:
+                        break
+                    if self.progress[heat_exchanger_id]['running'] or not pending[heat_exchanger_id]:
+                        continue
+                    chunk = pending[heat_exchanger_id].pop(0)
+                    future = executor.submit(
+                        _process_exchanger_chunk, self.config_file, heat_exchanger_id, chunk, discard_no_k
+                    )
+                    in_flight[future] = heat_exchanger_id
+                    self.progress[heat_exchanger_id]['running'] = True
+                    rotation.remove(heat_exchanger_id)
+                    rotation.append(heat_exchanger_id)
+
+            submit_ready()
+            while in_flight:
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    heat_exchanger_id = in_flight.pop(future)
+                    progress = self.progress[heat_exchanger_id]
+                    progress['running'] = False
+                    try:
+                        stats = future.result()
+                    except Exception as e:
+                        # 该换热器后续分块依赖本块的阶段状态，出错后停止处理该换热器
+                        print(f"换热器{heat_exchanger_id}处理失败: {e}")
+                        pending[heat_exchanger_id] = []
+                        continue
+                    progress['processed'] += stats['processed']
+                    progress['succeeded'] += stats['succeeded']
+                    progress['elapsed'] += stats['elapsed']
+                    print(f"换热器{heat_exchanger_id}进度: {progress['processed']}/{progress['total']}小时，"
+                          f"成功{progress['succeeded']}小时")
+                submit_ready()
+
+        return self.get_progress()
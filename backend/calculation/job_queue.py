@@ -0,0 +1,159 @@
+import itertools
+import queue
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from datetime import datetime
+
+
+class CalculationJobQueue:
+    """后台计算任务队列
+
+    API把数据处理和性能计算请求登记为任务后立即返回任务ID。每个换热器一个工作线程，
+    按提交顺序逐个执行该换热器的任务（同一换热器的阶段状态依赖处理顺序），
+    不同换热器之间并行。任务状态、进度和耗时可随时查询。
+    """
+    # 任务状态
+    QUEUED = "queued"
+    RUNNING = "running"
+    SUCCEEDED = "succeeded"
+    FAILED = "failed"
+
+    def __init__(self, calculator_factory, history_size=1000):
+        """
+        参数:
+            calculator_factory: 根据换热器ID返回MainCalculator的函数，每个换热器只调用一次
+            history_size: 保留的已结束任务数，超出后删除最早结束的任务
+        """
+        self.calculator_factory = calculator_factory
+        self.history_size = history_size
+
+        self._lock = threading.Lock()
+        self._jobs = OrderedDict()
+        self._queues = {}
+        self._workers = {}
+        self._sequence = itertools.count(1)
+
+    def submit(self, job_type, heat_exchanger_id, day, hour):
+        """提交任务
+
+        参数:
+            job_type: 'process-data' 或 'calculate-performance'
+            heat_exchanger_id: 换热器ID
+            day, hour: 要处理的天数和小时
+
+        返回值: 任务信息字典
+        """
+        job = {
+            'job_id': uuid.uuid4().hex,
+            'sequence': next(self._sequence),
+            'type': job_type,
+            'heat_exchanger_id': heat_exchanger_id,
+            'day': day,
+            'hour': hour,
+            'status': self.QUEUED,
+            'progress': {'completed': 0, 'total': 1},
+            'message': None,
+            'created_at': datetime.now().isoformat(),
+            'started_at': None,
+            'finished_at': None,
+            'queued_seconds': None,
+            'elapsed_seconds': None
+        }
+        with self._lock:
+            self._jobs[job['job_id']] = job
+            job_queue = self._queues.get(heat_exchanger_id)
+            if job_queue is None:
+                job_queue = queue.Queue()
+                self._queues[heat_exchanger_id] = job_queue
+                worker = threading.Thread(
+                    target=self._worker, args=(heat_exchanger_id, job_queue),
+                    name=f"calculation-jobs-{heat_exchanger_id}", daemon=True
+                )
+                self._workers[heat_exchanger_id] = worker
+                worker.start()
+            job_queue.put(job['job_id'])
+            return dict(job)
+
+    def get_job(self, job_id):
+        """查询任务，不存在时返回None"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return dict(job) if job else None
+
+    def list_jobs(self, heat_exchanger_id=None, status=None):
+        """按提交顺序列出任务，可按换热器和状态过滤"""
+        with self._lock:
+            return [
+                dict(job) for job in self._jobs.values()
+                if (heat_exchanger_id is None or job['heat_exchanger_id'] == heat_exchanger_id)
+                and (status is None or job['status'] == status)
+            ]
+
+    def pending_count(self, heat_exchanger_id=None):
+        """统计排队中和执行中的任务数"""
+        return len([
+            job for job in self.list_jobs(heat_exchanger_id)
+            if job['status'] in (self.QUEUED, self.RUNNING)
+        ])
+
+    def _update(self, job_id, **fields):
+        with self._lock:
+            self._jobs[job_id].update(fields)
+
+    def _prune(self):
+        """删除超出保留数量的已结束任务"""
+        with self._lock:
+            finished = [
+                job_id for job_id, job in self._jobs.items()
+                if job['status'] in (self.SUCCEEDED, self.FAILED)
+            ]
+            for job_id in finished[:max(0, len(finished) - self.history_size)]:
+                del self._jobs[job_id]
+
+    def _worker(self, heat_exchanger_id, job_queue):
+        calculator = None
+        while True:
+            job_id = job_queue.get()
+            job = self.get_job(job_id)
+            started = time.time()
+            self._update(
+                job_id,
+                status=self.RUNNING,
+                started_at=datetime.now().isoformat(),
+                queued_seconds=round(started - datetime.fromisoformat(job['created_at']).timestamp(), 3)
+            )
+            try:
+                if calculator is None:
+                    calculator = self.calculator_factory(heat_exchanger_id)
+                # 训练后重新处理历史数据时，进度按重新处理的小时数更新
+                calculator.set_progress_callback(
+                    lambda completed, total: self._update(job_id, progress={'completed': completed, 'total': total})
+                )
+                if job['type'] == 'process-data':
+                    success = calculator.process_data_by_hour(job['day'], job['hour'])
+                else:
+                    success = calculator.run_calculation(job['day'], job['hour'])
+                self._update(
+                    job_id,
+                    status=self.SUCCEEDED if success else self.FAILED,
+                    message=None if success else "数据处理失败"
+                )
+            except Exception as e:
+                print(f"任务{job_id}执行失败: {e}")
+                self._update(job_id, status=self.FAILED, message=str(e))
+            finally:
+                if calculator is not None:
+                    calculator.set_progress_callback(None)
+                with self._lock:
+                    progress = self._jobs[job_id]['progress']
+                    if self._jobs[job_id]['status'] == self.SUCCEEDED:
+                        progress = {'completed': progress['total'], 'total': progress['total']}
+                    self._jobs[job_id].update(
+                        progress=progress,
+                        finished_at=datetime.now().isoformat(),
+                        elapsed_seconds=round(time.time() - started, 3)
+                    )
+                self._prune()
+                job_queue.task_done()
@@ -0,0 +1,235 @@
+import json
+import threading
+import numpy as np
+from db.data_loader import DataLoader
+from db.db_connection import DatabaseConnection
+from db import time_keys
+
+
+class KPredictedMaterializer:
+    """K_predicted惰性物化器
+
+    模型参数更新后不再立即重写受影响小时的K_predicted和K，而是在k_predicted_stale_ranges表中
+    记录一行待刷新区间（含当时的模型参数）。读取时按区间内的参数即时计算K_predicted，
+    后台线程再按区间顺序把结果批量写回k_management和performance_parameters。
+    """
+    def __init__(self, config, nonlinear_calc, interval=30, heat_exchanger_id=None):
+        self.config = config
+        self.nonlinear_calc = nonlinear_calc
+        self.interval = interval
+        # 指定换热器时只物化该换热器的待刷新区间
+        self.heat_exchanger_id = heat_exchanger_id
+
+        # 后台线程使用独立的生产数据库连接
+        self.db_conn = None
+        self.data_loader = None
+
+        self._lock = threading.Lock()
+        self._wake_event = threading.Event()
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    def _ensure_connection(self):
+        """建立物化器自己的生产数据库连接"""
+        if self.data_loader is not None:
+            return True
+        self.db_conn = DatabaseConnection(self.config)
+        if not self.db_conn.connect_prod_db():
+            self.db_conn = None
+            return False
+        self.data_loader = DataLoader(self.db_conn, self.heat_exchanger_id)
+        return True
+
+    def start(self):
+        """启动后台物化线程"""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name="k-predicted-materializer", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """停止后台物化线程并关闭连接"""
+        self._stop_event.set()
+        self._wake_event.set()
+        if self._thread and self._thread.is_alive():
+            self._thread.join(timeout=self.interval)
+        self._thread = None
+        if self.db_conn:
+            self.db_conn.disconnect_prod_db()
+            self.db_conn = None
+            self.data_loader = None
+
+    def notify(self):
+        """通知后台线程有新的待刷新区间"""
+        self._wake_event.set()
+
+    def _run(self):
+        while not self._stop_event.is_set():
+            self._wake_event.wait(self.interval)
+            self._wake_event.clear()
+            if self._stop_event.is_set():
+                break
+            try:
+                self.materialize_pending()
+            except Exception as e:
+                print(f"后台物化K_predicted失败: {e}")
+
+    @staticmethod
+    def timestamp_to_day(timestamp):
+        """将时间戳换算为天数（第1天为配置的基准日期当天）"""
+        return time_keys.timestamp_to_day(timestamp)
+
+    @staticmethod
+    def params_for_points(model_params, points):
+        """从区间记录的参数快照中取出指定points的模型参数"""
+        return model_params.get('points', {}).get(str(points)) or model_params.get('default')
+
+    def predict_rows(self, reynolds_rows, model_params):
+        """按points分组向量化计算K_predicted和alpha_i
+
+        参数:
+            reynolds_rows: 含heat_exchanger_id, timestamp, points, side, reynolds的记录列表
+            model_params: 区间记录中的参数快照
+
+        返回值: {(heat_exchanger_id, timestamp, points, side): (K_predicted, alpha_i)}
+        """
+        grouped = {}
+        for row in reynolds_rows:
+            grouped.setdefault(row['points'], []).append(row)
+
+        predictions = {}
+        for points, rows in grouped.items():
+            params = self.params_for_points(model_params, points)
+            if not params:
+                continue
+            Re = np.array([row.get('reynolds') or 0 for row in rows], dtype=float)
+            K_pred, alpha_i = self.nonlinear_calc.predict_K_vectorized(Re, params['a'], params['p'], params['b'])
+            for row, k_value, alpha_value in zip(rows, K_pred, alpha_i):
+                key = (row['heat_exchanger_id'], row['timestamp'], row['points'], row['side'])
+                predictions[key] = (float(k_value), float(alpha_value))
+        return predictions
+
+    def materialize_pending(self, start_date=None, end_date=None):
+        """将待刷新区间的K_predicted写回数据库
+
+        参数:
+            start_date, end_date: 只处理与该时间范围重叠的区间，为None时处理全部区间
+
+        返回值: 已物化的区间数
+        """
+        with self._lock:
+            if not self._ensure_connection():
+                print("物化器连接生产数据库失败")
+                return 0
+
+            # 结束上一个事务，确保能读到其他连接已提交的数据
+            self.db_conn.commit(self.db_conn.prod_db)
+
+            pending_ranges = self.data_loader.get_pending_k_predicted_ranges(start_date, end_date)
+            if not pending_ranges:
+                return 0
+
+            materialized_ids = []
+            for stale_range in pending_ranges:
+                model_params = json.loads(stale_range['model_params'])
+                reynolds_rows = self.data_loader.get_tube_reynolds_by_range(
+                    stale_range['start_time'],
+                    stale_range['end_time'],
+                    points=stale_range['points'],
+                    heat_exchanger_id=stale_range['heat_exchanger_id']
+                )
+                predictions = self.predict_rows(reynolds_rows, model_params)
+
+                k_management_update = []
+                performance_update = []
+                for (heat_exchanger_id, timestamp, points, side), (K_predicted, alpha_i) in predictions.items():
+                    k_management_update.append({
+                        'heat_exchanger_id': heat_exchanger_id,
+                        'timestamp': timestamp,
+                        'points': points,
+                        'side': side,
+                        'K_predicted': K_predicted
+                    })
+                    performance_update.append({
+                        'heat_exchanger_id': heat_exchanger_id,
+                        'timestamp': timestamp,
+                        'points': points,
+                        'side': side,
+                        'K': K_predicted,
+                        'alpha_i': alpha_i,
+                        'fouling_resistance': self.nonlinear_calc.calculate_fouling_resistance(self.timestamp_to_day(timestamp))
+                    })
+
+                if not self.data_loader.update_k_management_with_predicted(k_management_update):
+                    break
+                if not self.data_loader.update_performance_parameters_prediction(performance_update):
+                    break
+                materialized_ids.append(stale_range['id'])
+
+            self.data_loader.mark_k_predicted_ranges_materialized(materialized_ids)
+            print(f"已物化{len(materialized_ids)}个K_predicted待刷新区间")
+            return len(materialized_ids)
+
+    def apply_stale_overlay(self, rows, data_loader, table):
+        """对仍处于待刷新区间内的记录即时计算K_predicted，保证读取到的是当前模型的结果
+
+        参数:
+            rows: 从k_management或performance_parameters查询得到的记录列表
+            data_loader: 调用方使用的数据加载器
+            table: 'k_management' 或 'performance_parameters'
+
+        返回值: 覆盖后的记录列表（原地修改）
+        """
+        tube_rows = [row for row in rows if str(row.get('side', '')).lower() == 'tube']
+        if not tube_rows:
+            return rows
+
+        start_date = min(row['timestamp'] for row in tube_rows)
+        end_date = max(row['timestamp'] for row in tube_rows)
+        pending_ranges = data_loader.get_pending_k_predicted_ranges(start_date, end_date)
+        if not pending_ranges:
+            return rows
+
+        # 对每条记录取覆盖它的最新区间（按id顺序，后写入的区间覆盖先写入的）
+        rows_by_range = {}
+        for row in tube_rows:
+            covering = None
+            for stale_range in pending_ranges:
+                if stale_range['heat_exchanger_id'] != row['heat_exchanger_id']:
+                    continue
+                if stale_range['points'] is not None and stale_range['points'] != row['points']:
+                    continue
+                if stale_range['start_time'] <= row['timestamp'] <= stale_range['end_time']:
+                    covering = stale_range
+            if covering is not None:
+                rows_by_range.setdefault(covering['id'], (covering, []))[1].append(row)
+        if not rows_by_range:
+            return rows
+
+        reynolds_rows = data_loader.get_tube_reynolds_by_range(start_date, end_date)
+        reynolds_map = {
+            (r['heat_exchanger_id'], r['timestamp'], r['points']): r for r in reynolds_rows
+        }
+
+        for stale_range, range_rows in rows_by_range.values():
+            matched = [
+                reynolds_map[key] for key in
+                ((row['heat_exchanger_id'], row['timestamp'], row['points']) for row in range_rows)
+                if key in reynolds_map
+            ]
+            predictions = self.predict_rows(matched, json.loads(stale_range['model_params']))
+            for row in range_rows:
+                key = (row['heat_exchanger_id'], row['timestamp'], row['points'], row['side'])
+                if key not in predictions:
+                    continue
+                K_predicted, alpha_i = predictions[key]
+                if table == 'k_management':
+                    row['K_predicted'] = K_predicted
+                else:
+                    row['K'] = K_predicted
+                    row['alpha_i'] = alpha_i
+                    row['fouling_resistance'] = self.nonlinear_calc.calculate_fouling_resistance(
+                        self.timestamp_to_day(row['timestamp'])
+                    )
+        return rows
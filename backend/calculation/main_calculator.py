@@ -1,18 +1,35 @@
+import hashlib
 import json
 import os
+import queue
+import threading
 import numpy as np
 from datetime import datetime
 import pandas as pd
 from .lmtd_calculator import LMTDCalculator
 from .nonlinear_regression import NonlinearRegressionCalculator
+from .k_predicted_materializer import KPredictedMaterializer
+from .model_param_store import open_model_store
 from db.data_loader import DataLoader
 from db.db_connection import DatabaseConnection
+from db import time_keys
+
+# 流水线队列结束标记
+_PIPELINE_END = object()
 
 class MainCalculator:
-    def __init__(self, config_file):
+    def __init__(self, config_file, heat_exchanger_id=None):
+        """
+        参数:
+            config_file: 配置文件路径
+            heat_exchanger_id: 要处理的换热器ID，为None时使用heat_exchanger表中的第一个换热器，
+                               且读取数据时不按换热器过滤（单换热器部署）
+        """
         # 加载配置
         with open(config_file, 'r', encoding='utf-8') as f:
             self.config = json.load(f)
+        # 天数和小时按配置的基准日期换算为真实时间
+        time_keys.configure(self.config)
         
         # 初始化数据库连接
         self.db_conn = DatabaseConnection(self.config)
@@ -27,11 +44,22 @@ class MainCalculator:
         print(f"生产数据库游标状态: {self.db_conn.prod_cursor is not None}")
         
         # 初始化数据加载器
-        self.data_loader = DataLoader(self.db_conn)
+        self.data_loader = DataLoader(self.db_conn, heat_exchanger_id)
         
         # 获取换热器信息
         self.heat_exchangers = self.data_loader.get_all_heat_exchangers()
-        self.heat_exchanger = self.heat_exchangers[0] if self.heat_exchangers else {}
+        if heat_exchanger_id is not None:
+            self.heat_exchanger = next(
+                (he for he in self.heat_exchangers if he.get('id') == heat_exchanger_id), None
+            )
+            if self.heat_exchanger is None:
+                # 没有几何参数无法计算换热面积和传热系数，创建时即拒绝
+                self.close()
+                if not prod_db_result:
+                    raise ConnectionError(f"连接生产数据库失败，无法读取换热器{heat_exchanger_id}的参数")
+                raise ValueError(f"换热器{heat_exchanger_id}不存在")
+        else:
+            self.heat_exchanger = self.heat_exchangers[0] if self.heat_exchangers else {}
         self.geometry_params = self.heat_exchanger if self.heat_exchanger else {}
         
         # 初始化计算器
@@ -45,6 +73,10 @@ class MainCalculator:
         self.history_days = self.config.get('history_days', 3)
         self.stage1_error_threshold = self.config.get('stage1_error_threshold', 5)
         self.stage1_history_days = self.config.get('stage1_history_days', 5)
+        # 读取/计算/写入流水线各级之间的队列长度
+        self.pipeline_queue_size = self.config.get('pipeline_queue_size', 4)
+        # 输入数据和模型参数都未变化的小时直接跳过
+        self.skip_unchanged_hours = self.config.get('skip_unchanged_hours', True)
         
         # 初始化模型参数
         self.model_params = None
@@ -57,25 +89,16 @@ class MainCalculator:
         # 计算换热面积
         self.calculate_heat_exchanger_area()
         
-        # 尝试从数据库加载已训练的模型参数
-        self.load_model_parameters_from_db()
+        # 最近一次完成处理的天数和小时（用于重启后继续处理）
+        self.current_day = None
+        self.current_hour = None
+        self.model_version = 0
         
-        try:
-            # 查询最新的模型参数
-            query = "SELECT a, p, b FROM model_parameters ORDER BY timestamp DESC LIMIT 1"
-            self.db_conn.prod_cursor.execute(query)
-            result = self.db_conn.prod_cursor.fetchone()
-            
-            if result:
-                self.model_params = {
-                    'a': result[0],
-                    'p': result[1],
-                    'b': result[2]
-                }
-                print(f"从数据库加载已训练的模型参数: a={self.model_params['a']:.6f}, p={self.model_params['p']:.6f}, b={self.model_params['b']:.6f}")
-        except Exception as e:
-            print(f"加载模型参数失败: {e}")
-            self.model_params = None
+        # 优先从持久化的流水线状态快照恢复，没有快照时再从model_parameters表加载
+        if not self.load_pipeline_state():
+            self.load_model_parameters_from_db()
+            self.load_latest_model_parameters()
+            self.model_version = self.data_loader.get_latest_model_version()
         
         # 初始化训练数据
         self.training_data = []
@@ -83,13 +106,33 @@ class MainCalculator:
         # 标记是否正在重新处理历史数据，避免无限循环
         self.reprocessing_history = False
         
-        # 获取所有换热器ID
-        self.heat_exchanger_ids = [1]  # 默认使用ID为1的换热器
+        # 当前计算器负责的换热器ID
+        self.heat_exchanger_ids = [self.heat_exchanger.get('id', 1)]
         
         # 回调函数，用于通知stage1/stage2完成
         self.on_stage1_complete_callback = None
         self.on_stage2_complete_callback = None
         self.on_error_retrain_complete_callback = None
+        # 批量处理进度回调，参数为(已处理小时数, 总小时数)
+        self.progress_callback = None
+        # 某小时结果提交后的回调，参数为(day, hour, 该小时的计算结果)
+        self.on_hour_processed_callback = None
+        # 模型参数更新后的回调，参数为事件信息字典
+        self.on_model_updated_callback = None
+        
+        # 模型更新后K_predicted的刷新方式：惰性刷新时只记录待刷新区间，由后台线程物化
+        self.lazy_k_predicted = self.config.get('lazy_k_predicted', True)
+        self.k_materializer = KPredictedMaterializer(
+            self.config, self.nonlinear_calc, self.config.get('k_predicted_materialize_interval', 30),
+            heat_exchanger_id=heat_exchanger_id
+        )
+        if self.lazy_k_predicted:
+            self.k_materializer.start()
+        
+        # 模型参数发布到按换热器划分的共享存储，其他进程（多个API工作进程等）不查询数据库即可读取最新模型
+        self.model_store = open_model_store(self.config, self.heat_exchanger.get('id', 1))
+        if self.model_store is not None and self.stored_model_version() < self.model_version:
+            self.publish_model_parameters()
     
     def load_config(self):
         """加载配置文件"""
@@ -99,29 +142,30 @@ class MainCalculator:
     def load_model_parameters_from_db(self):
         """从数据库加载按points分组的模型参数"""
         try:
-            # 查询所有points的模型参数
+            # 查询当前换热器所有points的模型参数
             query = """
             SELECT points, a, p, b, timestamp 
             FROM model_parameters 
             WHERE side = 'tube'
-            ORDER BY points DESC, timestamp DESC
             """
-            self.db_conn.prod_cursor.execute(query)
+            exchanger_sql, params = self.data_loader.exchanger_filter()
+            query += exchanger_sql + " ORDER BY points DESC, timestamp DESC"
+            self.db_conn.prod_cursor.execute(query, params)
             results = self.db_conn.prod_cursor.fetchall()
             
             if results:
-                # 为每个points获取最新的模型参数
+                # 为每个points获取最新的模型参数（游标返回字典行）
                 seen_points = set()
                 for row in results:
-                    points = row[0]
+                    points = row['points']
                     if points not in seen_points:
                         seen_points.add(points)
                         self.points_model_params[points] = {
-                            'a': row[1],
-                            'p': row[2],
-                            'b': row[3]
+                            'a': row['a'],
+                            'p': row['p'],
+                            'b': row['b']
                         }
-                        print(f"从数据库加载points={points}的模型参数: a={row[1]:.6f}, p={row[2]:.6f}, b={row[3]:.6f}")
+                        print(f"从数据库加载points={points}的模型参数: a={row['a']:.6f}, p={row['p']:.6f}, b={row['b']:.6f}")
                 
                 self.all_points = sorted(self.points_model_params.keys())
                 print(f"共加载{len(self.all_points)}个points的模型参数: {self.all_points}")
@@ -138,6 +182,83 @@ class MainCalculator:
             self.points_model_params = {}
             self.all_points = []
     
+    def load_latest_model_parameters(self):
+        """加载最新的一组模型参数作为全局模型参数"""
+        try:
+            # 查询当前换热器最新的模型参数
+            exchanger_sql, params = self.data_loader.exchanger_filter()
+            query = f"SELECT a, p, b FROM model_parameters WHERE 1=1{exchanger_sql} ORDER BY timestamp DESC LIMIT 1"
+            self.db_conn.prod_cursor.execute(query, params)
+            result = self.db_conn.prod_cursor.fetchone()
+            
+            if result:
+                self.model_params = {
+                    'a': result['a'],
+                    'p': result['p'],
+                    'b': result['b']
+                }
+                print(f"从数据库加载已训练的模型参数: a={self.model_params['a']:.6f}, p={self.model_params['p']:.6f}, b={self.model_params['b']:.6f}")
+        except Exception as e:
+            print(f"加载模型参数失败: {e}")
+            self.model_params = None
+    
+    def get_pipeline_state(self):
+        """生成流水线状态快照，与每个小时的结果在同一事务中写入"""
+        return {
+            'stage': self.stage,
+            'model_params': self.model_params,
+            'points_model_params': {str(points): params for points, params in self.points_model_params.items()},
+            'model_version': self.model_version,
+            'reprocessing_history': self.reprocessing_history,
+            'heat_exchanger_id': self.heat_exchanger.get('id', 1),
+            'day': self.current_day,
+            'hour': self.current_hour
+        }
+    
+    def advance_pipeline_state(self, day, hour):
+        """推进已处理位置并返回状态快照；重新处理历史数据时不推进，返回None"""
+        if self.reprocessing_history:
+            return None
+        if self.current_day is None or (day, hour) >= (self.current_day, self.current_hour):
+            self.current_day = day
+            self.current_hour = hour
+        return self.get_pipeline_state()
+    
+    def load_pipeline_state(self):
+        """从pipeline_state表恢复阶段、模型参数和处理进度
+        
+        返回值: 是否找到并恢复了状态快照
+        """
+        state = self.data_loader.load_pipeline_state(self.heat_exchanger.get('id', 1))
+        if not state:
+            return False
+        
+        self.stage = state.get('stage', 1)
+        self.model_params = state.get('model_params')
+        self.points_model_params = {
+            int(points): params for points, params in (state.get('points_model_params') or {}).items()
+        }
+        self.all_points = sorted(self.points_model_params.keys())
+        self.model_version = state.get('model_version', 0)
+        self.current_day = state.get('day')
+        self.current_hour = state.get('hour')
+        
+        # 重新处理历史数据的循环不会跨进程延续，恢复后从正常处理开始
+        if state.get('reprocessing_history'):
+            print("上次退出时正在重新处理历史数据，恢复后重新从正常处理开始")
+        
+        print(f"从流水线状态恢复: stage={self.stage}, 模型版本={self.model_version}, "
+              f"共{len(self.all_points)}个points, 最近处理到第{self.current_day}天第{self.current_hour}小时")
+        return True
+    
+    def get_resume_position(self):
+        """返回重启后应处理的下一个(day, hour)，没有处理记录时返回None"""
+        if self.current_day is None or self.current_hour is None:
+            return None
+        if self.current_hour >= 23:
+            return self.current_day + 1, 0
+        return self.current_day, self.current_hour + 1
+    
     def calculate_heat_exchanger_area(self):
         """计算换热面积"""
         # 优先使用数据库中已有的换热面积
@@ -179,6 +300,182 @@ class MainCalculator:
         """设置误差超限重新训练完成时的回调函数"""
         self.on_error_retrain_complete_callback = callback
     
+    def set_progress_callback(self, callback):
+        """设置批量处理进度回调函数，参数为(已处理小时数, 总小时数)"""
+        self.progress_callback = callback
+    
+    def set_hour_processed_callback(self, callback):
+        """设置某小时结果提交后的回调函数，参数为(day, hour, hour_results)"""
+        self.on_hour_processed_callback = callback
+    
+    def set_model_updated_callback(self, callback):
+        """设置模型参数更新后的回调函数，参数为事件信息字典"""
+        self.on_model_updated_callback = callback
+    
+    def notify_hour_processed(self, day, hour, hour_results):
+        """通知某小时的结果已提交到生产数据库"""
+        if self.on_hour_processed_callback:
+            try:
+                self.on_hour_processed_callback(day, hour, hour_results)
+            except Exception as e:
+                print(f"小时处理完成回调执行失败: {e}")
+    
+    def notify_model_updated(self, reason, start_day, end_day):
+        """通知模型参数已更新
+        
+        参数:
+            reason: 'stage1'、'stage2' 或 'error_retrain'
+            start_day, end_day: 受影响的天数范围
+        """
+        self.publish_model_parameters()
+        if self.on_model_updated_callback:
+            try:
+                self.on_model_updated_callback({
+                    'reason': reason,
+                    'heat_exchanger_id': self.heat_exchanger.get('id', 1),
+                    'stage': self.stage,
+                    'model_version': self.model_version,
+                    'model_params': self.model_params,
+                    'points_model_params': {str(points): params for points, params in self.points_model_params.items()},
+                    'start_day': start_day,
+                    'end_day': end_day
+                })
+            except Exception as e:
+                print(f"模型更新回调执行失败: {e}")
+    
+    def publish_model_parameters(self):
+        """把当前模型参数发布到共享存储"""
+        if self.model_store is None:
+            return
+        try:
+            self.model_store.publish({
+                'heat_exchanger_id': self.heat_exchanger.get('id', 1),
+                'model_version': self.model_version,
+                'model_params': self.model_params,
+                'points_model_params': {str(points): params for points, params in self.points_model_params.items()}
+            })
+        except Exception as e:
+            print(f"发布模型参数到共享存储失败: {e}")
+    
+    def stored_model_version(self):
+        """返回共享存储中参数对应的模型版本，尚未发布或读取失败时为-1
+        
+        存储中的版本落后于从数据库加载的版本时（如文件由重建前的数据库留下），启动时重新发布。
+        """
+        try:
+            snapshot = self.model_store.snapshot()
+        except Exception as e:
+            print(f"读取共享模型参数失败: {e}")
+            return -1
+        if snapshot is None:
+            return -1
+        return snapshot.get('model_version', -1)
+    
+    def current_model_parameters(self):
+        """返回用于预测的最新模型参数，优先读取共享存储中任一进程发布的版本
+        
+        返回值: (points_model_params, model_params)
+        """
+        if self.model_store is not None:
+            try:
+                snapshot = self.model_store.snapshot()
+                if snapshot is not None:
+                    return (
+                        {int(points): params for points, params in snapshot['points_model_params'].items()},
+                        snapshot['model_params']
+                    )
+            except Exception as e:
+                print(f"读取共享模型参数失败，使用进程内参数: {e}")
+        return self.points_model_params, self.model_params
+    
+    def report_progress(self, completed, total):
+        """报告批量处理进度"""
+        if self.progress_callback:
+            self.progress_callback(completed, total)
+    
+    def advance_model_version(self):
+        """模型参数更新后递增模型版本，并立即写入pipeline_state
+        
+        与K_predicted的刷新方式（惰性或立即重新处理）无关，每次阶段1训练、阶段2优化和
+        误差超限重新训练都会产生新版本；重启后从pipeline_state恢复，不依赖待刷新区间表。
+        """
+        self.model_version += 1
+        try:
+            self.data_loader.save_pipeline_state(self.get_pipeline_state())
+            self.db_conn.commit(self.db_conn.prod_db)
+        except Exception as e:
+            print(f"保存模型版本失败: {e}")
+            self.db_conn.rollback(self.db_conn.prod_db)
+    
+    def mark_model_change(self, start_day, end_day):
+        """模型参数更新后记录受影响的时间范围，K_predicted改为读取时计算、后台物化
+        
+        参数:
+            start_day: 受影响的起始天数
+            end_day: 受影响的结束天数（包含当天全部小时）
+        """
+        model_params = {
+            'default': self.model_params,
+            'points': {str(points): params for points, params in self.points_model_params.items()}
+        }
+        # 失效区间按闭区间保存
+        start_date, end_date = time_keys.closed_bounds(time_keys.day_bounds(start_day, end_day))
+        
+        for heat_exchanger_id in self.heat_exchanger_ids:
+            self.data_loader.mark_k_predicted_stale(
+                start_date, end_date, self.model_version, model_params,
+                heat_exchanger_id=heat_exchanger_id
+            )
+        print(f"模型版本{self.model_version}：第{start_day}天到第{end_day}天的K_predicted将在后台刷新")
+        self.k_materializer.notify()
+    
+    def refresh_day_k_predicted(self, day):
+        """立即用当前模型参数重新计算指定天所有小时的K_predicted，并更新k_management和performance_parameters"""
+        for reprocess_hour in range(24):
+            # 获取该小时的数据
+            hour_operation_data = self.data_loader.get_operation_parameters_by_hour(day, reprocess_hour)
+            if not hour_operation_data:
+                continue
+            hour_physical_data = self.data_loader.get_physical_parameters_by_hour(day, reprocess_hour)
+            hour_processed_data = self.data_loader.process_operation_data(
+                hour_operation_data, hour_physical_data, self.heat_exchanger
+            )
+            hour_tube_data = [d for d in hour_processed_data if d.get('side', '').lower() == 'tube']
+            if not hour_tube_data:
+                continue
+            
+            # 重新计算K_predicted
+            hour_k_predicted_map, hour_alpha_i_map = self.predict_k_and_alpha_i(hour_tube_data)
+            # 更新k_management
+            hour_k_management = []
+            for d in hour_tube_data:
+                key = (d['heat_exchanger_id'], d['timestamp'], d['points'])
+                hour_k_management.append({
+                    'heat_exchanger_id': d['heat_exchanger_id'],
+                    'timestamp': d['timestamp'],
+                    'points': d['points'],
+                    'side': d['side'],
+                    'K_predicted': hour_k_predicted_map.get(key, 0)
+                })
+            if hour_k_management:
+                self.data_loader.update_k_management_with_predicted(hour_k_management)
+            
+            # 更新performance_parameters表的K值
+            hour_perf_update = []
+            for d in hour_tube_data:
+                key = (d['heat_exchanger_id'], d['timestamp'], d['points'])
+                K_predicted = hour_k_predicted_map.get(key, 0)
+                if K_predicted > 0:
+                    hour_perf_update.append({
+                        'heat_exchanger_id': d['heat_exchanger_id'],
+                        'timestamp': d['timestamp'],
+                        'points': d['points'],
+                        'side': d['side'],
+                        'K': K_predicted
+                    })
+            if hour_perf_update:
+                self.data_loader.update_performance_parameters_k(hour_perf_update)
+    
     def determine_hot_cold_sides(self):
         """确定热侧和冷侧
         返回值: (hot_side, cold_side)
@@ -511,45 +808,92 @@ class MainCalculator:
                 alpha_i_map[(heat_exchanger_id, timestamp, points)] = alpha_i
         
         return k_predicted_map, alpha_i_map
-    
-    def process_data_by_hour(self, day, hour, discard_no_k=False):
-        """处理指定天数和小时的数据，按照用户指定的8步流程执行
-        
+
+    def predict_scenarios(self, points, reynolds=None, velocity=None, temperature=None):
+        """按最新模型参数（见current_model_parameters）对假设工况做一次向量化预测，不读写数据库
+
+        参数:
+            points: 每个工况的测量点数组
+            reynolds: 每个工况的管侧雷诺数数组；为None时由velocity和temperature计算
+            velocity: 每个工况的管侧流速数组 (m/s)
+            temperature: 每个工况的管侧温度数组 (°C)，为None时按25°C计算
+
+        返回值: 含reynolds、K_predicted、alpha_i数组的字典，Re<=0的工况K_predicted和alpha_i为0
+        """
+        points = np.asarray(points, dtype=int)
+
+        if reynolds is not None:
+            Re = np.asarray(reynolds, dtype=float)
+        else:
+            u = np.asarray(velocity, dtype=float)
+            t = np.full(len(u), 25.0) if temperature is None else np.asarray(temperature, dtype=float)
+            # 物性只与温度有关，每个不同温度只计算一次
+            unique_t, inverse = np.unique(t, return_inverse=True)
+            props = [self.data_loader.get_water_properties(value) for value in unique_t]
+            rho = np.array([prop['rho'] for prop in props])[inverse]
+            mu = np.array([prop['mu'] for prop in props])[inverse]
+            d_i = self.heat_exchanger.get('d_i_original') or 0.02
+            Re = np.where((rho > 0) & (u > 0) & (mu > 0), rho * u * d_i / np.where(mu > 0, mu, 1), 0.0)
+
+        # 按points查出每个工况的参数，缺少对应points时与predict_k_and_alpha_i一致使用默认参数
+        points_model_params, model_params = self.current_model_parameters()
+        default_params = model_params or {'a': 1.0, 'p': 0.85, 'b': 0.0004}
+        unique_points, inverse = np.unique(points, return_inverse=True)
+        params = [points_model_params.get(int(p), default_params) for p in unique_points]
+        a = np.array([param['a'] for param in params], dtype=float)[inverse]
+        p = np.array([param['p'] for param in params], dtype=float)[inverse]
+        b = np.array([param['b'] for param in params], dtype=float)[inverse]
+
+        K_pred = np.zeros_like(Re)
+        alpha_i = np.zeros_like(Re)
+        valid = Re > 0
+        if np.any(valid):
+            K_pred[valid] = 1 / self.nonlinear_calc.model_func(Re[valid], a[valid], p[valid], b[valid])
+            alpha_i[valid] = 1 / (a[valid] * np.power(Re[valid], -p[valid]))
+
+        return {'reynolds': Re, 'K_predicted': K_pred, 'alpha_i': alpha_i}
+
+    def read_hour_inputs(self, day, hour, data_loader=None):
+        """读取指定小时的全部输入数据（读取阶段）
+
         参数:
             day: 天数
             hour: 小时
-            discard_no_k: 是否弃用没有K值的数据（仅用于脚本）
+            data_loader: 使用的数据加载器，默认为self.data_loader；
+                         流水线读取线程会传入持有独立连接的加载器
+
+        返回值:
+            {'operation_data', 'physical_data', 'test_performance_data'}，没有运行参数数据时返回None
         """
-        # 步骤1: 读取运行参数全表（operation_parameters）
-        operation_data = self.data_loader.get_operation_parameters_by_hour(day, hour)
+        loader = data_loader or self.data_loader
+        
+        # 读取运行参数全表（operation_parameters）
+        operation_data = loader.get_operation_parameters_by_hour(day, hour)
         if not operation_data:
-            print(f"第{day}天第{hour}小时没有运行参数数据")
-            return False
+            return None
         
-        # 将运行参数插入到生产数据库（传入heat_exchanger用于计算flow_rate）
-        if not self.data_loader.insert_operation_parameters(operation_data, self.heat_exchanger):
-            print("插入运行参数失败")
-            return False
-
-        # 步骤2: 计算物理参数、雷诺数和普朗特数
-        # 先尝试从测试数据库读取物理参数
-        physical_data = self.data_loader.get_physical_parameters_by_hour(day, hour)
+        return {
+            'operation_data': operation_data,
+            'physical_data': loader.get_physical_parameters_by_hour(day, hour),
+            'test_performance_data': loader.get_test_performance_parameters_by_hour(day, hour)
+        }
+    
+    def prepare_hour_results(self, day, hour, inputs, discard_no_k=False):
+        """根据读取的输入数据计算物理参数、LMTD和K_lmtd（步骤1-4的计算部分）
         
-        # 计算物理参数（处理所有侧的数据）
+        返回值: 包含待写入数据的字典，供predict_hour_results、finalize_hour_performance和写入阶段使用
+        """
+        operation_data = inputs['operation_data']
+        physical_data = inputs['physical_data']
+        test_performance_data = inputs['test_performance_data']
+        
+        # 步骤2: 计算物理参数、雷诺数和普朗特数（处理所有侧的数据）
         processed_data = self.data_loader.process_operation_data(operation_data, physical_data, self.heat_exchanger)
         
-        # 将计算得到的物理参数插入到生产数据库
-        if not self.data_loader.insert_physical_parameters(processed_data):
-            print("插入物理参数失败")
-            return False
-
         # 过滤tube侧数据，不区分大小写，用于后续模型训练和K_predicted计算
         tube_processed_data = [data for data in processed_data if data.get('side', '').lower() == 'tube']
-
-        # 步骤3: 读取测试数据库中的性能参数，填入k_management和performance_parameters
-        test_performance_data = self.data_loader.get_test_performance_parameters_by_hour(day, hour)
         
-        # 构建测试性能参数映射表
+        # 步骤3: 构建测试性能参数映射表，填入k_management和performance_parameters
         test_performance_map = {}
         for data in test_performance_data:
             # 如果启用了弃用无K值数据的功能，并且K值为None或0，则跳过
@@ -567,10 +911,6 @@ class MainCalculator:
         performance_data = []
         
         # 步骤4: 计算LMTD和K_lmtd
-        # 构建温度映射表
-        temp_map = self.get_temperature_map(operation_data)
-        # print(f"温度映射表包含 {len(temp_map)} 个时间戳")
-        
         # 构建热负荷映射表
         heat_duty_map = {}        
         # 先尝试从test_performance_data获取heat_duty
@@ -581,7 +921,6 @@ class MainCalculator:
                 # 如果heat_duty为None、0或未定义，尝试计算
                 heat_duty = self.calculate_heat_duty(data, processed_data, operation_data)
             heat_duty_map[data['timestamp']] = heat_duty
-        # print(f"热负荷映射表包含 {len(heat_duty_map)} 个时间戳")
         
         # 计算LMTD
         lmtd_map = self.calculate_lmtd(operation_data)
@@ -631,58 +970,67 @@ class MainCalculator:
             }
             performance_data.append(performance_entry)
         
-        # 将k_management数据插入到生产数据库
-        if not self.data_loader.insert_k_management(k_management_data):
-            print("插入K_management失败")
-            return False
+        return {
+            'day': day,
+            'hour': hour,
+            'hour_start': time_keys.hour_start(day, hour),
+            'fingerprint': None,
+            'operation_data': operation_data,
+            'processed_data': processed_data,
+            'tube_processed_data': tube_processed_data,
+            'test_performance_map': test_performance_map,
+            'k_management_data': k_management_data,
+            'performance_data': performance_data,
+            'k_key_map': {}
+        }
+    
+    def compute_hour_fingerprint(self, inputs, discard_no_k=False):
+        """计算一个小时的输入指纹：源数据行 + 当前模型参数 + 处理选项
         
-        # 步骤5: 阶段1训练（在training_days的所有数据读取完成后触发，即第training_days天的第23小时之后）
-        if self.stage == 1 and not self.model_params and day == self.training_days and hour == 23:
-            print(f"第{self.training_days}天的所有数据已读取完成，触发阶段1训练")
-            self.train_stage1()
-            self.stage = 2
-            print("阶段1训练完成，开始重新处理之前所有天数的数据，以更新K_predicted和性能参数...")
-            # 标记正在重新处理，避免无限循环
-            self.reprocessing_history = True
-            # 重新处理从第1天到当前天的数据
-            for reprocess_day in range(1, day + 1):
-                for reprocess_hour in range(24):
-                    print(f"重新处理第{reprocess_day}天第{reprocess_hour}小时的数据...")
-                    # 临时设置reprocessing标志，避免再次触发训练
-                    old_reprocessing = self.reprocessing_history
-                    self.reprocessing_history = True
-                    self.process_data_by_hour(reprocess_day, reprocess_hour)
-                    self.reprocessing_history = old_reprocessing
-            self.reprocessing_history = False
-            print("所有历史数据重新处理完成")
-            # 调用stage1完成回调
-            if self.on_stage1_complete_callback:
-                self.on_stage1_complete_callback(day)
+        指纹未变化说明重新处理该小时会得到与上次完全相同的结果
+        """
+        digest = hashlib.sha256()
+        for name in ('operation_data', 'physical_data', 'test_performance_data'):
+            digest.update(name.encode('utf-8'))
+            rows = sorted(json.dumps(row, sort_keys=True, default=str) for row in inputs.get(name) or [])
+            for row in rows:
+                digest.update(row.encode('utf-8'))
+        
+        model_state = {
+            'stage': self.stage,
+            'model_params': self.model_params,
+            'points_model_params': {str(points): params for points, params in self.points_model_params.items()},
+            'discard_no_k': discard_no_k,
+            'heat_exchanger': self.heat_exchanger
+        }
+        digest.update(json.dumps(model_state, sort_keys=True, default=str).encode('utf-8'))
+        return digest.hexdigest()
+    
+    def save_hour_fingerprint(self, hour_results):
+        """记录已成功写入的小时的输入指纹"""
+        if not self.skip_unchanged_hours or not hour_results.get('fingerprint'):
+            return True
+        return self.data_loader.save_hour_fingerprint(
+            hour_results['hour_start'],
+            hour_results['fingerprint'],
+            self.model_version,
+            heat_exchanger_id=self.heat_exchanger.get('id', 1)
+        )
+    
+    def predict_hour_results(self, hour_results):
+        """计算K_predicted和alpha_i并填入k_management与performance_parameters数据（步骤6的计算部分）"""
+        tube_processed_data = hour_results['tube_processed_data']
+        k_management_data = hour_results['k_management_data']
+        performance_data = hour_results['performance_data']
         
-        # 步骤6: 计算K_predicted和alpha_i（仅在stage1训练完成后）
         # 初始化alpha_i_map和k_predicted_map，避免后续使用时出错
         alpha_i_map = {}
         k_predicted_map = {}
         # 只有在stage1训练完成后（有model_params）才计算K_predicted
         if self.model_params:
             k_predicted_map, alpha_i_map = self.predict_k_and_alpha_i(tube_processed_data)
-            
-            # 更新k_management数据，添加K_predicted
-            for data in k_management_data:
-                key = (data['heat_exchanger_id'], data['timestamp'], data['points'])
-                data['K_predicted'] = k_predicted_map.get(key, 0)
-            
-            # 更新k_management表
-            print(f"\n准备更新k_management表，共 {len(k_management_data)} 条记录")
-            if k_management_data:
-                print(f"第一条记录示例: {k_management_data[0]}")
-                print(f"K_predicted值示例: {k_management_data[0].get('K_predicted', '未找到')}")
-            success = self.data_loader.update_k_management_with_predicted(k_management_data)
-            print(f"更新k_management表结果: {success}")
         else:
-            # stage1训练之前，使用默认参数预测K_predicted
-            print(f"\n模型参数未训练，使用默认参数预测K_predicted")
-            # 使用默认参数 [1.0, 0.85, 0.0004] 进行预测
+            # stage1训练之前，使用默认参数 [1.0, 0.85, 0.0004] 预测K_predicted
             default_a, default_p, default_b = 1.0, 0.85, 0.0004
             
             for data in tube_processed_data:
@@ -693,20 +1041,12 @@ class MainCalculator:
                     key = (data['heat_exchanger_id'], data['timestamp'], data['points'])
                     k_predicted_map[key] = K_pred
                     alpha_i_map[key] = alpha_i
-            
-            # 更新k_management数据，添加K_predicted
-            for data in k_management_data:
-                key = (data['heat_exchanger_id'], data['timestamp'], data['points'])
-                data['K_predicted'] = k_predicted_map.get(key, 0)
-            
-            # 将stage1训练之前的K_predicted更新到数据库
-            print(f"\n准备更新k_management表(stage1前)，共 {len(k_management_data)} 条记录")
-            if k_management_data:
-                print(f"第一条记录示例: {k_management_data[0]}")
-                print(f"K_predicted值示例: {k_management_data[0].get('K_predicted', '未找到')}")
-            success = self.data_loader.update_k_management_with_predicted(k_management_data)
-            print(f"更新k_management表结果: {success}")
-
+        
+        # 更新k_management数据，添加K_predicted
+        for data in k_management_data:
+            key = (data['heat_exchanger_id'], data['timestamp'], data['points'])
+            data['K_predicted'] = k_predicted_map.get(key, 0)
+        
         # 确保为所有performance_data添加alpha_i字段，即使没有model_params
         for data in performance_data:
             key = (data['heat_exchanger_id'], data['timestamp'], data['points'])
@@ -719,6 +1059,286 @@ class MainCalculator:
                 k_key = (data['heat_exchanger_id'], data['timestamp'], data['points'])
                 if k_key not in k_key_map:
                     k_key_map[k_key] = k_predicted_map.get(k_key, 0)
+        hour_results['k_key_map'] = k_key_map
+        
+        return hour_results
+    
+    def finalize_hour_performance(self, hour_results, discard_no_k=False):
+        """填写performance_parameters中的K值（步骤8的计算部分）"""
+        test_performance_map = hour_results['test_performance_map']
+        k_key_map = hour_results['k_key_map']
+        
+        for data in hour_results['performance_data']:
+            # 获取K_actual和K_predicted
+            key = (data['heat_exchanger_id'], data['timestamp'], data['points'], data['side'])
+            K_actual = test_performance_map.get(key, {}).get('K_actual', 0)
+            
+            # 如果启用了弃用无K值数据的功能，并且K_actual为None或0，则跳过
+            if discard_no_k and (K_actual is None or K_actual == 0):
+                continue
+            
+            # 构建k_management查询键
+            k_key = (data['heat_exchanger_id'], data['timestamp'], data['points'])
+            # 确保k_predicted_map已初始化
+            if self.model_params and k_key_map:
+                K_predicted = k_key_map.get(k_key, 0)
+            else:
+                K_predicted = 0
+            
+            # 始终使用K_predicted值填充K字段
+            data['K'] = K_predicted or 0
+        
+        return hour_results
+    
+    def compute_hour_results(self, day, hour, inputs, discard_no_k=False):
+        """计算阶段：对不触发阶段切换的小时一次性完成全部计算"""
+        hour_results = self.prepare_hour_results(day, hour, inputs, discard_no_k)
+        self.predict_hour_results(hour_results)
+        return self.finalize_hour_performance(hour_results, discard_no_k)
+    
+    def write_hour_base_results(self, hour_results):
+        """将运行参数、物理参数和k_management写入生产数据库（步骤1-4的写入部分）"""
+        # 将运行参数插入到生产数据库（传入heat_exchanger用于计算flow_rate）
+        if not self.data_loader.insert_operation_parameters(hour_results['operation_data'], self.heat_exchanger):
+            print("插入运行参数失败")
+            return False
+        
+        # 将计算得到的物理参数插入到生产数据库
+        if not self.data_loader.insert_physical_parameters(hour_results['processed_data']):
+            print("插入物理参数失败")
+            return False
+        
+        # 将k_management数据插入到生产数据库
+        if not self.data_loader.insert_k_management(hour_results['k_management_data']):
+            print("插入K_management失败")
+            return False
+        
+        return True
+    
+    def write_hour_results(self, hour_results):
+        """写入阶段：按与process_data_by_hour相同的顺序写入一个小时的全部结果"""
+        if not self.write_hour_base_results(hour_results):
+            return False
+        
+        self.data_loader.update_k_management_with_predicted(hour_results['k_management_data'])
+        
+        # insert_performance_parameters使用ON DUPLICATE KEY UPDATE，会自动更新K值；状态快照在同一事务中写入
+        if not self.data_loader.insert_performance_parameters(
+            hour_results['performance_data'], pipeline_state=hour_results.get('pipeline_state')
+        ):
+            print("插入性能参数失败")
+            return False
+        
+        self.save_hour_fingerprint(hour_results)
+        self.notify_hour_processed(hour_results['day'], hour_results['hour'], hour_results)
+        return True
+    
+    def hour_triggers_stage_change(self, day, hour):
+        """判断处理该小时是否会触发阶段1训练、阶段2优化或误差超限重新训练"""
+        if self.stage == 1 and not self.model_params and day == self.training_days and hour == 23:
+            return True
+        if self.stage == 2 and not self.reprocessing_history:
+            if hour == self.optimization_hours:
+                return True
+            if hour == 23 and day > self.training_days:
+                return True
+        return False
+    
+    def process_hours_pipelined(self, hours, discard_no_k=False):
+        """以读取/计算/写入三级流水线按顺序处理多个小时
+        
+        读取线程使用独立的测试数据库连接预读后续小时，写入线程使用生产数据库连接写入之前的小时，
+        计算在调用线程中按顺序进行，级间通过有界队列连接。遇到会触发阶段切换的小时时，
+        先等待写入队列清空，再按process_data_by_hour的原有流程同步处理，保证结果顺序和触发语义不变。
+        
+        参数:
+            hours: [(day, hour), ...]，按处理顺序排列
+            discard_no_k: 是否弃用没有K值的数据（仅用于脚本）
+        
+        返回值:
+            {(day, hour): 是否处理成功}，顺序与hours一致
+        """
+        hours = list(hours)
+        if not hours:
+            return {}
+        
+        # 读取阶段使用独立的数据库连接，避免与计算/写入阶段共享游标
+        reader_conn = DatabaseConnection(self.config)
+        if not reader_conn.connect_test_db():
+            print("流水线读取连接建立失败，改为逐小时顺序处理")
+            return {
+                (day, hour): self.process_data_by_hour(day, hour, discard_no_k)
+                for day, hour in hours
+            }
+        reader_loader = DataLoader(reader_conn, self.data_loader.heat_exchanger_id)
+        
+        # 一次性读取本批小时已记录的输入指纹
+        stored_fingerprints = {}
+        if self.skip_unchanged_hours:
+            first_day, first_hour = min(hours)
+            last_day, last_hour = max(hours)
+            stored_fingerprints = self.data_loader.get_hour_fingerprints(
+                *time_keys.span_bounds(first_day, first_hour, last_day, last_hour),
+                heat_exchanger_id=self.heat_exchanger.get('id', 1)
+            )
+        
+        read_queue = queue.Queue(maxsize=self.pipeline_queue_size)
+        write_queue = queue.Queue(maxsize=self.pipeline_queue_size)
+        stop_event = threading.Event()
+        results = {}
+        
+        def reader():
+            try:
+                for day, hour in hours:
+                    if stop_event.is_set():
+                        break
+                    try:
+                        inputs = self.read_hour_inputs(day, hour, reader_loader)
+                    except Exception as e:
+                        print(f"读取第{day}天第{hour}小时的数据失败: {e}")
+                        inputs = None
+                    read_queue.put((day, hour, inputs))
+            finally:
+                read_queue.put(_PIPELINE_END)
+        
+        def writer():
+            while True:
+                item = write_queue.get()
+                try:
+                    if item is _PIPELINE_END:
+                        return
+                    day, hour, hour_results = item
+                    try:
+                        results[(day, hour)] = self.write_hour_results(hour_results)
+                    except Exception as e:
+                        print(f"写入第{day}天第{hour}小时的数据失败: {e}")
+                        results[(day, hour)] = False
+                    if results[(day, hour)]:
+                        print(f"第{day}天第{hour}小时的数据处理完成，共插入 {len(hour_results['performance_data'])} 条性能参数")
+                finally:
+                    write_queue.task_done()
+        
+        reader_thread = threading.Thread(target=reader, name="hour-pipeline-reader", daemon=True)
+        writer_thread = threading.Thread(target=writer, name="hour-pipeline-writer", daemon=True)
+        reader_thread.start()
+        writer_thread.start()
+        
+        completed = 0
+        try:
+            while True:
+                item = read_queue.get()
+                if item is _PIPELINE_END:
+                    break
+                day, hour, inputs = item
+                self.report_progress(completed, len(hours))
+                completed += 1
+                
+                if inputs is None:
+                    print(f"第{day}天第{hour}小时没有运行参数数据")
+                    results[(day, hour)] = False
+                    continue
+                
+                if self.hour_triggers_stage_change(day, hour):
+                    # 阶段切换依赖之前所有小时已写入生产数据库，先等待写入阶段清空
+                    write_queue.join()
+                    results[(day, hour)] = self.process_data_by_hour(day, hour, discard_no_k, inputs=inputs)
+                    continue
+                
+                fingerprint = None
+                if self.skip_unchanged_hours:
+                    fingerprint = self.compute_hour_fingerprint(inputs, discard_no_k)
+                    if stored_fingerprints.get(time_keys.hour_start(day, hour)) == fingerprint:
+                        print(f"第{day}天第{hour}小时的输入数据和模型参数未变化，跳过")
+                        results[(day, hour)] = True
+                        continue
+                
+                hour_results = self.compute_hour_results(day, hour, inputs, discard_no_k)
+                hour_results['fingerprint'] = fingerprint
+                hour_results['pipeline_state'] = self.advance_pipeline_state(day, hour)
+                write_queue.put((day, hour, hour_results))
+        finally:
+            stop_event.set()
+            # 清空读取队列，确保读取线程不会阻塞在put上
+            while reader_thread.is_alive():
+                try:
+                    read_queue.get(timeout=0.1)
+                except queue.Empty:
+                    pass
+            write_queue.put(_PIPELINE_END)
+            writer_thread.join()
+            reader_conn.disconnect_test_db()
+        
+        self.report_progress(len(hours), len(hours))
+        return {key: results.get(key, False) for key in hours}
+    
+    def process_data_by_hour(self, day, hour, discard_no_k=False, inputs=None):
+        """处理指定天数和小时的数据，按照用户指定的8步流程执行
+        
+        参数:
+            day: 天数
+            hour: 小时
+            discard_no_k: 是否弃用没有K值的数据（仅用于脚本）
+            inputs: 已预读的输入数据（由流水线读取阶段提供），为None时从测试数据库读取
+        """
+        # 步骤1: 读取运行参数全表（operation_parameters）
+        if inputs is None:
+            inputs = self.read_hour_inputs(day, hour)
+        if not inputs:
+            print(f"第{day}天第{hour}小时没有运行参数数据")
+            return False
+        
+        # 输入数据和模型参数都与上次处理时相同、且不会触发阶段切换的小时直接跳过
+        # 触发阶段切换的小时结果还取决于切换后的模型参数，不记录指纹
+        fingerprint = None
+        if self.skip_unchanged_hours and not self.hour_triggers_stage_change(day, hour):
+            fingerprint = self.compute_hour_fingerprint(inputs, discard_no_k)
+            stored = self.data_loader.get_hour_fingerprints(
+                *time_keys.hour_bounds(day, hour),
+                heat_exchanger_id=self.heat_exchanger.get('id', 1)
+            )
+            if stored.get(time_keys.hour_start(day, hour)) == fingerprint:
+                print(f"第{day}天第{hour}小时的输入数据和模型参数未变化，跳过")
+                return True
+        
+        # 步骤2-4: 计算物理参数、LMTD和K_lmtd，并写入运行参数、物理参数和k_management
+        hour_results = self.prepare_hour_results(day, hour, inputs, discard_no_k)
+        hour_results['fingerprint'] = fingerprint
+        if not self.write_hour_base_results(hour_results):
+            return False
+        
+        # 步骤5: 阶段1训练（在training_days的所有数据读取完成后触发，即第training_days天的第23小时之后）
+        if self.stage == 1 and not self.model_params and day == self.training_days and hour == 23:
+            print(f"第{self.training_days}天的所有数据已读取完成，触发阶段1训练")
+            self.train_stage1()
+            self.stage = 2
+            self.advance_model_version()
+            if self.lazy_k_predicted:
+                # 只记录待刷新区间，K_predicted和性能参数由读取时计算和后台物化完成
+                self.mark_model_change(1, day)
+            else:
+                print("阶段1训练完成，开始重新处理之前所有天数的数据，以更新K_predicted和性能参数...")
+                # 标记正在重新处理，避免再次触发训练
+                self.reprocessing_history = True
+                # 重新处理从第1天到当前天的数据
+                self.process_hours_pipelined(
+                    [(reprocess_day, reprocess_hour) for reprocess_day in range(1, day + 1) for reprocess_hour in range(24)]
+                )
+                self.reprocessing_history = False
+                print("所有历史数据重新处理完成")
+            self.notify_model_updated('stage1', 1, day)
+            # 调用stage1完成回调
+            if self.on_stage1_complete_callback:
+                self.on_stage1_complete_callback(day)
+        
+        # 步骤6: 计算K_predicted和alpha_i（stage1训练之前使用默认参数）
+        self.predict_hour_results(hour_results)
+        k_management_data = hour_results['k_management_data']
+        print(f"\n准备更新k_management表，共 {len(k_management_data)} 条记录")
+        if k_management_data:
+            print(f"第一条记录示例: {k_management_data[0]}")
+            print(f"K_predicted值示例: {k_management_data[0].get('K_predicted', '未找到')}")
+        success = self.data_loader.update_k_management_with_predicted(k_management_data)
+        print(f"更新k_management表结果: {success}")
         
         # 步骤7: 阶段2优化（阶段1训练完成后，在optimization_hours之后进行）
         # 只有在完成阶段1训练后，才考虑阶段2训练
@@ -772,55 +1392,24 @@ class MainCalculator:
                     else:
                         print(f"第{day}天没有足够的优化数据，跳过阶段2训练")
                 
-                # 重新处理当天的所有小时，更新K_predicted
-                for reprocess_hour in range(24):
-                    # 获取该小时的数据
-                    hour_operation_data = self.data_loader.get_operation_parameters_by_hour(day, reprocess_hour)
-                    if hour_operation_data:
-                        hour_physical_data = self.data_loader.get_physical_parameters_by_hour(day, reprocess_hour)
-                        hour_processed_data = self.data_loader.process_operation_data(
-                            hour_operation_data, hour_physical_data, self.heat_exchanger
-                        )
-                        hour_tube_data = [d for d in hour_processed_data if d.get('side', '').lower() == 'tube']
-                        if hour_tube_data:
-                            # 重新计算K_predicted
-                            hour_k_predicted_map, hour_alpha_i_map = self.predict_k_and_alpha_i(hour_tube_data)
-                            # 更新k_management
-                            hour_k_management = []
-                            for d in hour_tube_data:
-                                key = (d['heat_exchanger_id'], d['timestamp'], d['points'])
-                                hour_k_management.append({
-                                    'heat_exchanger_id': d['heat_exchanger_id'],
-                                    'timestamp': d['timestamp'],
-                                    'points': d['points'],
-                                    'side': d['side'],
-                                    'K_predicted': hour_k_predicted_map.get(key, 0)
-                                })
-                            if hour_k_management:
-                                self.data_loader.update_k_management_with_predicted(hour_k_management)
-                            
-                            # 更新performance_parameters表的K值
-                            hour_perf_update = []
-                            for d in hour_tube_data:
-                                key = (d['heat_exchanger_id'], d['timestamp'], d['points'])
-                                K_predicted = hour_k_predicted_map.get(key, 0)
-                                if K_predicted > 0:
-                                    hour_perf_update.append({
-                                        'heat_exchanger_id': d['heat_exchanger_id'],
-                                        'timestamp': d['timestamp'],
-                                        'points': d['points'],
-                                        'side': d['side'],
-                                        'K': K_predicted
-                                    })
-                            if hour_perf_update:
-                                self.data_loader.update_performance_parameters_k(hour_perf_update)
+                # 更新当天所有小时的K_predicted
+                self.advance_model_version()
+                if self.lazy_k_predicted:
+                    self.mark_model_change(day, day)
                 else:
-                    print(f"第{day}天没有足够的优化数据，跳过阶段2训练")
+                    self.refresh_day_k_predicted(day)
+                self.notify_model_updated('stage2', day, day)
                 # 调用stage2完成回调
                 if self.on_stage2_complete_callback:
                     self.on_stage2_complete_callback(day)
             
             if hour == 23 and day > self.training_days:
+                if self.lazy_k_predicted:
+                    # 计算误差前先物化当天的待刷新区间
+                    self.k_materializer.materialize_pending(
+                        *time_keys.closed_bounds(time_keys.day_bounds(day))
+                    )
+                # 日汇总表中的误差随k_management写入更新，已包含第23小时
                 avg_error = self.data_loader.calculate_average_error(day)
                 print(f"第{day}天平均误差: {avg_error:.2f}%")
                 if avg_error >= self.stage1_error_threshold:
@@ -832,56 +1421,35 @@ class MainCalculator:
                     self.stage = 2
                     # 重新计算该天和stage1_history_days中的性能参数
                     reprocess_start_day = max(1, day - self.stage1_history_days)
-                    print(f"重新处理第{reprocess_start_day}天到第{day}天的数据...")
-                    self.reprocessing_history = True
-                    for reprocess_day in range(reprocess_start_day, day + 1):
-                        for reprocess_hour in range(24):
-                            print(f"重新处理第{reprocess_day}天第{reprocess_hour}小时的数据...")
-                            old_reprocessing = self.reprocessing_history
-                            self.reprocessing_history = True
-                            self.process_data_by_hour(reprocess_day, reprocess_hour)
-                            self.reprocessing_history = old_reprocessing
-                    self.reprocessing_history = False
-                    print("重新训练后的数据重新处理完成")
+                    self.advance_model_version()
+                    if self.lazy_k_predicted:
+                        self.mark_model_change(reprocess_start_day, day)
+                    else:
+                        print(f"重新处理第{reprocess_start_day}天到第{day}天的数据...")
+                        self.reprocessing_history = True
+                        self.process_hours_pipelined(
+                            [(reprocess_day, reprocess_hour) for reprocess_day in range(reprocess_start_day, day + 1) for reprocess_hour in range(24)]
+                        )
+                        self.reprocessing_history = False
+                        print("重新训练后的数据重新处理完成")
+                    self.notify_model_updated('error_retrain', reprocess_start_day, day)
                     # 调用误差超限重新训练完成回调
                     if self.on_error_retrain_complete_callback:
                         self.on_error_retrain_complete_callback(reprocess_start_day, day)
         
         # 步骤8: 填写performance_parameters中的K值
-        for data in performance_data:
-            # 获取K_actual和K_predicted
-            key = (data['heat_exchanger_id'], data['timestamp'], data['points'], data['side'])
-            K_actual = test_performance_map.get(key, {}).get('K_actual', 0)
-            
-            # 如果启用了弃用无K值数据的功能，并且K_actual为None或0，则跳过
-            if discard_no_k and (K_actual is None or K_actual == 0):
-                continue
-            
-            # 构建k_management查询键
-            k_key = (data['heat_exchanger_id'], data['timestamp'], data['points'])
-            # 确保k_predicted_map已初始化
-            if self.model_params and k_key_map:
-                K_predicted = k_key_map.get(k_key, 0)
-            else:
-                K_predicted = 0
-            
-            # 始终使用K_predicted值填充K字段
-            data['K'] = K_predicted or 0
-        
-        # 检查performance_data中的数据
-        if performance_data:
-            sample_perf_data = performance_data[0]
-            # print(f"准备插入的性能参数样本: K={sample_perf_data.get('K')}, heat_duty={sample_perf_data.get('heat_duty')}, "
-            #       f"LMTD={sample_perf_data.get('LMTD')}, alpha_i={sample_perf_data.get('alpha_i')}, "
-            #       f"alpha_o={sample_perf_data.get('alpha_o')}")
+        self.finalize_hour_performance(hour_results, discard_no_k)
+        performance_data = hour_results['performance_data']
         
-        # 将performance_parameters数据插入到生产数据库
-        # 将performance_parameters数据插入到生产数据库
+        # 将performance_parameters数据插入到生产数据库，流水线状态快照在同一事务中写入
         # insert_performance_parameters使用ON DUPLICATE KEY UPDATE，会自动更新K值
-        if not self.data_loader.insert_performance_parameters(performance_data):
+        pipeline_state = self.advance_pipeline_state(day, hour)
+        if not self.data_loader.insert_performance_parameters(performance_data, pipeline_state=pipeline_state):
             print("插入性能参数失败")
             return False
         
+        self.save_hour_fingerprint(hour_results)
+        self.notify_hour_processed(day, hour, hour_results)
         print(f"第{day}天第{hour}小时的数据处理完成，共插入 {len(performance_data)} 条性能参数")
         return True
     
@@ -895,6 +1463,10 @@ class MainCalculator:
     
     def close(self):
         """关闭数据库连接"""
+        if getattr(self, 'k_materializer', None):
+            self.k_materializer.stop()
+        if getattr(self, 'model_store', None):
+            self.model_store.close()
         self.db_conn.disconnect_test_db()
         self.db_conn.disconnect_prod_db()
     
@@ -0,0 +1,156 @@
+import hashlib
+import json
+import mmap
+import os
+import re
+import struct
+import tempfile
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:
+    # Windows下没有fcntl，只在进程内加锁（此时应只有一个进程发布参数）
+    fcntl = None
+
+from db.storage_backends import create_storage_backend
+
+# 文件头：序号（发布期间为奇数）、版本号、数据长度
+_HEADER = struct.Struct("<QQI")
+
+
+class ModelParamStore:
+    """基于内存映射文件的模型参数共享存储
+
+    同一台机器上的多个API工作进程、自动处理脚本和调度器映射同一个文件。训练后的进程调用
+    publish写入新版本，其他进程调用snapshot读取，不查询数据库。写入使用顺序锁：写入前后
+    各递增一次序号，读取方前后两次读到的序号相同且为偶数时数据一致，否则重读，因此读取方
+    总是看到完整的某个版本。
+    """
+    def __init__(self, path, size=1048576):
+        """
+        参数:
+            path: 映射文件路径
+            size: 文件大小（字节），参数序列化后的长度不能超过size减去文件头
+        """
+        self.path = path
+        self.size = size
+        self._fd = None
+        self._map = None
+        self._lock = threading.RLock()
+        # 最近一次读取的(版本号, 参数)，版本未变化时不重新解析
+        self._cached = (0, None)
+
+    def _ensure_map(self):
+        if self._map is not None:
+            return
+        with self._lock:
+            if self._map is None:
+                self._open()
+
+    def _open(self):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        if os.fstat(fd).st_size < self.size:
+            # 新建的文件全为0，即版本0、无数据
+            os.ftruncate(fd, self.size)
+        self._fd = fd
+        self._map = mmap.mmap(fd, self.size)
+
+    def publish(self, payload):
+        """写入新版本的参数
+
+        参数:
+            payload: 可JSON序列化的字典
+
+        返回值: 新版本号
+        """
+        data = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        if len(data) > self.size - _HEADER.size:
+            raise ValueError(f"模型参数序列化后为{len(data)}字节，超过共享存储容量")
+
+        with self._lock:
+            self._ensure_map()
+            if fcntl is not None:
+                fcntl.flock(self._fd, fcntl.LOCK_EX)
+            try:
+                sequence, version, _ = _HEADER.unpack_from(self._map, 0)
+                self._map[0:8] = struct.pack("<Q", sequence + 1)
+                self._map[_HEADER.size:_HEADER.size + len(data)] = data
+                _HEADER.pack_into(self._map, 0, sequence + 1, version + 1, len(data))
+                self._map[0:8] = struct.pack("<Q", sequence + 2)
+                return version + 1
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(self._fd, fcntl.LOCK_UN)
+
+    def read_version(self):
+        """读取当前版本号，尚未发布过时为0"""
+        self._ensure_map()
+        return _HEADER.unpack_from(self._map, 0)[1]
+
+    def read(self, retries=100):
+        """读取一致的最新版本
+
+        返回值: (版本号, 参数字典)，尚未发布过时返回(0, None)
+        """
+        self._ensure_map()
+        for _ in range(retries):
+            sequence, version, length = _HEADER.unpack_from(self._map, 0)
+            if sequence % 2 == 0:
+                data = self._map[_HEADER.size:_HEADER.size + length]
+                if _HEADER.unpack_from(self._map, 0)[0] == sequence:
+                    return version, json.loads(data) if length else None
+            time.sleep(0.0001)
+        raise TimeoutError("共享模型参数正在持续写入，读取失败")
+
+    def snapshot(self):
+        """返回最新版本的参数，版本未变化时直接返回上次解析的结果
+
+        返回值: 参数字典，尚未发布过时返回None
+        """
+        version = self.read_version()
+        if version != self._cached[0]:
+            self._cached = self.read()
+        return self._cached[1]
+
+    def close(self):
+        if self._map is not None:
+            self._map.close()
+            os.close(self._fd)
+            self._map = None
+            self._fd = None
+
+
+def model_store_name(config, heat_exchanger_id):
+    """返回共享存储的文件名，由生产库名称和换热器ID组成
+
+    同一目录下连接不同生产库（或重建的新库）的进程使用不同的文件，不会读到其他库的模型。
+    库名之后附加完整位置（主机、端口或文件路径）的摘要，区分同名的库。
+    """
+    backend = create_storage_backend(config)
+    database = os.path.splitext(os.path.basename(backend.describe('prod')))[0]
+    digest = hashlib.sha1(backend.location('prod').encode("utf-8")).hexdigest()[:8]
+    return f"model_params_{re.sub(r'[^0-9A-Za-z_-]+', '_', database)}_{digest}_{heat_exchanger_id}.bin"
+
+
+def open_model_store(config, heat_exchanger_id):
+    """按配置打开某个换热器的模型参数共享存储，创建失败时返回None
+
+    参数:
+        config: 配置字典，使用model_store_dir、model_store_size和生产库配置
+        heat_exchanger_id: 换热器ID，每个生产库的每个换热器一个文件
+    """
+    directory = config.get('model_store_dir') or os.path.join(tempfile.gettempdir(), "heat_exchanger_model_store")
+    store = ModelParamStore(
+        os.path.join(directory, model_store_name(config, heat_exchanger_id)),
+        config.get('model_store_size', 1048576)
+    )
+    try:
+        store.read_version()
+        return store
+    except Exception as e:
+        print(f"打开模型参数共享存储失败，只使用进程内参数: {e}")
+        store.close()
+        return None
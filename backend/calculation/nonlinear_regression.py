@@ -292,6 +292,28 @@ class NonlinearRegressionCalculator:
         except Exception as e:
             return 0
     
+    def predict_K_vectorized(self, Re, a, p, b):
+        """向量化预测传热系数K和管侧传热系数alpha_i
+        
+        参数:
+            Re: 雷诺数数组
+            a, p, b: 模型参数
+        
+        返回:
+            (K_pred, alpha_i) 两个与Re等长的数组，Re<=0的位置为0
+        """
+        Re = np.asarray(Re, dtype=float)
+        K_pred = np.zeros_like(Re)
+        alpha_i = np.zeros_like(Re)
+        
+        valid_mask = Re > 0
+        if np.any(valid_mask):
+            Re_valid = Re[valid_mask]
+            K_pred[valid_mask] = 1 / self.model_func(Re_valid, a, p, b)
+            alpha_i[valid_mask] = 1 / (a * np.power(Re_valid, -p))
+        
+        return K_pred, alpha_i
+    
     def calculate_predicted_K(self, record, a, p, b):
         """
         根据优化的参数预测传热系数K
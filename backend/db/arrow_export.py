@@ -0,0 +1,121 @@
+try:
+    import pyarrow as pa
+    import pyarrow.ipc
+    import pyarrow.parquet
+except ImportError:
+    # pyarrow为可选依赖，未安装时导出接口返回501
+    pa = None
+
+# 可导出的表及其列类型
+EXPORT_COLUMNS = {
+    'k_management': {
+        'heat_exchanger_id': 'int32',
+        'timestamp': 'timestamp',
+        'points': 'int32',
+        'side': 'string',
+        'K_LMTD': 'float64',
+        'K_predicted': 'float64',
+        'K_actual': 'float64'
+    },
+    'performance_parameters': {
+        'heat_exchanger_id': 'int32',
+        'timestamp': 'timestamp',
+        'points': 'int32',
+        'side': 'string',
+        'K': 'float64',
+        'alpha_i': 'float64',
+        'alpha_o': 'float64',
+        'heat_duty': 'float64',
+        'effectiveness': 'float64',
+        'lmtd': 'float64',
+        'fouling_resistance': 'float64'
+    }
+}
+
+# 导出格式及其媒体类型
+EXPORT_MEDIA_TYPES = {
+    'arrow': 'application/vnd.apache.arrow.stream',
+    'parquet': 'application/vnd.apache.parquet'
+}
+
+
+def arrow_available():
+    """pyarrow是否已安装"""
+    return pa is not None
+
+
+def build_schema(table, columns):
+    """按列类型构建Arrow schema"""
+    types = {
+        'int32': pa.int32(),
+        'float64': pa.float64(),
+        'string': pa.string(),
+        'timestamp': pa.timestamp('s')
+    }
+    return pa.schema([(column, types[EXPORT_COLUMNS[table][column]]) for column in columns])
+
+
+class _ChunkSink:
+    """只追加的写入目标，记录写入位置并允许取走已写入的字节，用于边写边发送"""
+    def __init__(self):
+        self._chunks = []
+        self._position = 0
+        self.closed = False
+
+    def write(self, data):
+        data = bytes(data)
+        self._chunks.append(data)
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def drain(self):
+        """取走并清空已写入的字节"""
+        data = b"".join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def iter_export(row_chunks, table, columns, export_format):
+    """把按块读取的查询结果编码为Arrow IPC流或Parquet文件，逐块产出字节
+
+    每块结果转换为一个RecordBatch（Parquet中为一个行组），内存中只保留当前块。
+
+    参数:
+        row_chunks: 产出行列表的迭代器（如DatabaseConnection.stream_query）
+        table: 表名，取值见EXPORT_COLUMNS
+        columns: 导出的列
+        export_format: 'arrow' 或 'parquet'
+    """
+    schema = build_schema(table, columns)
+    sink = _ChunkSink()
+    if export_format == 'arrow':
+        writer = pa.ipc.new_stream(sink, schema)
+    else:
+        writer = pa.parquet.ParquetWriter(sink, schema, compression='zstd')
+
+    for rows in row_chunks:
+        batch = pa.RecordBatch.from_pydict(
+            {column: [row[column] for row in rows] for column in columns},
+            schema=schema
+        )
+        if export_format == 'arrow':
+            writer.write_batch(batch)
+        else:
+            writer.write_table(pa.Table.from_batches([batch]))
+        data = sink.drain()
+        if data:
+            yield data
+
+    writer.close()
+    data = sink.drain()
+    if data:
+        yield data
@@ -0,0 +1,255 @@
+import glob
+import os
+from datetime import datetime, timedelta
+
+try:
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+    import pyarrow.parquet as pq
+except ImportError:
+    # pyarrow为可选依赖，未安装时不启用冷存储，只读写MySQL
+    pa = None
+
+# 可归档到Parquet的原始时序表及其列类型（不保存自增id）
+COLD_TABLES = {
+    'operation_parameters': {
+        'heat_exchanger_id': 'int32',
+        'timestamp': 'timestamp',
+        'points': 'int32',
+        'side': 'string',
+        'temperature': 'float64',
+        'pressure': 'float64',
+        'flow_rate': 'float64',
+        'velocity': 'float64'
+    },
+    'physical_parameters': {
+        'heat_exchanger_id': 'int32',
+        'timestamp': 'timestamp',
+        'points': 'int32',
+        'side': 'string',
+        'density': 'float64',
+        'viscosity': 'float64',
+        'thermal_conductivity': 'float64',
+        'specific_heat': 'float64',
+        'reynolds': 'float64',
+        'prandtl': 'float64'
+    }
+}
+
+# 归档时每次从数据库读取并写入一个Parquet行组的行数
+ARCHIVE_CHUNK_SIZE = 50000
+
+
+def month_start(value):
+    """value所在月的1日0点"""
+    return datetime(value.year, value.month, 1)
+
+
+def next_month(month):
+    """month（某月1日）的下一个月1日"""
+    return datetime(month.year + month.month // 12, month.month % 12 + 1, 1)
+
+
+class ColdStore:
+    """原始时序数据的Parquet冷存储
+
+    已结束的月份由归档任务（script/archive_cold_months.py）从MySQL移到
+    {目录}/{表名}/month=YYYY-MM/part-N.parquet，文件内按(timestamp, points, side)排序。
+    DataLoader按时间范围读取时先按月份目录裁剪文件，再把时间、points、side、换热器条件
+    下推到Parquet行组统计信息，只读取命中的行组，结果与MySQL中的热数据合并。
+    """
+    def __init__(self, directory):
+        self.directory = directory
+
+    def schema(self, table):
+        types = {
+            'int32': pa.int32(),
+            'float64': pa.float64(),
+            'string': pa.string(),
+            'timestamp': pa.timestamp('s')
+        }
+        return pa.schema([(column, types[kind]) for column, kind in COLD_TABLES[table].items()])
+
+    def archived_months(self, table):
+        """返回已归档的月份（每月1日）列表，按时间排序"""
+        months = []
+        table_dir = os.path.join(self.directory, table)
+        if not os.path.isdir(table_dir):
+            return months
+        for name in os.listdir(table_dir):
+            if name.startswith("month="):
+                months.append(datetime.strptime(name[len("month="):], "%Y-%m"))
+        return sorted(months)
+
+    def month_dir(self, table, month):
+        return os.path.join(self.directory, table, f"month={month:%Y-%m}")
+
+    def files_for_range(self, table, start_time, end_time):
+        """返回与半开区间[start_time, end_time)重叠的月份中的Parquet文件"""
+        files = []
+        for month in self.archived_months(table):
+            if month < end_time and next_month(month) > start_time:
+                files.extend(sorted(glob.glob(os.path.join(self.month_dir(table, month), "*.parquet"))))
+        return files
+
+    def build_filter(self, start_time, end_time, points=None, side=None, heat_exchanger_id=None):
+        expression = (ds.field('timestamp') >= start_time) & (ds.field('timestamp') < end_time)
+        if points is not None:
+            expression &= ds.field('points') == points
+        if side is not None:
+            expression &= ds.field('side') == side
+        if heat_exchanger_id is not None:
+            expression &= ds.field('heat_exchanger_id') == heat_exchanger_id
+        return expression
+
+    def read_range(self, table, start_time, end_time, columns=None, points=None, side=None, heat_exchanger_id=None):
+        """读取半开区间[start_time, end_time)内的归档行
+
+        参数:
+            table: 表名，取值见COLD_TABLES
+            start_time, end_time: 时间范围
+            columns: 返回的列，为None时返回全部列
+            points, side, heat_exchanger_id: 过滤条件，为None时不过滤
+
+        返回值: 行字典列表，与MySQL字典游标的行格式一致；范围内没有归档数据时返回空列表
+        """
+        files = self.files_for_range(table, start_time, end_time)
+        if not files:
+            return []
+        dataset = ds.dataset(files, schema=self.schema(table), format="parquet")
+        result = dataset.to_table(
+            columns=columns,
+            filter=self.build_filter(start_time, end_time, points, side, heat_exchanger_id)
+        )
+        return result.to_pylist()
+
+    def count_range(self, table, start_time, end_time, heat_exchanger_id=None):
+        """统计半开区间[start_time, end_time)内的归档行数"""
+        files = self.files_for_range(table, start_time, end_time)
+        if not files:
+            return 0
+        dataset = ds.dataset(files, schema=self.schema(table), format="parquet")
+        return dataset.count_rows(filter=self.build_filter(start_time, end_time, heat_exchanger_id=heat_exchanger_id))
+
+    def archive_month(self, db_conn, table, month):
+        """把某个已结束月份的数据从生产库移到Parquet
+
+        先写入临时文件并核对行数，再改名为正式文件，最后从数据库删除该月数据并提交。
+        同一月份再次归档（如归档后补录或重新处理的数据）时，把已归档的行与新数据合并为一个新的
+        part文件，相同(heat_exchanger_id, timestamp, points, side)的记录以生产库中的为准，
+        写入完成后删除旧的part文件，冷存储中不会出现重复记录。
+
+        参数:
+            db_conn: 已连接生产库的DatabaseConnection
+            table: 表名，取值见COLD_TABLES
+            month: 月份（每月1日）
+
+        返回值: 归档的行数（不含合并的已归档行）
+        """
+        start_time, end_time = month, next_month(month)
+        count = self.count_hot_rows(db_conn, table, start_time, end_time)
+        if not count:
+            return 0
+
+        target_dir = self.month_dir(table, month)
+        os.makedirs(target_dir, exist_ok=True)
+        old_files = sorted(glob.glob(os.path.join(target_dir, "*.parquet")))
+        part = max([int(os.path.basename(name)[len("part-"):-len(".parquet")]) for name in old_files], default=-1) + 1
+        path = os.path.join(target_dir, f"part-{part}.parquet")
+        temp_path = path + ".tmp"
+
+        schema = self.schema(table)
+        columns = list(COLD_TABLES[table])
+        query = f"""
+        SELECT {', '.join(f'`{column}`' for column in columns)} FROM {table}
+        WHERE timestamp >= %s AND timestamp < %s
+        ORDER BY timestamp, points, side
+        """
+        written = 0
+        try:
+            with pq.ParquetWriter(temp_path, schema, compression="zstd") as writer:
+                if old_files:
+                    archived = self.archived_rows_without_hot(db_conn, table, old_files, start_time, end_time)
+                    if archived.num_rows:
+                        writer.write_table(archived, row_group_size=ARCHIVE_CHUNK_SIZE)
+                for rows in db_conn.stream_query(query, [start_time, end_time], ARCHIVE_CHUNK_SIZE):
+                    writer.write_table(pa.Table.from_pylist(rows, schema=schema), row_group_size=ARCHIVE_CHUNK_SIZE)
+                    written += len(rows)
+            if written != count or self.count_hot_rows(db_conn, table, start_time, end_time) != count:
+                raise RuntimeError(f"{table} {month:%Y-%m}归档期间数据发生变化，已放弃本次归档")
+            os.replace(temp_path, path)
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+        # 新文件已包含旧文件中保留的行
+        for name in old_files:
+            os.remove(name)
+
+        self.delete_hot_rows(db_conn, table, start_time, end_time)
+        return written
+
+    def archived_rows_without_hot(self, db_conn, table, files, start_time, end_time):
+        """读取已归档的行，去掉生产库中有相同记录的行（重新处理后以生产库为准）"""
+        schema = self.schema(table)
+        archived = ds.dataset(files, schema=schema, format="parquet").to_table()
+        query = f"""
+        SELECT heat_exchanger_id, timestamp, points, side FROM {table}
+        WHERE timestamp >= %s AND timestamp < %s
+        """
+        hot_keys = set()
+        for rows in db_conn.stream_query(query, [start_time, end_time], ARCHIVE_CHUNK_SIZE):
+            hot_keys.update((row['heat_exchanger_id'], row['timestamp'], row['points'], row['side']) for row in rows)
+        if not hot_keys:
+            return archived
+        keep = [
+            key not in hot_keys
+            for key in zip(*(archived.column(column).to_pylist() for column in ('heat_exchanger_id', 'timestamp', 'points', 'side')))
+        ]
+        return archived.filter(pa.array(keep, type=pa.bool_()))
+
+    def count_hot_rows(self, db_conn, table, start_time, end_time):
+        query = f"SELECT COUNT(*) AS count FROM {table} WHERE timestamp >= %s AND timestamp < %s"
+        if not db_conn.execute_query(db_conn.prod_cursor, query, [start_time, end_time]):
+            raise RuntimeError(f"统计{table}的行数失败")
+        result = db_conn.fetch_one(db_conn.prod_cursor)
+        # 结束读事务，后续统计能看到其他连接已提交的数据
+        db_conn.commit(db_conn.prod_db)
+        return result['count'] if result else 0
+
+    def delete_hot_rows(self, db_conn, table, start_time, end_time):
+        """从生产库删除已归档月份的数据
+
+        MySQL中该月恰好是一个分区（见data/init_db.py的按月分区）时整分区删除，否则按天分批删除。
+        """
+        if db_conn.backend.name == "mysql":
+            partition = f"p{start_time:%Y%m}"
+            db_conn.execute_query(
+                db_conn.prod_cursor,
+                "SELECT PARTITION_DESCRIPTION FROM information_schema.PARTITIONS "
+                "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND PARTITION_NAME = %s",
+                [table, partition]
+            )
+            result = db_conn.fetch_one(db_conn.prod_cursor)
+            if result and result['PARTITION_DESCRIPTION'].strip("'")[:10] == f"{end_time:%Y-%m-%d}":
+                # 分区以下月1日为上界且以本月命名，整分区即本月数据
+                if db_conn.execute_query(db_conn.prod_cursor, f"ALTER TABLE {table} DROP PARTITION {partition}"):
+                    return
+
+        day = start_time
+        while day < end_time:
+            query = f"DELETE FROM {table} WHERE timestamp >= %s AND timestamp < %s"
+            if not db_conn.execute_query(db_conn.prod_cursor, query, [day, day + timedelta(days=1)]):
+                db_conn.rollback(db_conn.prod_db)
+                raise RuntimeError(f"删除{table}已归档的数据失败")
+            db_conn.commit(db_conn.prod_db)
+            day += timedelta(days=1)
+
+
+def open_cold_store(config):
+    """按配置项cold_storage_dir打开冷存储，未配置或未安装pyarrow时返回None"""
+    directory = config.get('cold_storage_dir')
+    if not directory or pa is None:
+        return None
+    if not os.path.isabs(directory):
+        directory = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), directory)
+    return ColdStore(directory)
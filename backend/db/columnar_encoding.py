@@ -0,0 +1,70 @@
+import gzip
+import json
+
+try:
+    import orjson
+except ImportError:
+    # orjson为可选依赖，未安装时使用标准库json
+    orjson = None
+
+try:
+    import brotli
+except ImportError:
+    # brotli为可选依赖，未安装时只协商gzip
+    brotli = None
+
+# 小于该字节数的响应不压缩
+COMPRESS_MIN_SIZE = 1024
+
+
+def to_columnar(rows):
+    """把行字典列表转换为列式结构，列名只出现一次
+
+    返回值: {"columns": 列名列表, "arrays": 与columns一一对应的值数组列表}
+    """
+    if not rows:
+        return {"columns": [], "arrays": []}
+    columns = list(rows[0].keys())
+    return {"columns": columns, "arrays": [[row[column] for row in rows] for column in columns]}
+
+
+def encode_json(body, default=None):
+    """序列化为JSON字节，优先使用orjson
+
+    参数:
+        body: 响应内容
+        default: 序列化特殊类型（如Decimal）的函数
+    """
+    if orjson is not None:
+        return orjson.dumps(body, default=default)
+    return json.dumps(body, default=default, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def negotiate_encoding(accept_encoding):
+    """根据Accept-Encoding选择压缩方式，优先br，其次gzip，都不接受时返回None"""
+    accepted = set()
+    for item in (accept_encoding or "").split(","):
+        name, _, weight = item.strip().partition(";")
+        if weight.strip().replace(" ", "") in ("q=0", "q=0.0", "q=0.00", "q=0.000"):
+            continue
+        accepted.add(name.strip().lower())
+    if brotli is not None and ("br" in accepted or "*" in accepted):
+        return "br"
+    if "gzip" in accepted or "*" in accepted:
+        return "gzip"
+    return None
+
+
+def compress(data, accept_encoding):
+    """按Accept-Encoding压缩响应体
+
+    返回值: (响应体字节, Content-Encoding)，未压缩时Content-Encoding为None
+    """
+    if len(data) < COMPRESS_MIN_SIZE:
+        return data, None
+    encoding = negotiate_encoding(accept_encoding)
+    if encoding == "br":
+        return brotli.compress(data, quality=5), "br"
+    if encoding == "gzip":
+        return gzip.compress(data, compresslevel=5), "gzip"
+    return data, None
@@ -1,21 +1,118 @@
+import json
 import pandas as pd
 import numpy as np
-from datetime import datetime
+from datetime import datetime, timedelta
 from pyfluids import Fluid, FluidsList
+from db.write_events import notify_write, to_datetime
+from db.rollups import refresh_rollups
+from db import time_keys
+from db.cold_storage import open_cold_store
 
 class DataLoader:
-    def __init__(self, db_connection):
+    def __init__(self, db_connection, heat_exchanger_id=None):
         self.db_conn = db_connection
+        # 指定换热器ID时，所有按时间读取的查询只返回该换热器的数据；为None时不过滤（单换热器部署）
+        self.heat_exchanger_id = heat_exchanger_id
+        # 已归档到Parquet的原始数据，未配置cold_storage_dir时为None
+        self.cold_store = open_cold_store(db_connection.config)
+    
+    def refresh_rollups_for(self, records, source):
+        """在当前事务中重算records覆盖的小时和日汇总行中源表source的列，由调用方提交
+        
+        汇总表更新失败（如尚未运行data/init_db.py创建汇总表）时只打印错误，不影响原始数据的写入。
+        """
+        timestamps = [to_datetime(record.get('timestamp')) for record in records]
+        timestamps = [timestamp for timestamp in timestamps if timestamp is not None]
+        if not timestamps:
+            return
+        heat_exchanger_ids = {record.get('heat_exchanger_id') for record in records}
+        if None in heat_exchanger_ids:
+            heat_exchanger_ids = None
+        try:
+            refresh_rollups(self.db_conn.prod_cursor, source, min(timestamps), max(timestamps), heat_exchanger_ids)
+        except Exception as e:
+            print(f"更新汇总表失败: {e}")
+    
+    def get_cold_rows(self, table, start_date, end_date, columns=None, points=None, side=None, heat_exchanger_id=None):
+        """读取冷存储中半开区间[start_date, end_date)内的归档行，未启用冷存储或范围内没有归档时返回空列表"""
+        if self.cold_store is None:
+            return []
+        try:
+            return self.cold_store.read_range(
+                table, to_datetime(start_date), to_datetime(end_date),
+                columns=columns, points=points, side=side, heat_exchanger_id=heat_exchanger_id
+            )
+        except Exception as e:
+            print(f"读取冷存储中的{table}失败: {e}")
+            return []
+    
+    @staticmethod
+    def merge_cold_rows(cold_rows, rows):
+        """合并冷存储中的归档行和MySQL中的热数据行
+        
+        已归档的月份被重新处理（如多换热器调度器补算）时，同一条记录会同时出现在冷存储和MySQL中，
+        按(heat_exchanger_id, timestamp, points, side)去重，保留MySQL中的行。
+        """
+        if not cold_rows:
+            return rows
+        hot_keys = {(row['heat_exchanger_id'], row['timestamp'], row['points'], row['side']) for row in rows}
+        return [
+            row for row in cold_rows
+            if (row['heat_exchanger_id'], row['timestamp'], row['points'], row['side']) not in hot_keys
+        ] + rows
+    
+    def attach_k_actual(self, rows, start_date, end_date, inner=False):
+        """为冷存储中的物理参数行补上k_management中的K_actual
+        
+        参数:
+            rows: 冷存储中的physical_parameters行
+            start_date, end_date: rows所在的半开区间
+            inner: True时只保留k_management中有对应记录的行（对应JOIN），否则对应LEFT JOIN
+        """
+        if not rows:
+            return rows
+        query = """
+        SELECT heat_exchanger_id, timestamp, points, side, K_actual
+        FROM k_management
+        WHERE timestamp >= %s AND timestamp < %s
+        """
+        params = [start_date, end_date]
+        
+        exchanger_sql, exchanger_params = self.exchanger_filter()
+        query += exchanger_sql
+        params.extend(exchanger_params)
+        
+        k_actual = {}
+        if self.db_conn.execute_query(self.db_conn.prod_cursor, query, params):
+            for row in self.db_conn.fetch_all(self.db_conn.prod_cursor):
+                k_actual[(row['heat_exchanger_id'], row['timestamp'], row['points'], row['side'])] = row['K_actual']
+        
+        joined = []
+        for row in rows:
+            key = (row['heat_exchanger_id'], row['timestamp'], row['points'], row['side'])
+            if inner and key not in k_actual:
+                continue
+            row['K_actual'] = k_actual.get(key)
+            joined.append(row)
+        return joined
+    
+    def exchanger_filter(self, column='heat_exchanger_id'):
+        """返回按当前换热器过滤的SQL条件和参数，未指定换热器时返回空条件"""
+        if self.heat_exchanger_id is None:
+            return "", []
+        return f" AND {column} = %s", [self.heat_exchanger_id]
     
     def get_operation_parameters_by_hour(self, day, hour):
         """根据天数和小时从测试数据库读取运行参数"""
-        # 计算时间范围，确保日期格式正确（day需要前导零）
-        start_date = f"2022-01-{day:02d} {hour:02d}:00:00"
-        end_date = f"2022-01-{day:02d} {hour:02d}:59:59"
+        start_date, end_date = time_keys.hour_bounds(day, hour)
         
         query = """SELECT * FROM operation_parameters 
-                   WHERE timestamp BETWEEN %s AND %s"""
-        params = (start_date, end_date)
+                   WHERE timestamp >= %s AND timestamp < %s"""
+        params = [start_date, end_date]
+        
+        exchanger_sql, exchanger_params = self.exchanger_filter()
+        query += exchanger_sql
+        params.extend(exchanger_params)
         
         if self.db_conn.execute_query(self.db_conn.test_cursor, query, params):
             return self.db_conn.fetch_all(self.db_conn.test_cursor)
@@ -23,13 +120,15 @@ class DataLoader:
     
     def get_physical_parameters_by_hour(self, day, hour):
         """根据天数和小时从测试数据库读取物理参数"""
-        # 计算时间范围，确保日期格式正确（day需要前导零）
-        start_date = f"2022-01-{day:02d} {hour:02d}:00:00"
-        end_date = f"2022-01-{day:02d} {hour:02d}:59:59"
+        start_date, end_date = time_keys.hour_bounds(day, hour)
         
         query = """SELECT * FROM physical_parameters 
-                   WHERE timestamp BETWEEN %s AND %s"""
-        params = (start_date, end_date)
+                   WHERE timestamp >= %s AND timestamp < %s"""
+        params = [start_date, end_date]
+        
+        exchanger_sql, exchanger_params = self.exchanger_filter()
+        query += exchanger_sql
+        params.extend(exchanger_params)
         
         if self.db_conn.execute_query(self.db_conn.test_cursor, query, params):
             return self.db_conn.fetch_all(self.db_conn.test_cursor)
@@ -222,6 +321,7 @@ class DataLoader:
             # 批量插入到生产数据库
             self.db_conn.prod_cursor.executemany(query, values)
             self.db_conn.commit(self.db_conn.prod_db)
+            notify_write('operation_parameters', processed_data)
             return True
         except Exception as e:
             print(f"插入运行参数失败: {e}")
@@ -249,6 +349,7 @@ class DataLoader:
             # 批量插入
             self.db_conn.prod_cursor.executemany(query, values)
             self.db_conn.commit(self.db_conn.prod_db)
+            notify_write('physical_parameters', data)
             return True
         except Exception as e:
             print(f"插入物理参数失败: {e}")
@@ -257,15 +358,17 @@ class DataLoader:
     
     def get_performance_parameters_by_hour(self, day, hour):
         """根据天数和小时从测试数据库读取性能参数"""
-        # 计算时间范围，确保日期格式正确（day需要前导零）
-        start_date = f"2022-01-{day:02d} {hour:02d}:00:00"
-        end_date = f"2022-01-{day:02d} {hour:02d}:59:59"
+        start_date, end_date = time_keys.hour_bounds(day, hour)
         
         query = """
         SELECT * FROM performance_parameters 
-        WHERE timestamp BETWEEN %s AND %s
+        WHERE timestamp >= %s AND timestamp < %s
         """
-        params = (start_date, end_date)
+        params = [start_date, end_date]
+        
+        exchanger_sql, exchanger_params = self.exchanger_filter()
+        query += exchanger_sql
+        params.extend(exchanger_params)
         
         if self.db_conn.execute_query(self.db_conn.test_cursor, query, params):
             return self.db_conn.fetch_all(self.db_conn.test_cursor)
@@ -290,54 +393,72 @@ class DataLoader:
             values.append(tuple(record.values()))
         
         try:
-            # 批量插入
+            # 批量插入，汇总表中的误差与k_management在同一事务中更新
             self.db_conn.prod_cursor.executemany(query, values)
+            self.refresh_rollups_for(data, 'k_management')
             self.db_conn.commit(self.db_conn.prod_db)
+            notify_write('k_management', data)
             return True
         except Exception as e:
             print(f"插入k_management失败: {e}")
             self.db_conn.rollback(self.db_conn.prod_db)
             return False
     
-    def insert_performance_parameters(self, data):
-        """将性能参数插入到生产数据库，遇到重复键时更新现有记录"""
-        if not data:
-            return True
+    def insert_performance_parameters(self, data, pipeline_state=None):
+        """将性能参数插入到生产数据库，遇到重复键时更新现有记录
         
+        参数:
+            data: 性能参数记录列表
+            pipeline_state: 流水线状态快照，提供时与性能参数在同一事务中写入pipeline_state表
+        """
         # 确保所有记录都有相同的字段
-        # 获取第一个记录的字段
-        fields = set(data[0].keys())
-        
-        # 过滤掉字段不一致的记录
         filtered_data = []
-        for record in data:
-            if set(record.keys()) == fields:
-                filtered_data.append(record)
-            else:
-                # 打印不一致的字段信息以便调试
-                print(f"过滤掉字段不一致的记录: {record}")
+        if data:
+            # 获取第一个记录的字段
+            fields = set(data[0].keys())
+            
+            # 过滤掉字段不一致的记录
+            for record in data:
+                if set(record.keys()) == fields:
+                    filtered_data.append(record)
+                else:
+                    # 打印不一致的字段信息以便调试
+                    print(f"过滤掉字段不一致的记录: {record}")
+            
+            if not filtered_data:
+                print("没有有效的性能参数数据可以插入")
         
-        if not filtered_data:
-            print("没有有效的性能参数数据可以插入")
+        if not filtered_data and pipeline_state is None:
             return True
         
-        # 构建插入语句，使用ON DUPLICATE KEY UPDATE避免重复键错误
-        columns = ', '.join(filtered_data[0].keys())
-        placeholders = ', '.join(['%s'] * len(filtered_data[0]))
-        
-        # 构建ON DUPLICATE KEY UPDATE子句
-        update_clause = ', '.join([f"{col} = VALUES({col})" for col in filtered_data[0].keys()])
-        query = f"INSERT INTO performance_parameters ({columns}) VALUES ({placeholders}) ON DUPLICATE KEY UPDATE {update_clause}"
-        
-        # 准备数据
-        values = []
-        for record in filtered_data:
-            values.append(tuple(record.values()))
-        
         try:
-            # 批量插入或更新
-            self.db_conn.prod_cursor.executemany(query, values)
+            if filtered_data:
+                # 构建插入语句，使用ON DUPLICATE KEY UPDATE避免重复键错误
+                columns = ', '.join(filtered_data[0].keys())
+                placeholders = ', '.join(['%s'] * len(filtered_data[0]))
+                
+                # 构建ON DUPLICATE KEY UPDATE子句
+                update_clause = ', '.join([f"{col} = VALUES({col})" for col in filtered_data[0].keys()])
+                query = f"INSERT INTO performance_parameters ({columns}) VALUES ({placeholders}) ON DUPLICATE KEY UPDATE {update_clause}"
+                
+                # 准备数据
+                values = []
+                for record in filtered_data:
+                    values.append(tuple(record.values()))
+                
+                # 批量插入或更新
+                self.db_conn.prod_cursor.executemany(query, values)
+            
+            if pipeline_state is not None:
+                self.save_pipeline_state(pipeline_state)
+            
+            # 该小时的汇总行与性能参数在同一事务中更新
+            if filtered_data:
+                self.refresh_rollups_for(filtered_data, 'performance_parameters')
+            
             self.db_conn.commit(self.db_conn.prod_db)
+            if filtered_data:
+                notify_write('performance_parameters', filtered_data)
             return True
         except Exception as e:
             print(f"插入/更新性能参数失败: {e}")
@@ -495,9 +616,7 @@ class DataLoader:
     
     def get_training_data_for_stage1(self, training_days):
         """获取阶段1训练数据"""
-        # 计算时间范围，确保日期格式正确（day需要前导零）
-        start_date = f"2022-01-01 00:00:00"
-        end_date = f"2022-01-{training_days:02d} 23:59:59"
+        start_date, end_date = time_keys.day_bounds(1, training_days)
         
         query = """
         SELECT p.*, k.K_actual AS K_actual
@@ -506,12 +625,19 @@ class DataLoader:
                            AND p.timestamp = k.timestamp 
                            AND p.points = k.points 
                            AND p.side = k.side
-        WHERE p.timestamp BETWEEN %s AND %s
+        WHERE p.timestamp >= %s AND p.timestamp < %s
         """
-        params = (start_date, end_date)
+        params = [start_date, end_date]
+        
+        exchanger_sql, exchanger_params = self.exchanger_filter('p.heat_exchanger_id')
+        query += exchanger_sql
+        params.extend(exchanger_params)
         
         if self.db_conn.execute_query(self.db_conn.prod_cursor, query, params):
-            return self.db_conn.fetch_all(self.db_conn.prod_cursor)
+            rows = self.db_conn.fetch_all(self.db_conn.prod_cursor)
+            # 合并已归档到冷存储的早期数据
+            cold_rows = self.get_cold_rows('physical_parameters', start_date, end_date, heat_exchanger_id=self.heat_exchanger_id)
+            return self.merge_cold_rows(self.attach_k_actual(cold_rows, start_date, end_date), rows)
         return []
     
     def insert_model_parameters(self, model_params, stage, training_days=None, points=None, side='tube'):
@@ -531,13 +657,13 @@ class DataLoader:
         if training_days:
             for day in range(1, training_days + 1):
                 # 使用每天03:00的时间戳
-                timestamp = f"2022-01-{day:02d} 03:00:00"
+                timestamp = time_keys.hour_start(day, 3)
                 data = {
                     'timestamp': timestamp,
                     'a': model_params['a'],
                     'p': model_params['p'],
                     'b': model_params['b'],
-                    'heat_exchanger_id': 1,  # 默认换热器ID为1
+                    'heat_exchanger_id': self.heat_exchanger_id or 1,  # 未指定换热器时默认ID为1
                     'points': points,
                     'side': side
                 }
@@ -550,7 +676,7 @@ class DataLoader:
                 'a': model_params['a'],
                 'p': model_params['p'],
                 'b': model_params['b'],
-                'heat_exchanger_id': 1  # 默认换热器ID为1
+                'heat_exchanger_id': self.heat_exchanger_id or 1  # 未指定换热器时默认ID为1
             }
             data_list.append(data)
         
@@ -564,6 +690,7 @@ class DataLoader:
             values = [tuple(data.values()) for data in data_list]
             self.db_conn.prod_cursor.executemany(query, values)
             self.db_conn.commit(self.db_conn.prod_db)
+            notify_write('model_parameters', data_list)
             print(f"成功插入{len(data_list)}条模型参数记录")
             return True
         except Exception as e:
@@ -573,15 +700,17 @@ class DataLoader:
     
     def get_test_performance_parameters_by_hour(self, day, hour):
         """根据天数和小时从测试数据库读取性能参数"""
-        # 计算时间范围，确保日期格式正确（day需要前导零）
-        start_date = f"2022-01-{day:02d} {hour:02d}:00:00"
-        end_date = f"2022-01-{day:02d} {hour:02d}:59:59"
+        start_date, end_date = time_keys.hour_bounds(day, hour)
         
         query = """
         SELECT * FROM performance_parameters 
-        WHERE timestamp BETWEEN %s AND %s
+        WHERE timestamp >= %s AND timestamp < %s
         """
-        params = (start_date, end_date)
+        params = [start_date, end_date]
+        
+        exchanger_sql, exchanger_params = self.exchanger_filter()
+        query += exchanger_sql
+        params.extend(exchanger_params)
         
         if self.db_conn.execute_query(self.db_conn.test_cursor, query, params):
             return self.db_conn.fetch_all(self.db_conn.test_cursor)
@@ -611,9 +740,11 @@ class DataLoader:
             ))
         
         try:
-            # 批量更新
+            # 批量更新，汇总表中的K_predicted平均值和误差随之重算
             self.db_conn.prod_cursor.executemany(query, values)
+            self.refresh_rollups_for(data, 'k_management')
             self.db_conn.commit(self.db_conn.prod_db)
+            notify_write('k_management', data)
             return True
         except Exception as e:
             print(f"更新k_management失败: {e}")
@@ -622,20 +753,30 @@ class DataLoader:
     
     def get_new_data_count_for_stage2(self, day, optimization_hours):
         """获取新一天的数据数量，用于判断是否进入阶段2优化"""
-        # 计算时间范围，确保日期格式正确（day需要前导零）
-        start_date = f"2022-01-{day:02d} 00:00:00"
-        end_date = f"2022-01-{day:02d} {optimization_hours-1:02d}:59:59"
+        start_date, end_date = time_keys.hours_bounds(day, 0, optimization_hours - 1)
         
         query = """
         SELECT COUNT(*) as count
         FROM physical_parameters
-        WHERE timestamp BETWEEN %s AND %s
+        WHERE timestamp >= %s AND timestamp < %s
         """
-        params = (start_date, end_date)
+        params = [start_date, end_date]
+        
+        exchanger_sql, exchanger_params = self.exchanger_filter()
+        query += exchanger_sql
+        params.extend(exchanger_params)
         
         if self.db_conn.execute_query(self.db_conn.prod_cursor, query, params):
             result = self.db_conn.fetch_one(self.db_conn.prod_cursor)
-            return result['count'] if result else 0
+            count = result['count'] if result else 0
+            if self.cold_store is not None:
+                try:
+                    count += self.cold_store.count_range(
+                        'physical_parameters', start_date, end_date, heat_exchanger_id=self.heat_exchanger_id
+                    )
+                except Exception as e:
+                    print(f"统计冷存储中的physical_parameters失败: {e}")
+            return count
         return 0
     
     def get_optimization_data_for_stage2(self, day, optimization_hours, history_days, points=None):
@@ -648,13 +789,11 @@ class DataLoader:
             points: 指定points，如果为None则获取所有points的数据
         """
         # 获取当天的optimization_hours数据
-        day_start_date = f"2022-01-{day:02d} 00:00:00"
-        day_end_date = f"2022-01-{day:02d} {optimization_hours-1:02d}:59:59"
+        day_start_date, day_end_date = time_keys.hours_bounds(day, 0, optimization_hours - 1)
         
-        # 获取历史数据（history_days天）
+        # 获取历史数据（history_days天），第1天没有历史数据时区间为空
         history_start_day = max(1, day - history_days)
-        history_start_date = f"2022-01-{history_start_day:02d} 00:00:00"
-        history_end_date = f"2022-01-{day-1:02d} 23:59:59"
+        history_start_date, history_end_date = time_keys.day_bounds(history_start_day, day - 1)
         
         # 构建基础查询
         query = """
@@ -664,11 +803,15 @@ class DataLoader:
                            AND p.timestamp = k.timestamp 
                            AND p.points = k.points 
                            AND p.side = k.side
-        WHERE ((p.timestamp BETWEEN %s AND %s)
-           OR (p.timestamp BETWEEN %s AND %s))
+        WHERE ((p.timestamp >= %s AND p.timestamp < %s)
+           OR (p.timestamp >= %s AND p.timestamp < %s))
         """
         params = [day_start_date, day_end_date, history_start_date, history_end_date]
         
+        exchanger_sql, exchanger_params = self.exchanger_filter('p.heat_exchanger_id')
+        query += exchanger_sql
+        params.extend(exchanger_params)
+        
         # 如果指定了points，添加points过滤条件
         if points is not None:
             query += " AND p.points = %s"
@@ -678,13 +821,23 @@ class DataLoader:
         query += " ORDER BY p.timestamp"
         
         if self.db_conn.execute_query(self.db_conn.prod_cursor, query, params):
-            return self.db_conn.fetch_all(self.db_conn.prod_cursor)
+            rows = self.db_conn.fetch_all(self.db_conn.prod_cursor)
+            # 合并已归档到冷存储的历史数据，合并后重新按时间排序
+            cold_rows = []
+            for start_date, end_date in ((day_start_date, day_end_date), (history_start_date, history_end_date)):
+                cold_rows += self.attach_k_actual(
+                    self.get_cold_rows('physical_parameters', start_date, end_date, points=points,
+                                       heat_exchanger_id=self.heat_exchanger_id),
+                    start_date, end_date
+                )
+            if cold_rows:
+                rows = sorted(self.merge_cold_rows(cold_rows, rows), key=lambda row: row['timestamp'])
+            return rows
         return []
     
     def get_data_for_reprocess(self, start_day, end_day):
         """获取指定天数范围内的数据，用于重新处理"""
-        start_date = f"2022-01-{start_day:02d} 00:00:00"
-        end_date = f"2022-01-{end_day:02d} 23:59:59"
+        start_date, end_date = time_keys.day_bounds(start_day, end_day)
         
         query = """
         SELECT p.*, k.K_actual
@@ -693,37 +846,77 @@ class DataLoader:
                            AND p.timestamp = k.timestamp 
                            AND p.points = k.points 
                            AND p.side = k.side
-        WHERE p.timestamp BETWEEN %s AND %s
+        WHERE p.timestamp >= %s AND p.timestamp < %s
         """
-        params = (start_date, end_date)
+        params = [start_date, end_date]
+        
+        exchanger_sql, exchanger_params = self.exchanger_filter('p.heat_exchanger_id')
+        query += exchanger_sql
+        params.extend(exchanger_params)
         
         if self.db_conn.execute_query(self.db_conn.prod_cursor, query, params):
-            return self.db_conn.fetch_all(self.db_conn.prod_cursor)
+            rows = self.db_conn.fetch_all(self.db_conn.prod_cursor)
+            cold_rows = self.get_cold_rows('physical_parameters', start_date, end_date, heat_exchanger_id=self.heat_exchanger_id)
+            return self.merge_cold_rows(self.attach_k_actual(cold_rows, start_date, end_date, inner=True), rows)
         return []
     
     def calculate_average_error(self, day, hours=None):
-        """计算指定天数的平均误差（K_predicted vs K_actual）"""
+        """计算指定天数的平均误差（K_predicted vs K_actual）
+        
+        参数:
+            day: 天数
+            hours: (起始小时, 结束小时)，为None时计算整天
+        """
+        if hours is None:
+            # 整天优先从日汇总表按样本数加权读取，汇总行随k_management的写入在同一事务中更新
+            avg_error = self.get_daily_rollup_error(day)
+            if avg_error is not None:
+                return avg_error
         if hours is None:
-            start_date = f"2022-01-{day:02d} 00:00:00"
-            end_date = f"2022-01-{day:02d} 23:59:59"
+            start_date, end_date = time_keys.day_bounds(day)
         else:
-            start_date = f"2022-01-{day:02d} {hours[0]:02d}:00:00"
-            end_date = f"2022-01-{day:02d} {hours[1]:02d}:59:59"
+            start_date, end_date = time_keys.hours_bounds(day, hours[0], hours[1])
         
         query = """
         SELECT AVG(ABS(K_predicted - K_actual) / NULLIF(K_actual, 0) * 100) as avg_error
         FROM k_management
-        WHERE timestamp BETWEEN %s AND %s
+        WHERE timestamp >= %s AND timestamp < %s
           AND K_actual > 0
           AND K_predicted > 0
         """
-        params = (start_date, end_date)
+        params = [start_date, end_date]
+        
+        exchanger_sql, exchanger_params = self.exchanger_filter()
+        query += exchanger_sql
+        params.extend(exchanger_params)
         
         if self.db_conn.execute_query(self.db_conn.prod_cursor, query, params):
             result = self.db_conn.fetch_one(self.db_conn.prod_cursor)
             return result['avg_error'] if result and result['avg_error'] is not None else 0
         return 0
     
+    def get_daily_rollup_error(self, day):
+        """从日汇总表读取指定天的平均误差，汇总表不存在或该天没有汇总行时返回None"""
+        query = """
+        SELECT SUM(error_mean * error_count) / NULLIF(SUM(error_count), 0) AS avg_error, COUNT(*) AS row_count
+        FROM performance_rollup_daily
+        WHERE bucket_start = %s
+        """
+        params = [time_keys.hour_start(day)]
+        
+        exchanger_sql, exchanger_params = self.exchanger_filter()
+        query += exchanger_sql
+        params.extend(exchanger_params)
+        
+        try:
+            self.db_conn.prod_cursor.execute(query, params)
+            result = self.db_conn.prod_cursor.fetchone()
+        except Exception:
+            return None
+        if not result or not result['row_count']:
+            return None
+        return float(result['avg_error']) if result['avg_error'] is not None else 0
+    
     def update_performance_parameters_k(self, data):
         """更新performance_parameters表的K字段"""
         if not data:
@@ -750,21 +943,217 @@ class DataLoader:
         try:
             # 批量更新
             self.db_conn.prod_cursor.executemany(query, values)
+            # 重新预测后重算受影响范围的汇总行
+            self.refresh_rollups_for(data, 'performance_parameters')
             self.db_conn.commit(self.db_conn.prod_db)
+            notify_write('performance_parameters', data)
             return True
         except Exception as e:
             print(f"更新performance_parameters的K值失败: {e}")
             self.db_conn.rollback(self.db_conn.prod_db)
             return False
     
-
-
-
-
-
-
-
-
-
-
-
+    def update_performance_parameters_prediction(self, data):
+        """更新performance_parameters表中由模型预测得到的K、alpha_i和fouling_resistance字段"""
+        if not data:
+            return True
+        
+        query = """
+        UPDATE performance_parameters 
+        SET K = %s, alpha_i = %s, fouling_resistance = %s 
+        WHERE heat_exchanger_id = %s AND timestamp = %s AND points = %s AND side = %s
+        """
+        
+        values = []
+        for record in data:
+            values.append((
+                record.get('K', 0),
+                record.get('alpha_i', 0),
+                record.get('fouling_resistance', 0),
+                record['heat_exchanger_id'],
+                record['timestamp'],
+                record['points'],
+                record['side']
+            ))
+        
+        try:
+            self.db_conn.prod_cursor.executemany(query, values)
+            # 重新预测后重算受影响范围的汇总行
+            self.refresh_rollups_for(data, 'performance_parameters')
+            self.db_conn.commit(self.db_conn.prod_db)
+            notify_write('performance_parameters', data)
+            return True
+        except Exception as e:
+            print(f"更新performance_parameters的预测值失败: {e}")
+            self.db_conn.rollback(self.db_conn.prod_db)
+            return False
+    
+    def get_tube_reynolds_by_range(self, start_date, end_date, points=None, heat_exchanger_id=None):
+        """从生产数据库读取指定时间范围内tube侧的雷诺数，用于按新模型参数计算K_predicted"""
+        query = """
+        SELECT heat_exchanger_id, timestamp, points, side, reynolds
+        FROM physical_parameters
+        WHERE side = 'tube' AND timestamp BETWEEN %s AND %s
+        """
+        params = [start_date, end_date]
+        
+        if points is not None:
+            query += " AND points = %s"
+            params.append(points)
+        if heat_exchanger_id is not None:
+            query += " AND heat_exchanger_id = %s"
+            params.append(heat_exchanger_id)
+        
+        if self.db_conn.execute_query(self.db_conn.prod_cursor, query, params):
+            rows = self.db_conn.fetch_all(self.db_conn.prod_cursor)
+            # 失效区间为闭区间，读取冷存储时换成半开区间
+            cold_start, cold_end = to_datetime(start_date), to_datetime(end_date) + timedelta(seconds=1)
+            cold_rows = self.get_cold_rows(
+                'physical_parameters', cold_start, cold_end,
+                columns=['heat_exchanger_id', 'timestamp', 'points', 'side', 'reynolds'],
+                points=points, side='tube', heat_exchanger_id=heat_exchanger_id
+            )
+            return self.merge_cold_rows(cold_rows, rows)
+        return []
+    
+    def mark_k_predicted_stale(self, start_date, end_date, model_version, model_params, points=None, side='tube', heat_exchanger_id=1):
+        """记录一个需要按新模型参数刷新K_predicted的区间，每次模型更新只写入一行
+        
+        参数:
+            start_date, end_date: 区间起止时间（闭区间）
+            model_version: 模型版本号
+            model_params: 参数快照 {'default': {...}, 'points': {points: {...}}}
+            points: 测量点，为None表示全部points
+        """
+        query = """
+        INSERT INTO k_predicted_stale_ranges 
+            (heat_exchanger_id, points, side, start_time, end_time, model_version, model_params, materialized, created_at)
+        VALUES (%s, %s, %s, %s, %s, %s, %s, 0, NOW())
+        """
+        params = (
+            heat_exchanger_id, points, side, start_date, end_date,
+            model_version, json.dumps(model_params)
+        )
+        
+        try:
+            self.db_conn.prod_cursor.execute(query, params)
+            self.db_conn.commit(self.db_conn.prod_db)
+            # 待刷新区间改变了读取时叠加的K_predicted
+            for table in ('k_management', 'performance_parameters'):
+                notify_write(table, start_time=start_date, end_time=end_date, heat_exchanger_id=heat_exchanger_id)
+            return True
+        except Exception as e:
+            print(f"记录K_predicted待刷新区间失败: {e}")
+            self.db_conn.rollback(self.db_conn.prod_db)
+            return False
+    
+    def get_pending_k_predicted_ranges(self, start_date=None, end_date=None):
+        """获取尚未物化的K_predicted待刷新区间，按写入顺序排列"""
+        query = "SELECT * FROM k_predicted_stale_ranges WHERE materialized = 0"
+        params = []
+        
+        # 只取与查询范围重叠的区间
+        if end_date is not None:
+            query += " AND start_time <= %s"
+            params.append(end_date)
+        if start_date is not None:
+            query += " AND end_time >= %s"
+            params.append(start_date)
+        exchanger_sql, exchanger_params = self.exchanger_filter()
+        query += exchanger_sql
+        params.extend(exchanger_params)
+        query += " ORDER BY id"
+        
+        if self.db_conn.execute_query(self.db_conn.prod_cursor, query, params):
+            return self.db_conn.fetch_all(self.db_conn.prod_cursor)
+        return []
+    
+    def mark_k_predicted_ranges_materialized(self, range_ids):
+        """将已写回数据库的待刷新区间标记为已物化"""
+        if not range_ids:
+            return True
+        
+        placeholders = ', '.join(['%s'] * len(range_ids))
+        query = f"UPDATE k_predicted_stale_ranges SET materialized = 1 WHERE id IN ({placeholders})"
+        
+        try:
+            self.db_conn.prod_cursor.execute(query, tuple(range_ids))
+            self.db_conn.commit(self.db_conn.prod_db)
+            return True
+        except Exception as e:
+            print(f"标记待刷新区间失败: {e}")
+            self.db_conn.rollback(self.db_conn.prod_db)
+            return False
+    
+    def get_latest_model_version(self):
+        """获取当前换热器已记录的最新模型版本号"""
+        query = "SELECT MAX(model_version) AS model_version FROM k_predicted_stale_ranges WHERE 1=1"
+        exchanger_sql, params = self.exchanger_filter()
+        query += exchanger_sql
+        
+        if self.db_conn.execute_query(self.db_conn.prod_cursor, query, params):
+            result = self.db_conn.fetch_one(self.db_conn.prod_cursor)
+            return result['model_version'] if result and result['model_version'] is not None else 0
+        return 0
+    
+    def get_hour_fingerprints(self, start_date, end_date, heat_exchanger_id=1):
+        """读取半开区间[start_date, end_date)内各小时已记录的输入指纹
+        
+        返回值: {小时起点datetime: fingerprint}
+        """
+        query = """
+        SELECT hour_start, fingerprint
+        FROM hour_fingerprints
+        WHERE heat_exchanger_id = %s AND hour_start >= %s AND hour_start < %s
+        """
+        params = (heat_exchanger_id, start_date, end_date)
+        
+        if self.db_conn.execute_query(self.db_conn.prod_cursor, query, params):
+            return {
+                to_datetime(row['hour_start']): row['fingerprint']
+                for row in self.db_conn.fetch_all(self.db_conn.prod_cursor)
+            }
+        return {}
+    
+    def save_hour_fingerprint(self, hour_start, fingerprint, model_version, heat_exchanger_id=1):
+        """记录某个小时的输入指纹，遇到重复键时更新"""
+        query = """
+        INSERT INTO hour_fingerprints (heat_exchanger_id, hour_start, fingerprint, model_version, updated_at)
+        VALUES (%s, %s, %s, %s, NOW())
+        ON DUPLICATE KEY UPDATE fingerprint = VALUES(fingerprint), model_version = VALUES(model_version), updated_at = NOW()
+        """
+        params = (heat_exchanger_id, hour_start, fingerprint, model_version)
+        
+        try:
+            self.db_conn.prod_cursor.execute(query, params)
+            self.db_conn.commit(self.db_conn.prod_db)
+            return True
+        except Exception as e:
+            print(f"记录小时输入指纹失败: {e}")
+            self.db_conn.rollback(self.db_conn.prod_db)
+            return False
+    
+    def save_pipeline_state(self, state, heat_exchanger_id=1):
+        """写入流水线状态快照（不提交，由调用方与当前小时的结果一起提交）"""
+        query = """
+        INSERT INTO pipeline_state (heat_exchanger_id, day, hour, state, updated_at)
+        VALUES (%s, %s, %s, %s, NOW())
+        ON DUPLICATE KEY UPDATE day = VALUES(day), hour = VALUES(hour), state = VALUES(state), updated_at = NOW()
+        """
+        params = (
+            state.get('heat_exchanger_id', heat_exchanger_id),
+            state.get('day'),
+            state.get('hour'),
+            json.dumps(state)
+        )
+        self.db_conn.prod_cursor.execute(query, params)
+    
+    def load_pipeline_state(self, heat_exchanger_id=1):
+        """按换热器读取流水线状态快照，没有记录时返回None"""
+        query = "SELECT state FROM pipeline_state WHERE heat_exchanger_id = %s"
+        
+        if self.db_conn.execute_query(self.db_conn.prod_cursor, query, (heat_exchanger_id,)):
+            result = self.db_conn.fetch_one(self.db_conn.prod_cursor)
+            if result and result['state']:
+                return json.loads(result['state'])
+        return None
@@ -1,7 +1,6 @@
-import mysql.connector
-from mysql.connector import Error
 import json
 import os
+from db.storage_backends import create_storage_backend, mysql_db_config
 
 class DatabaseConnection:
     def __init__(self, config_source):
@@ -16,6 +15,10 @@ class DatabaseConnection:
             self.config_file = config_source
             self.config = self.load_config()
         
+        # 存储后端：MySQL或嵌入式SQLite文件，由配置项storage_backend指定
+        self.backend = create_storage_backend(self.config)
+        self.errors = self.backend.errors
+        
         self.test_db = None
         self.prod_db = None
         self.test_cursor = None
@@ -26,51 +29,33 @@ class DatabaseConnection:
         with open(self.config_file, 'r', encoding='utf-8') as f:
             return json.load(f)
     
+    def get_db_config(self, kind):
+        """获取MySQL数据库连接配置
+        
+        参数:
+            kind: 'test' 或 'prod'
+        """
+        return mysql_db_config(self.config, kind)
+    
     def connect_test_db(self):
         """连接到测试数据库"""
         try:
-            # 支持两种配置键名：test 和 test_db
-            if 'test' in self.config['database']:
-                db_config = self.config['database']['test']
-            else:
-                db_config = self.config['database']['test_db']
-            
-            self.test_db = mysql.connector.connect(
-                host=db_config['host'],
-                port=db_config['port'],
-                user=db_config['user'],
-                password=db_config['password'],
-                database=db_config['database'],
-                charset='utf8mb4'
-            )
+            self.test_db = self.backend.connect('test')
             self.test_cursor = self.test_db.cursor(dictionary=True)
-            print(f"成功连接到测试数据库: {db_config['database']}")
+            print(f"成功连接到测试数据库: {self.backend.describe('test')}")
             return True
-        except Error as e:
+        except self.errors as e:
             print(f"连接测试数据库失败: {e}")
             return False
     
     def connect_prod_db(self):
         """连接到生产数据库"""
         try:
-            # 支持两种配置键名：production 和 prod_db
-            if 'production' in self.config['database']:
-                db_config = self.config['database']['production']
-            else:
-                db_config = self.config['database']['prod_db']
-            
-            self.prod_db = mysql.connector.connect(
-                host=db_config['host'],
-                port=db_config['port'],
-                user=db_config['user'],
-                password=db_config['password'],
-                database=db_config['database'],
-                charset='utf8mb4'
-            )
+            self.prod_db = self.backend.connect('prod')
             self.prod_cursor = self.prod_db.cursor(dictionary=True)
-            print(f"成功连接到生产数据库: {db_config['database']}")
+            print(f"成功连接到生产数据库: {self.backend.describe('prod')}")
             return True
-        except Error as e:
+        except self.errors as e:
             print(f"连接生产数据库失败: {e}")
             return False
     
@@ -78,17 +63,21 @@ class DatabaseConnection:
         """断开测试数据库连接"""
         if self.test_cursor:
             self.test_cursor.close()
+            self.test_cursor = None
         if self.test_db and self.test_db.is_connected():
             self.test_db.close()
             print("测试数据库连接已关闭")
+        self.test_db = None
     
     def disconnect_prod_db(self):
         """断开生产数据库连接"""
         if self.prod_cursor:
             self.prod_cursor.close()
+            self.prod_cursor = None
         if self.prod_db and self.prod_db.is_connected():
             self.prod_db.close()
             print("生产数据库连接已关闭")
+        self.prod_db = None
     
     def execute_query(self, cursor, query, params=None):
         """执行SQL查询"""
@@ -98,11 +87,41 @@ class DatabaseConnection:
             else:
                 cursor.execute(query)
             return True
-        except Error as e:
+        except self.errors as e:
             print(f"执行查询失败: {e}")
             print(f"查询语句: {query}")
             return False
     
+    def stream_query(self, query, params=None, chunk_size=1000, kind='prod'):
+        """在独立连接上用非缓冲游标执行查询，按块逐步产出结果
+        
+        结果集由服务器逐块发送，客户端内存中最多只保留chunk_size行。
+        流式读取期间连接被结果集占用，因此不使用共享的test_cursor/prod_cursor。
+        
+        参数:
+            query: SQL查询语句
+            params: 查询参数
+            chunk_size: 每块行数
+            kind: 'test' 或 'prod'
+        
+        返回值: 生成器，每次产出一个行列表
+        """
+        db = self.backend.connect(kind)
+        cursor = db.cursor(dictionary=True, buffered=False)
+        try:
+            cursor.execute(query, params or ())
+            while True:
+                rows = cursor.fetchmany(chunk_size)
+                if not rows:
+                    break
+                yield rows
+        finally:
+            try:
+                cursor.close()
+            except self.errors:
+                pass
+            self.backend.close_stream(db)
+    
     def fetch_all(self, cursor):
         """获取所有查询结果"""
         return cursor.fetchall()
@@ -116,7 +135,7 @@ class DatabaseConnection:
         try:
             db.commit()
             return True
-        except Error as e:
+        except self.errors as e:
             print(f"提交事务失败: {e}")
             return False
     
@@ -125,6 +144,6 @@ class DatabaseConnection:
         try:
             db.rollback()
             return True
-        except Error as e:
+        except self.errors as e:
             print(f"回滚事务失败: {e}")
             return False
\ No newline at end of file
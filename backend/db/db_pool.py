@@ -0,0 +1,74 @@
+import threading
+from contextlib import contextmanager
+from mysql.connector import pooling
+from mysql.connector import Error
+from db.db_connection import DatabaseConnection
+
+class DatabasePool:
+    """生产数据库连接池
+
+    供API在线程池中并发执行只读查询，每个线程从池中借用独立连接，
+    不与计算器的共享连接和游标争用。
+    """
+    def __init__(self, config, pool_size=8, pool_name="api_pool"):
+        """
+        参数:
+            config: 配置字典（与DatabaseConnection相同）
+            pool_size: 连接数，mysql-connector最多支持32
+            pool_name: 连接池名称
+        """
+        self.config = config
+        self.pool_size = min(max(1, pool_size), 32)
+        self.pool_name = pool_name
+        self.pool = None
+        self._pool_lock = threading.Lock()
+
+    def ensure_pool(self):
+        """首次使用时创建连接池，并发的首批请求只创建一个连接池"""
+        if self.pool is not None:
+            return self.pool
+        with self._pool_lock:
+            if self.pool is not None:
+                return self.pool
+            db_config = DatabaseConnection(self.config).get_db_config('prod')
+            self.pool = pooling.MySQLConnectionPool(
+                pool_name=self.pool_name,
+                pool_size=self.pool_size,
+                pool_reset_session=True,
+                host=db_config['host'],
+                port=db_config['port'],
+                user=db_config['user'],
+                password=db_config['password'],
+                database=db_config['database'],
+                charset='utf8mb4',
+                autocommit=True
+            )
+            print(f"已创建生产数据库连接池: {db_config['database']}，连接数{self.pool_size}")
+        return self.pool
+
+    @contextmanager
+    def connection(self):
+        """从池中借用一个连接，包装为DatabaseConnection（使用prod_db/prod_cursor），用完归还
+
+        可直接传给DataLoader使用。
+        """
+        db = self.ensure_pool().get_connection()
+        db_conn = DatabaseConnection(self.config)
+        db_conn.prod_db = db
+        db_conn.prod_cursor = db.cursor(dictionary=True)
+        try:
+            yield db_conn
+        finally:
+            try:
+                db_conn.prod_cursor.close()
+            except Error:
+                pass
+            # 归还连接到池中
+            db.close()
+
+    def fetch_all(self, query, params=None):
+        """执行查询并返回全部结果，失败时返回None"""
+        with self.connection() as db_conn:
+            if db_conn.execute_query(db_conn.prod_cursor, query, params):
+                return db_conn.fetch_all(db_conn.prod_cursor)
+            return None
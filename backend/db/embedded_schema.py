@@ -0,0 +1,135 @@
+# 嵌入式（SQLite）数据库的表结构，与data/models.py中的表一一对应
+# 测试库和生产库使用同一套表结构，连接时自动创建不存在的表
+
+_TIME_SERIES_KEY = """
+    id INTEGER PRIMARY KEY,
+    heat_exchanger_id INTEGER NOT NULL,
+    timestamp TIMESTAMP NOT NULL,
+    points INTEGER NOT NULL,
+    side TEXT NOT NULL,"""
+
+_ROLLUP_COLUMNS = """
+    id INTEGER PRIMARY KEY,
+    heat_exchanger_id INTEGER NOT NULL,
+    bucket_start TIMESTAMP NOT NULL,
+    points INTEGER NOT NULL,
+    side TEXT NOT NULL,
+    sample_count INTEGER NOT NULL,
+    K_min REAL, K_mean REAL, K_max REAL, K_count INTEGER NOT NULL,
+    heat_duty_min REAL, heat_duty_mean REAL, heat_duty_max REAL, heat_duty_count INTEGER NOT NULL,
+    lmtd_min REAL, lmtd_mean REAL, lmtd_max REAL, lmtd_count INTEGER NOT NULL,
+    K_actual_mean REAL,
+    K_predicted_mean REAL,
+    error_mean REAL,
+    error_count INTEGER NOT NULL,
+    UNIQUE (heat_exchanger_id, bucket_start, points, side)"""
+
+EMBEDDED_SCHEMA = [
+    """CREATE TABLE IF NOT EXISTS heat_exchanger (
+    id INTEGER PRIMARY KEY,
+    type TEXT NOT NULL,
+    tube_side_fluid TEXT NOT NULL,
+    shell_side_fluid TEXT NOT NULL,
+    tube_section_count INTEGER NOT NULL,
+    shell_section_count INTEGER NOT NULL,
+    d_i_original REAL NOT NULL,
+    d_o REAL NOT NULL,
+    lambda_t REAL NOT NULL,
+    heat_exchange_area REAL,
+    tube_passes INTEGER,
+    shell_passes INTEGER,
+    tube_wall_thickness REAL,
+    tube_length REAL,
+    tube_count INTEGER,
+    tube_arrangement TEXT,
+    tube_pitch REAL,
+    shell_inner_diameter REAL,
+    baffle_type TEXT,
+    baffle_cut_ratio REAL,
+    baffle_spacing REAL
+)""",
+    f"""CREATE TABLE IF NOT EXISTS operation_parameters ({_TIME_SERIES_KEY}
+    temperature REAL,
+    pressure REAL,
+    flow_rate REAL,
+    velocity REAL,
+    UNIQUE (heat_exchanger_id, timestamp, points, side)
+)""",
+    f"""CREATE TABLE IF NOT EXISTS physical_parameters ({_TIME_SERIES_KEY}
+    density REAL,
+    viscosity REAL,
+    thermal_conductivity REAL,
+    specific_heat REAL,
+    reynolds REAL,
+    prandtl REAL,
+    UNIQUE (heat_exchanger_id, timestamp, points, side)
+)""",
+    f"""CREATE TABLE IF NOT EXISTS performance_parameters ({_TIME_SERIES_KEY}
+    K REAL,
+    alpha_i REAL,
+    alpha_o REAL,
+    heat_duty REAL,
+    effectiveness REAL,
+    lmtd REAL,
+    fouling_resistance REAL,
+    UNIQUE (heat_exchanger_id, timestamp, points, side)
+)""",
+    f"""CREATE TABLE IF NOT EXISTS model_parameters ({_TIME_SERIES_KEY}
+    a REAL,
+    p REAL,
+    b REAL,
+    UNIQUE (heat_exchanger_id, timestamp, points, side)
+)""",
+    f"""CREATE TABLE IF NOT EXISTS k_management ({_TIME_SERIES_KEY}
+    K_LMTD REAL,
+    K_predicted REAL,
+    K_actual REAL,
+    UNIQUE (heat_exchanger_id, timestamp, points, side)
+)""",
+    """CREATE TABLE IF NOT EXISTS k_predicted_stale_ranges (
+    id INTEGER PRIMARY KEY,
+    heat_exchanger_id INTEGER NOT NULL,
+    points INTEGER,
+    side TEXT NOT NULL,
+    start_time TIMESTAMP NOT NULL,
+    end_time TIMESTAMP NOT NULL,
+    model_version INTEGER NOT NULL,
+    model_params TEXT NOT NULL,
+    materialized INTEGER NOT NULL DEFAULT 0,
+    created_at TIMESTAMP
+)""",
+    """CREATE TABLE IF NOT EXISTS hour_fingerprints (
+    id INTEGER PRIMARY KEY,
+    heat_exchanger_id INTEGER NOT NULL,
+    hour_start TIMESTAMP NOT NULL,
+    fingerprint TEXT NOT NULL,
+    model_version INTEGER NOT NULL,
+    updated_at TIMESTAMP,
+    UNIQUE (heat_exchanger_id, hour_start)
+)""",
+    """CREATE TABLE IF NOT EXISTS pipeline_state (
+    id INTEGER PRIMARY KEY,
+    heat_exchanger_id INTEGER NOT NULL UNIQUE,
+    day INTEGER,
+    hour INTEGER,
+    state TEXT NOT NULL,
+    updated_at TIMESTAMP
+)""",
+    f"CREATE TABLE IF NOT EXISTS performance_rollup_hourly ({_ROLLUP_COLUMNS}\n)",
+    f"CREATE TABLE IF NOT EXISTS performance_rollup_daily ({_ROLLUP_COLUMNS}\n)",
+    # 与data/init_db.py中TIME_SERIES_INDEXES对应的范围查询索引
+    "CREATE INDEX IF NOT EXISTS idx_operation_time_points ON operation_parameters (timestamp, points, side)",
+    "CREATE INDEX IF NOT EXISTS idx_physical_time_points ON physical_parameters (timestamp, points, side)",
+    "CREATE INDEX IF NOT EXISTS idx_physical_side_time ON physical_parameters (side, timestamp, points, heat_exchanger_id, reynolds)",
+    "CREATE INDEX IF NOT EXISTS idx_performance_time_points ON performance_parameters (timestamp, points, side)",
+    "CREATE INDEX IF NOT EXISTS idx_k_management_time_points ON k_management (timestamp, points, side)",
+    "CREATE INDEX IF NOT EXISTS idx_model_side_points_time ON model_parameters (side, points, timestamp)",
+    "CREATE INDEX IF NOT EXISTS idx_stale_ranges ON k_predicted_stale_ranges (materialized, start_time, end_time)"
+]
+
+# 嵌入式数据库中的全部表，导出脚本按此顺序从MySQL复制
+EMBEDDED_TABLES = (
+    "heat_exchanger", "operation_parameters", "physical_parameters", "performance_parameters",
+    "model_parameters", "k_management", "k_predicted_stale_ranges", "hour_fingerprints",
+    "pipeline_state", "performance_rollup_hourly", "performance_rollup_daily"
+)
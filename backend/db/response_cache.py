@@ -0,0 +1,101 @@
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+
+
+class ResponseCache:
+    """查询接口的进程内响应缓存
+
+    以接口和参数为键缓存完整响应，按LRU淘汰。每个条目记录它覆盖的表、换热器和时间范围，
+    数据写入时（见db.write_events）只淘汰与写入范围重叠的条目。其他进程（自动处理脚本、
+    多换热器调度器）的写入不会通知到本进程，因此条目另有ttl秒的有效期作为兜底。
+    """
+    def __init__(self, max_entries=512, ttl=30):
+        """
+        参数:
+            max_entries: 最多缓存的条目数
+            ttl: 条目有效期（秒），为0时不过期
+        """
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        # 每次失效递增，用于丢弃在查询期间已被写入覆盖的结果
+        self.generation = 0
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def compute_etag(body, default=None):
+        """根据响应内容计算ETag"""
+        payload = json.dumps(body, sort_keys=True, default=default or str, ensure_ascii=False)
+        return '"' + hashlib.sha1(payload.encode('utf-8')).hexdigest() + '"'
+
+    def get(self, key):
+        """查找缓存条目，未命中或已过期时返回None"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and self.ttl and time.time() - entry['created_at'] > self.ttl:
+                del self._entries[key]
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def put(self, key, body, table, heat_exchanger_id, start_time, end_time, generation, default=None):
+        """写入缓存条目
+
+        参数:
+            key: 缓存键
+            body: 响应内容
+            table: 响应数据来自的表
+            heat_exchanger_id: 响应数据的换热器ID
+            start_time, end_time: 响应数据覆盖的时间范围，为None表示不限时间
+            generation: 开始查询前读取的self.generation，期间发生过失效时不缓存
+            default: 计算ETag时序列化特殊类型的函数
+
+        返回值: 缓存条目（含body和etag）
+        """
+        entry = {
+            'body': body,
+            'etag': self.compute_etag(body, default),
+            'table': table,
+            'heat_exchanger_id': heat_exchanger_id,
+            'start_time': start_time,
+            'end_time': end_time,
+            'created_at': time.time()
+        }
+        with self._lock:
+            if generation != self.generation:
+                return entry
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return entry
+
+    def invalidate(self, table, heat_exchanger_ids=None, start_time=None, end_time=None):
+        """淘汰与写入范围重叠的条目，可直接注册为db.write_events的监听函数"""
+        with self._lock:
+            self.generation += 1
+            for key in list(self._entries):
+                entry = self._entries[key]
+                if entry['table'] != table:
+                    continue
+                if heat_exchanger_ids is not None and entry['heat_exchanger_id'] not in heat_exchanger_ids:
+                    continue
+                if (start_time is not None and end_time is not None
+                        and entry['start_time'] is not None and entry['end_time'] is not None
+                        and (entry['end_time'] < start_time or entry['start_time'] > end_time)):
+                    continue
+                del self._entries[key]
+
+    def stats(self):
+        """返回缓存统计信息"""
+        with self._lock:
+            return {'entries': len(self._entries), 'hits': self.hits, 'misses': self.misses}
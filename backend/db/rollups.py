@@ -0,0 +1,159 @@
+from datetime import datetime, timedelta
+
+from db.write_events import to_datetime
+
+# 汇总粒度及对应的汇总表
+ROLLUP_TABLES = {
+    "hour": "performance_rollup_hourly",
+    "day": "performance_rollup_daily"
+}
+
+# 汇总表中保存min/mean/max/count的指标（均来自performance_parameters）
+ROLLUP_METRICS = ("K", "heat_duty", "lmtd")
+
+# 小时桶起点表达式，{alias}为源表别名；日汇总由小时汇总行合并
+_HOUR_BUCKET = "TIMESTAMP(DATE({alias}.timestamp), MAKETIME(HOUR({alias}.timestamp), 0, 0))"
+
+# 误差定义与DataLoader.calculate_average_error一致
+_ERROR_VALID = "k.K_actual > 0 AND k.K_predicted > 0"
+
+
+def _performance_columns():
+    """performance_parameters汇总的列名及聚合表达式"""
+    columns = [("sample_count", "COUNT(*)")]
+    for metric in ROLLUP_METRICS:
+        columns.extend([
+            (f"{metric}_min", f"MIN(p.`{metric}`)"),
+            (f"{metric}_mean", f"AVG(p.`{metric}`)"),
+            (f"{metric}_max", f"MAX(p.`{metric}`)"),
+            (f"{metric}_count", f"COUNT(p.`{metric}`)")
+        ])
+    return columns
+
+
+def _error_columns():
+    """k_management汇总的列名及聚合表达式，均值只统计参与误差计算的记录"""
+    return [
+        ("K_actual_mean", f"AVG(CASE WHEN {_ERROR_VALID} THEN k.K_actual END)"),
+        ("K_predicted_mean", f"AVG(CASE WHEN {_ERROR_VALID} THEN k.K_predicted END)"),
+        ("error_mean", f"AVG(CASE WHEN {_ERROR_VALID} THEN ABS(k.K_predicted - k.K_actual) / k.K_actual * 100 END)"),
+        ("error_count", f"COUNT(CASE WHEN {_ERROR_VALID} THEN 1 END)")
+    ]
+
+
+# 各源表汇总到的列：(源表别名, [(列名, 聚合表达式), ...])
+ROLLUP_SOURCES = {
+    "performance_parameters": ("p", _performance_columns()),
+    "k_management": ("k", _error_columns())
+}
+
+
+def _empty_value(column):
+    """汇总行由另一张源表先创建时，本源表的列取初始值：计数为0，其余为NULL"""
+    return "0" if column.endswith("_count") else "NULL"
+
+
+def bucket_bounds(bucket, start_time, end_time):
+    """把时间范围扩展到完整的桶，返回半开区间[start, end)"""
+    start_time, end_time = to_datetime(start_time), to_datetime(end_time)
+    if bucket == "hour":
+        start = start_time.replace(minute=0, second=0, microsecond=0)
+        end = end_time.replace(minute=0, second=0, microsecond=0) + timedelta(hours=1)
+    else:
+        start = datetime(start_time.year, start_time.month, start_time.day)
+        end = datetime(end_time.year, end_time.month, end_time.day) + timedelta(days=1)
+    return start, end
+
+
+def _exchanger_condition(column, heat_exchanger_ids):
+    if not heat_exchanger_ids:
+        return "", []
+    heat_exchanger_ids = sorted(heat_exchanger_ids)
+    return f" AND {column} IN ({', '.join(['%s'] * len(heat_exchanger_ids))})", heat_exchanger_ids
+
+
+def _merge_expression(column):
+    """由小时汇总行合并为日汇总行的表达式：计数求和、最值取最值、均值按对应计数加权"""
+    if column.endswith("_count"):
+        return f"SUM(h.{column})"
+    if column.endswith("_min"):
+        return f"MIN(h.{column})"
+    if column.endswith("_max"):
+        return f"MAX(h.{column})"
+    metric = column[:-len("_mean")]
+    weight = f"{metric}_count" if metric in ROLLUP_METRICS else "error_count"
+    return f"SUM(h.{column} * h.{weight}) / NULLIF(SUM(h.{weight}), 0)"
+
+
+def _upsert_sql(table, own_columns, key_selects, value_selects, source_sql, group_by):
+    """生成按(换热器, 桶, points, side)聚合后upsert到汇总表的SQL，只更新own_columns"""
+    all_columns = [column for _, source_columns in ROLLUP_SOURCES.values() for column, _ in source_columns]
+    # 汇总行的全部列按固定顺序插入，本源表之外的列取初始值
+    selects = [value_selects[column] if column in own_columns else _empty_value(column) for column in all_columns]
+    update_clause = ', '.join(f"{column} = VALUES({column})" for column in own_columns)
+    return f"""
+    INSERT INTO {table} (heat_exchanger_id, bucket_start, points, side, {', '.join(all_columns)})
+    SELECT {', '.join(key_selects)}, {', '.join(selects)}
+    {source_sql}
+    GROUP BY {group_by}
+    ON DUPLICATE KEY UPDATE {update_clause}
+    """
+
+
+def rollup_statements(source, start_time, end_time, heat_exchanger_ids=None):
+    """生成重算某个时间范围内汇总行中某张源表的列的SQL
+
+    只更新该源表对应的列：performance_parameters写入性能指标，k_management写入
+    K_actual/K_predicted均值和误差，两张源表在各自的写入事务中分别更新同一汇总行，互不覆盖。
+    小时汇总行从源表中受影响的小时聚合；日汇总行再由当天的小时汇总行（每组最多24行）合并，
+    不重新扫描整天的原始数据。
+
+    参数:
+        source: 源表名，取值见ROLLUP_SOURCES
+        start_time, end_time: 发生写入的时间范围（闭区间）
+        heat_exchanger_ids: 只重算这些换热器，为None时不过滤
+
+    返回值: [(SQL, 参数列表), ...]，须按顺序执行
+    """
+    alias, columns = ROLLUP_SOURCES[source]
+    own_columns = [column for column, _ in columns]
+
+    hour_start, hour_end = bucket_bounds("hour", start_time, end_time)
+    exchanger_sql, exchanger_params = _exchanger_condition(f"{alias}.heat_exchanger_id", heat_exchanger_ids)
+    hour_sql = _upsert_sql(
+        ROLLUP_TABLES["hour"], own_columns,
+        [f"{alias}.heat_exchanger_id", f"{_HOUR_BUCKET.format(alias=alias)} AS hour_start",
+         f"{alias}.points", f"{alias}.side"],
+        dict(columns),
+        f"FROM {source} {alias}\n    WHERE {alias}.timestamp >= %s AND {alias}.timestamp < %s{exchanger_sql}",
+        f"{alias}.heat_exchanger_id, hour_start, {alias}.points, {alias}.side"
+    )
+
+    day_start, day_end = bucket_bounds("day", start_time, end_time)
+    exchanger_sql, exchanger_params = _exchanger_condition("h.heat_exchanger_id", heat_exchanger_ids)
+    day_sql = _upsert_sql(
+        ROLLUP_TABLES["day"], own_columns,
+        ["h.heat_exchanger_id", "TIMESTAMP(DATE(h.bucket_start)) AS day_start", "h.points", "h.side"],
+        {column: _merge_expression(column) for column in own_columns},
+        f"FROM {ROLLUP_TABLES['hour']} h\n    WHERE h.bucket_start >= %s AND h.bucket_start < %s{exchanger_sql}",
+        "h.heat_exchanger_id, day_start, h.points, h.side"
+    )
+    return [
+        (hour_sql, [hour_start, hour_end] + exchanger_params),
+        (day_sql, [day_start, day_end] + exchanger_params)
+    ]
+
+
+def refresh_rollups(cursor, source, start_time, end_time, heat_exchanger_ids=None):
+    """在当前事务中重算时间范围内小时和日汇总行中某张源表的列，由调用方提交"""
+    for query, params in rollup_statements(source, start_time, end_time, heat_exchanger_ids):
+        cursor.execute(query, params)
+
+
+def rebuild_rollup_range(cursor, start_time, end_time):
+    """在当前事务中删除并从两张源表重建时间范围内的全部汇总行，由调用方提交"""
+    for bucket, table in ROLLUP_TABLES.items():
+        start, end = bucket_bounds(bucket, start_time, end_time)
+        cursor.execute(f"DELETE FROM {table} WHERE bucket_start >= %s AND bucket_start < %s", [start, end])
+    for source in ROLLUP_SOURCES:
+        refresh_rollups(cursor, source, start_time, end_time)
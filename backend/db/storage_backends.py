@@ -0,0 +1,258 @@
+import os
+import re
+import sqlite3
+import threading
+from datetime import datetime
+from functools import lru_cache
+
+import mysql.connector
+from mysql.connector import Error
+
+from db.embedded_schema import EMBEDDED_SCHEMA
+
+# 可选的存储后端，由配置项storage_backend指定
+STORAGE_BACKENDS = ("mysql", "sqlite")
+
+
+def mysql_db_config(config, kind):
+    """获取MySQL连接配置
+
+    参数:
+        config: 配置字典
+        kind: 'test' 或 'prod'
+    """
+    # 支持两种配置键名：test/test_db 和 production/prod_db
+    if kind == 'test':
+        keys = ('test', 'test_db')
+    else:
+        keys = ('production', 'prod_db')
+    if keys[0] in config['database']:
+        return config['database'][keys[0]]
+    return config['database'][keys[1]]
+
+
+class MySQLBackend:
+    """MySQL存储后端，连接配置项database中的测试库和生产库"""
+    name = "mysql"
+    errors = (Error,)
+
+    def __init__(self, config):
+        self.config = config
+
+    def describe(self, kind):
+        """返回用于日志的数据库名称"""
+        return mysql_db_config(self.config, kind)['database']
+
+    def location(self, kind):
+        """返回区分不同数据库的完整位置（主机、端口和库名）"""
+        db_config = mysql_db_config(self.config, kind)
+        return f"mysql://{db_config['host']}:{db_config['port']}/{db_config['database']}"
+
+    def connect(self, kind):
+        db_config = mysql_db_config(self.config, kind)
+        return mysql.connector.connect(
+            host=db_config['host'],
+            port=db_config['port'],
+            user=db_config['user'],
+            password=db_config['password'],
+            database=db_config['database'],
+            charset='utf8mb4'
+        )
+
+    def close_stream(self, db):
+        """关闭流式查询连接，客户端提前断开时结果集未读完，直接关闭套接字"""
+        try:
+            db.close()
+        except Error:
+            db.shutdown()
+
+
+# ---- 嵌入式（SQLite）后端 ----
+
+_UPSERT = re.compile(r"ON\s+DUPLICATE\s+KEY\s+UPDATE", re.IGNORECASE)
+_VALUES_REFERENCE = re.compile(r"VALUES\((\w+)\)")
+
+
+@lru_cache(maxsize=256)
+def translate_query(query):
+    """把DataLoader使用的MySQL语句改写为SQLite语句
+
+    占位符%s改为?，ON DUPLICATE KEY UPDATE col = VALUES(col)改为
+    ON CONFLICT DO UPDATE SET col = excluded.col；NOW、HOUR、MAKETIME、TIMESTAMP
+    作为自定义函数注册到连接上，语句中无需改写。
+    """
+    query = query.replace("%s", "?")
+    match = _UPSERT.search(query)
+    if match:
+        query = (query[:match.start()] + "ON CONFLICT DO UPDATE SET"
+                 + _VALUES_REFERENCE.sub(r"excluded.\1", query[match.end():]))
+    return query
+
+
+def _to_value(value):
+    """把SQLite返回的'YYYY-MM-DD HH:MM:SS'文本还原为datetime，与MySQL游标的返回类型一致"""
+    if isinstance(value, str) and len(value) == 19 and value[4] == '-' and value[10] == ' ':
+        try:
+            return datetime.fromisoformat(value)
+        except ValueError:
+            return value
+    return value
+
+
+def _dict_row(cursor, row):
+    return {column[0]: _to_value(value) for column, value in zip(cursor.description, row)}
+
+
+def _maketime(hour, minute, second):
+    return f"{int(hour):02d}:{int(minute):02d}:{int(second):02d}"
+
+
+def _timestamp(day, time=None):
+    if day is None:
+        return None
+    return f"{str(day)[:10]} {time or '00:00:00'}"
+
+
+def _hour(value):
+    return None if value is None else int(str(value)[11:13])
+
+
+# datetime参数按MySQL DATETIME的文本格式保存，字符串比较即时间比较
+sqlite3.register_adapter(datetime, lambda value: value.strftime("%Y-%m-%d %H:%M:%S"))
+
+
+class EmbeddedCursor:
+    """SQLite游标包装，提供DataLoader使用的mysql-connector字典游标接口
+
+    每次调用都在所属连接的锁内执行，多个线程可以共用同一个连接。
+    """
+    def __init__(self, connection):
+        self._connection = connection
+        self._cursor = connection._db.cursor()
+
+    def execute(self, query, params=None):
+        with self._connection.lock:
+            return self._cursor.execute(translate_query(query), params or ())
+
+    def executemany(self, query, seq_of_params):
+        with self._connection.lock:
+            return self._cursor.executemany(translate_query(query), seq_of_params)
+
+    def fetchall(self):
+        with self._connection.lock:
+            return self._cursor.fetchall()
+
+    def fetchone(self):
+        with self._connection.lock:
+            return self._cursor.fetchone()
+
+    def fetchmany(self, size):
+        with self._connection.lock:
+            return self._cursor.fetchmany(size)
+
+    @property
+    def rowcount(self):
+        return self._cursor.rowcount
+
+    @property
+    def lastrowid(self):
+        return self._cursor.lastrowid
+
+    def close(self):
+        with self._connection.lock:
+            # 连接已关闭时游标随之失效，重复关闭直接返回
+            if self._cursor is None or self._connection._db is None:
+                self._cursor = None
+                return
+            self._cursor.close()
+            self._cursor = None
+
+
+class EmbeddedConnection:
+    """SQLite连接包装，提供DatabaseConnection使用的mysql-connector连接接口
+
+    sqlite3连接不能被多个线程同时调用，连接及其游标的所有操作都通过lock串行执行，
+    因此允许在创建连接之外的线程中使用（check_same_thread=False）。
+    """
+    def __init__(self, path):
+        self.lock = threading.RLock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.row_factory = _dict_row
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.create_function("NOW", 0, lambda: datetime.now().strftime("%Y-%m-%d %H:%M:%S"))
+        self._db.create_function("HOUR", 1, _hour, deterministic=True)
+        self._db.create_function("MAKETIME", 3, _maketime, deterministic=True)
+        self._db.create_function("TIMESTAMP", 1, _timestamp, deterministic=True)
+        self._db.create_function("TIMESTAMP", 2, _timestamp, deterministic=True)
+        for statement in EMBEDDED_SCHEMA:
+            self._db.execute(statement)
+        self._db.commit()
+
+    def cursor(self, dictionary=True, buffered=True):
+        with self.lock:
+            return EmbeddedCursor(self)
+
+    def commit(self):
+        with self.lock:
+            self._db.commit()
+
+    def rollback(self):
+        with self.lock:
+            self._db.rollback()
+
+    def is_connected(self):
+        return self._db is not None
+
+    def close(self):
+        """关闭连接，可重复调用"""
+        with self.lock:
+            if self._db is None:
+                return
+            self._db.close()
+            self._db = None
+
+
+class SQLiteBackend:
+    """嵌入式存储后端，测试库和生产库各为一个SQLite文件
+
+    用于离线重放和基准测试：不需要MySQL服务器，查询和批量写入在进程内完成，没有网络往返。
+    文件不存在时自动创建并建表，可用script/export_embedded_db.py从MySQL复制数据。
+    """
+    name = "sqlite"
+    errors = (sqlite3.Error,)
+
+    def __init__(self, config):
+        self.config = config
+
+    def path(self, kind):
+        """返回测试库或生产库的文件路径，相对路径相对于backend目录"""
+        paths = self.config.get('embedded_db') or {}
+        path = paths.get(kind) or f"embedded/{kind}.sqlite3"
+        if not os.path.isabs(path):
+            path = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), path)
+        return path
+
+    def describe(self, kind):
+        return self.path(kind)
+
+    def location(self, kind):
+        return f"sqlite://{os.path.abspath(self.path(kind))}"
+
+    def connect(self, kind):
+        path = self.path(kind)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        return EmbeddedConnection(path)
+
+    def close_stream(self, db):
+        db.close()
+
+
+def create_storage_backend(config):
+    """按配置项storage_backend创建存储后端，未配置时使用MySQL"""
+    name = config.get('storage_backend') or "mysql"
+    if name == "sqlite":
+        return SQLiteBackend(config)
+    if name == "mysql":
+        return MySQLBackend(config)
+    raise ValueError(f"storage_backend必须是{'、'.join(STORAGE_BACKENDS)}之一")
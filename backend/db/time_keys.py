@@ -0,0 +1,63 @@
+from datetime import datetime, timedelta
+
+# 默认基准日期，第1天即基准日期当天；可用配置项base_date修改
+DEFAULT_BASE_DATE = "2022-01-01"
+
+_base_date = datetime.strptime(DEFAULT_BASE_DATE, "%Y-%m-%d")
+
+
+def configure(config):
+    """按配置设置基准日期
+
+    参数:
+        config: 配置字典，使用base_date（YYYY-MM-DD），未配置时使用DEFAULT_BASE_DATE
+    """
+    global _base_date
+    _base_date = datetime.strptime(config.get('base_date') or DEFAULT_BASE_DATE, "%Y-%m-%d")
+
+
+def get_base_date():
+    """返回当前基准日期（第1天0点）"""
+    return _base_date
+
+
+def hour_start(day, hour=0):
+    """第day天hour点整的时间，day从1开始，可超过31天和跨月跨年"""
+    return _base_date + timedelta(days=day - 1, hours=hour)
+
+
+def hour_bounds(day, hour):
+    """第day天hour点这一小时的半开区间[start, end)"""
+    start = hour_start(day, hour)
+    return start, start + timedelta(hours=1)
+
+
+def hours_bounds(day, first_hour, last_hour):
+    """第day天first_hour点到last_hour点（含）的半开区间[start, end)"""
+    return hour_start(day, first_hour), hour_start(day, last_hour + 1)
+
+
+def day_bounds(start_day, end_day=None):
+    """第start_day天到第end_day天（含）的半开区间[start, end)，end_day为None时只取start_day一天"""
+    if end_day is None:
+        end_day = start_day
+    return hour_start(start_day), hour_start(end_day + 1)
+
+
+def span_bounds(start_day, start_hour, end_day, end_hour):
+    """从第start_day天start_hour点到第end_day天end_hour点（含该小时）的半开区间[start, end)"""
+    return hour_start(start_day, start_hour), hour_start(end_day, end_hour + 1)
+
+
+def closed_bounds(bounds):
+    """把半开区间[start, end)换成以秒为精度的闭区间[start, end - 1秒]
+
+    用于按闭区间保存和比较的场景（失效区间、写入范围等）。
+    """
+    start, end = bounds
+    return start, end - timedelta(seconds=1)
+
+
+def timestamp_to_day(timestamp):
+    """将时间戳换算为天数（第1天为基准日期当天）"""
+    return (timestamp.date() - _base_date.date()).days + 1
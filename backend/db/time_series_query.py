@@ -0,0 +1,52 @@
+from db import time_keys
+
+# 可按天/小时查询的时序表
+TIME_SERIES_TABLES = ("operation_parameters", "physical_parameters", "k_management", "performance_parameters")
+
+# 存储型生成列HOUR(timestamp)及其复合索引的名称，见data/init_db.py
+HOUR_OF_DAY_COLUMN = "hour_of_day"
+HOUR_OF_DAY_INDEX = "idx_he_hour_of_day"
+
+
+def build_time_series_query(table, heat_exchanger_id, day=None, hour=None):
+    """构建时序表按换热器、天、小时过滤的查询
+
+    只给出hour时按生成列hour_of_day过滤，配合复合索引
+    (heat_exchanger_id, hour_of_day, timestamp, points, side)，跨天的同一小时查询
+    是一次索引范围扫描，不再对HOUR(timestamp)逐行求值做全表扫描；给出day时按timestamp的半开区间
+    [start, end)过滤，天数按配置的基准日期换算，可以超过31天。
+
+    参数:
+        table: 表名，取值见TIME_SERIES_TABLES
+        heat_exchanger_id: 换热器ID
+        day: 天数（从1开始），为None时不限天
+        hour: 小时（0-23），为None时不限小时
+
+    返回值: (不含ORDER BY的查询语句, 查询参数, 开始时间, 结束时间（不含）)，未限定天时时间为None
+    """
+    if table not in TIME_SERIES_TABLES:
+        raise ValueError(f"不支持的表: {table}")
+    if day is not None and day < 1:
+        raise ValueError("day参数必须大于等于1")
+    if hour is not None and (hour < 0 or hour > 23):
+        raise ValueError("hour参数必须在0-23之间")
+
+    query = f"SELECT * FROM {table} WHERE heat_exchanger_id = %s"
+    params = [heat_exchanger_id]
+
+    start_time = end_time = None
+    if day:
+        if hour is not None:
+            # 查询特定天和小时的数据
+            start_time, end_time = time_keys.hour_bounds(day, hour)
+        else:
+            # 查询特定天的数据
+            start_time, end_time = time_keys.day_bounds(day)
+        query += " AND timestamp >= %s AND timestamp < %s"
+        params.extend([start_time, end_time])
+    elif hour is not None:
+        # 只查询特定小时的数据（所有天）
+        query += f" AND {HOUR_OF_DAY_COLUMN} = %s"
+        params.append(hour)
+
+    return query, params, start_time, end_time
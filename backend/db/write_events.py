@@ -0,0 +1,63 @@
+from datetime import datetime
+
+# 已提交写入的监听函数列表，参数为(table, heat_exchanger_ids, start_time, end_time)
+_write_listeners = []
+
+
+def add_write_listener(listener):
+    """注册写入监听函数
+
+    参数:
+        listener: 函数(table, heat_exchanger_ids, start_time, end_time)，
+                  heat_exchanger_ids为None或start_time/end_time为None时表示范围未知
+    """
+    if listener not in _write_listeners:
+        _write_listeners.append(listener)
+
+
+def remove_write_listener(listener):
+    """注销写入监听函数"""
+    if listener in _write_listeners:
+        _write_listeners.remove(listener)
+
+
+def to_datetime(value):
+    """将时间戳统一转换为datetime，无法解析时返回None"""
+    if isinstance(value, datetime):
+        return value
+    try:
+        return datetime.strptime(str(value)[:19], "%Y-%m-%d %H:%M:%S")
+    except ValueError:
+        return None
+
+
+def notify_write(table, records=None, start_time=None, end_time=None, heat_exchanger_id=None):
+    """通知监听函数某张表的数据已写入并提交
+
+    参数:
+        table: 表名
+        records: 写入的记录列表，提供时从中取换热器ID和时间范围
+        start_time, end_time: 未提供records时直接指定时间范围
+        heat_exchanger_id: 未提供records时直接指定换热器ID
+    """
+    if not _write_listeners:
+        return
+
+    if records:
+        heat_exchanger_ids = {record.get('heat_exchanger_id') for record in records}
+        if None in heat_exchanger_ids:
+            heat_exchanger_ids = None
+        timestamps = [to_datetime(record.get('timestamp')) for record in records]
+        if None in timestamps:
+            start_time = end_time = None
+        else:
+            start_time, end_time = min(timestamps), max(timestamps)
+    else:
+        heat_exchanger_ids = {heat_exchanger_id} if heat_exchanger_id is not None else None
+        start_time, end_time = to_datetime(start_time), to_datetime(end_time)
+
+    for listener in list(_write_listeners):
+        try:
+            listener(table, heat_exchanger_ids, start_time, end_time)
+        except Exception as e:
+            print(f"写入监听函数执行失败: {e}")
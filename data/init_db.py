@@ -1,7 +1,134 @@
+from datetime import date
 from tortoise import Tortoise, run_async
 from models import HeatExchanger
 import aiomysql
 
+# 时序表的覆盖索引，对应DataLoader中的查询形状：
+# 单换热器部署时只按timestamp范围读取（唯一索引以heat_exchanger_id开头，无法用于该范围），
+# 物化K_predicted时按side、timestamp读取tube侧雷诺数，误差统计按timestamp读取K_actual和K_predicted，
+# 加载模型参数时按side读取各points最新的a、p、b
+TIME_SERIES_INDEXES = {
+    "operation_parameters": [
+        ("idx_time_points", "timestamp, points, side")
+    ],
+    "physical_parameters": [
+        ("idx_time_points", "timestamp, points, side"),
+        ("idx_side_time_reynolds", "side, timestamp, points, heat_exchanger_id, reynolds")
+    ],
+    "performance_parameters": [
+        ("idx_time_points", "timestamp, points, side")
+    ],
+    "k_management": [
+        ("idx_time_points", "timestamp, points, side"),
+        ("idx_time_k", "timestamp, K_actual, K_predicted")
+    ],
+    "model_parameters": [
+        ("idx_side_points_time", "side, points, timestamp, a, p, b"),
+        ("idx_time", "timestamp")
+    ]
+}
+
+# 按月分区时在最新数据之后预留的空分区数，超出部分落入pmax分区，再次运行init_db时拆分
+PARTITION_MONTHS_AHEAD = 3
+
+
+def add_months(month, count):
+    """返回month（某月1日）之后第count个月的1日"""
+    year, index = divmod(month.month - 1 + count, 12)
+    return date(month.year + year, index + 1, 1)
+
+
+def partition_definitions(first_month, end_month):
+    """生成[first_month, end_month)各月的分区定义，最后附加pmax分区"""
+    definitions = []
+    month = first_month
+    while month < end_month:
+        upper = add_months(month, 1)
+        definitions.append(f"PARTITION p{month:%Y%m} VALUES LESS THAN ('{upper:%Y-%m-%d}')")
+        month = upper
+    definitions.append("PARTITION pmax VALUES LESS THAN (MAXVALUE)")
+    return ", ".join(definitions)
+
+
+async def ensure_indexes(cursor, table, indexes):
+    """添加不存在的索引"""
+    await cursor.execute(f"SHOW INDEX FROM {table}")
+    existing = {row[2] for row in await cursor.fetchall()}
+    for name, columns in indexes:
+        if name not in existing:
+            await cursor.execute(f"ALTER TABLE {table} ADD INDEX {name} ({columns})")
+            print(f"已添加索引: {table}.{name}")
+
+
+async def get_partitions(cursor, table):
+    """返回表的[(分区名, 上界日期或None表示MAXVALUE)]，未分区时返回空列表"""
+    await cursor.execute(
+        "SELECT PARTITION_NAME, PARTITION_DESCRIPTION FROM information_schema.PARTITIONS "
+        "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND PARTITION_NAME IS NOT NULL "
+        "ORDER BY PARTITION_ORDINAL_POSITION",
+        (table,)
+    )
+    partitions = []
+    for name, description in await cursor.fetchall():
+        bound = description.strip("'")
+        partitions.append((name, None if bound == "MAXVALUE" else date.fromisoformat(bound[:10])))
+    return partitions
+
+
+async def partition_by_month(cursor, table):
+    """按timestamp对时序表做按月RANGE COLUMNS分区，已分区时补齐最新数据之后的空分区
+
+    InnoDB分区表不支持外键，且主键须包含分区列，因此首次分区时删除外键（换热器关联仍由ORM维护），
+    并把主键改为(id, timestamp)。首次分区会重建整张表，数据量大时耗时较长。
+    """
+    await cursor.execute(f"SELECT MIN(timestamp), MAX(timestamp) FROM {table}")
+    min_time, max_time = await cursor.fetchone()
+    today = date.today()
+    first_month = (min_time.date() if min_time else today).replace(day=1)
+    end_month = add_months((max_time.date() if max_time else today).replace(day=1), PARTITION_MONTHS_AHEAD + 1)
+
+    partitions = await get_partitions(cursor, table)
+    if not partitions:
+        await cursor.execute(
+            "SELECT CONSTRAINT_NAME FROM information_schema.REFERENTIAL_CONSTRAINTS "
+            "WHERE CONSTRAINT_SCHEMA = DATABASE() AND TABLE_NAME = %s",
+            (table,)
+        )
+        for (constraint_name,) in await cursor.fetchall():
+            await cursor.execute(f"ALTER TABLE {table} DROP FOREIGN KEY `{constraint_name}`")
+            print(f"已删除外键: {table}.{constraint_name}")
+
+        await cursor.execute(f"SHOW KEYS FROM {table} WHERE Key_name = 'PRIMARY'")
+        if {row[4] for row in await cursor.fetchall()} != {"id", "timestamp"}:
+            await cursor.execute(f"ALTER TABLE {table} DROP PRIMARY KEY, ADD PRIMARY KEY (id, timestamp)")
+
+        await cursor.execute(
+            f"ALTER TABLE {table} PARTITION BY RANGE COLUMNS(timestamp) "
+            f"({partition_definitions(first_month, end_month)})"
+        )
+        print(f"已按月分区: {table}")
+        return
+
+    last_bound = max((bound for _, bound in partitions if bound is not None), default=first_month)
+    if last_bound < end_month:
+        await cursor.execute(
+            f"ALTER TABLE {table} REORGANIZE PARTITION pmax INTO "
+            f"({partition_definitions(last_bound, end_month)})"
+        )
+        print(f"已添加分区: {table} {last_bound:%Y-%m}至{add_months(end_month, -1):%Y-%m}")
+
+
+async def drop_partitions_before(cursor, table, before):
+    """删除全部数据都早于before（某月1日）的分区，用于数据保留期清理
+
+    DROP PARTITION只删除分区文件，不逐行删除，耗时与数据量无关。
+    """
+    for name, bound in await get_partitions(cursor, table):
+        if bound is not None and bound <= before:
+            await cursor.execute(f"ALTER TABLE {table} DROP PARTITION {name}")
+            print(f"已删除分区: {table}.{name}")
+
+
 async def init_db():
     # 数据库连接配置
     await Tortoise.init(
@@ -52,7 +179,47 @@ async def init_db():
         print(f"添加新字段时出错: {e}")
         # 如果出错，继续执行，让Tortoise处理
         pass
-    
+
+    # 为时序表添加小时生成列和复合索引，跨天的同一小时查询走索引而不是对HOUR(timestamp)全表扫描
+    # 生成列设为INVISIBLE（MySQL 8.0.23+），SELECT * 的结果不变
+    try:
+        conn = Tortoise.get_connection("default")
+        async with conn._pool.acquire() as connection:
+            async with connection.cursor() as cursor:
+                for table in ("operation_parameters", "physical_parameters", "k_management", "performance_parameters"):
+                    await cursor.execute(f"DESCRIBE {table}")
+                    existing_columns = {row[0] for row in await cursor.fetchall()}
+                    if "hour_of_day" not in existing_columns:
+                        await cursor.execute(
+                            f"ALTER TABLE {table} ADD COLUMN hour_of_day TINYINT "
+                            f"AS (HOUR(timestamp)) STORED INVISIBLE COMMENT '时间戳的小时，用于按小时查询'"
+                        )
+                        print(f"已添加字段: {table}.hour_of_day")
+
+                    await cursor.execute(f"SHOW INDEX FROM {table} WHERE Key_name = 'idx_he_hour_of_day'")
+                    if not await cursor.fetchall():
+                        await cursor.execute(
+                            f"ALTER TABLE {table} ADD INDEX idx_he_hour_of_day "
+                            f"(heat_exchanger_id, hour_of_day, timestamp, points, side)"
+                        )
+                        print(f"已添加索引: {table}.idx_he_hour_of_day")
+    except Exception as e:
+        print(f"添加小时生成列时出错: {e}")
+
+    # 时序表添加覆盖索引并按月分区，长期运行后范围查询只扫描相关分区，按保留期清理时整分区删除
+    try:
+        conn = Tortoise.get_connection("default")
+        async with conn._pool.acquire() as connection:
+            async with connection.cursor() as cursor:
+                for table, indexes in TIME_SERIES_INDEXES.items():
+                    try:
+                        await ensure_indexes(cursor, table, indexes)
+                        await partition_by_month(cursor, table)
+                    except Exception as e:
+                        print(f"迁移表 {table} 时出错: {e}")
+    except Exception as e:
+        print(f"迁移时序表时出错: {e}")
+
     # 检查换热器表是否已有数据
     existing_he = await HeatExchanger.first()
     if not existing_he:
@@ -122,3 +122,99 @@ class KManagement(Model):
         table = "k_management"
         unique_together = ("heat_exchanger", "timestamp", "points", "side")
 
+
+# K_predicted待刷新区间表
+class KPredictedStaleRange(Model):
+    """K_predicted待刷新区间表，模型更新时记录需要按新参数重新计算K_predicted的(points, 时间范围)"""
+    id = fields.IntField(pk=True, description="主键")
+    heat_exchanger = fields.ForeignKeyField("models.HeatExchanger", related_name="k_predicted_stale_ranges", description="外键，连接换热器表")
+    points = fields.IntField(null=True, description="测量点（整型），为空表示全部points")
+    side = fields.CharEnumField(SideEnum, description="侧标识，固定为tube")
+    start_time = fields.DatetimeField(description="区间开始时间")
+    end_time = fields.DatetimeField(description="区间结束时间（包含）")
+    model_version = fields.IntField(description="模型版本号")
+    model_params = fields.TextField(description="区间对应的模型参数快照（JSON）")
+    materialized = fields.BooleanField(default=False, description="是否已写回k_management和performance_parameters")
+    created_at = fields.DatetimeField(auto_now_add=True, description="记录时间")
+
+    class Meta:
+        table = "k_predicted_stale_ranges"
+        indexes = (("materialized", "start_time", "end_time"),)
+
+
+# 小时输入指纹表
+class HourFingerprint(Model):
+    """小时输入指纹表，记录每个小时源数据和模型参数的指纹，指纹未变化的小时在重新处理时跳过"""
+    id = fields.IntField(pk=True, description="主键")
+    heat_exchanger = fields.ForeignKeyField("models.HeatExchanger", related_name="hour_fingerprints", description="外键，连接换热器表")
+    hour_start = fields.DatetimeField(description="小时开始时间")
+    fingerprint = fields.CharField(max_length=64, description="源数据与模型参数的SHA-256指纹")
+    model_version = fields.IntField(description="写入时的模型版本号")
+    updated_at = fields.DatetimeField(auto_now=True, description="更新时间")
+
+    class Meta:
+        table = "hour_fingerprints"
+        unique_together = ("heat_exchanger", "hour_start")
+
+
+# 流水线状态表
+class PipelineState(Model):
+    """流水线状态表，每个换热器一行，保存阶段、模型参数和处理进度，用于重启后恢复"""
+    id = fields.IntField(pk=True, description="主键")
+    heat_exchanger = fields.ForeignKeyField("models.HeatExchanger", related_name="pipeline_states", description="外键，连接换热器表")
+    day = fields.IntField(null=True, description="最近处理完成的天数")
+    hour = fields.IntField(null=True, description="最近处理完成的小时")
+    state = fields.TextField(description="状态快照（JSON）：stage、模型参数、模型版本等")
+    updated_at = fields.DatetimeField(auto_now=True, description="更新时间")
+
+    class Meta:
+        table = "pipeline_state"
+        unique_together = ("heat_exchanger",)
+
+
+class PerformanceRollupBase(Model):
+    """性能汇总表公共字段，按(换热器, 桶, points, side)聚合performance_parameters和k_management"""
+    id = fields.IntField(pk=True, description="主键")
+    bucket_start = fields.DatetimeField(description="桶开始时间")
+    points = fields.IntField(description="测量点（整型）")
+    side = fields.CharEnumField(SideEnum, description="侧标识")
+    sample_count = fields.IntField(description="桶内性能参数记录数")
+    K_min = fields.FloatField(null=True, description="K最小值 (W/(m²·K))")
+    K_mean = fields.FloatField(null=True, description="K平均值 (W/(m²·K))")
+    K_max = fields.FloatField(null=True, description="K最大值 (W/(m²·K))")
+    K_count = fields.IntField(description="K非空记录数")
+    heat_duty_min = fields.FloatField(null=True, description="热负荷最小值 (W)")
+    heat_duty_mean = fields.FloatField(null=True, description="热负荷平均值 (W)")
+    heat_duty_max = fields.FloatField(null=True, description="热负荷最大值 (W)")
+    heat_duty_count = fields.IntField(description="热负荷非空记录数")
+    lmtd_min = fields.FloatField(null=True, description="对数平均温差最小值 (°C)")
+    lmtd_mean = fields.FloatField(null=True, description="对数平均温差平均值 (°C)")
+    lmtd_max = fields.FloatField(null=True, description="对数平均温差最大值 (°C)")
+    lmtd_count = fields.IntField(description="对数平均温差非空记录数")
+    K_actual_mean = fields.FloatField(null=True, description="参与误差计算的记录的K_actual平均值 (W/(m²·K))")
+    K_predicted_mean = fields.FloatField(null=True, description="参与误差计算的记录的K_predicted平均值 (W/(m²·K))")
+    error_mean = fields.FloatField(null=True, description="K_predicted相对K_actual的平均相对误差（百分比）")
+    error_count = fields.IntField(description="参与误差计算的记录数")
+
+    class Meta:
+        abstract = True
+
+
+# 小时汇总表
+class PerformanceRollupHourly(PerformanceRollupBase):
+    """性能小时汇总表，随k_management和性能参数的写入在各自的事务中更新"""
+    heat_exchanger = fields.ForeignKeyField("models.HeatExchanger", related_name="performance_rollup_hourly", description="外键，连接换热器表")
+
+    class Meta:
+        table = "performance_rollup_hourly"
+        unique_together = ("heat_exchanger", "bucket_start", "points", "side")
+
+
+# 日汇总表
+class PerformanceRollupDaily(PerformanceRollupBase):
+    """性能日汇总表，随k_management和性能参数的写入在各自的事务中更新"""
+    heat_exchanger = fields.ForeignKeyField("models.HeatExchanger", related_name="performance_rollup_daily", description="外键，连接换热器表")
+
+    class Meta:
+        table = "performance_rollup_daily"
+        unique_together = ("heat_exchanger", "bucket_start", "points", "side")
@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+把已结束月份的原始数据归档到Parquet冷存储
+
+对operation_parameters和physical_parameters，把早于最新数据所在月份前
+cold_storage_keep_months个月的整月数据写入cold_storage_dir下的Parquet文件，
+核对行数后从生产库删除。DataLoader按时间范围读取时自动合并冷存储中的数据。
+可定期执行（如每月一次），已归档的月份不会重复处理。
+
+用法:
+    python script/archive_cold_months.py
+"""
+
+import sys
+import os
+import json
+from datetime import timedelta
+
+# 添加backend目录到Python路径
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'backend')))
+
+from db.db_connection import DatabaseConnection
+from db.cold_storage import COLD_TABLES, month_start, next_month, open_cold_store
+
+
+def archive_cold_months():
+    config_path = os.path.join(os.path.dirname(__file__), '..', 'backend', 'config', 'config.json')
+    with open(config_path, 'r', encoding='utf-8') as f:
+        config = json.load(f)
+    cold_store = open_cold_store(config)
+    if cold_store is None:
+        print("未配置cold_storage_dir或未安装pyarrow，不执行归档")
+        return False
+
+    db_conn = DatabaseConnection(config)
+    if not db_conn.connect_prod_db():
+        print("连接生产数据库失败")
+        return False
+
+    keep_months = config.get('cold_storage_keep_months', 2)
+    try:
+        for table in COLD_TABLES:
+            db_conn.execute_query(
+                db_conn.prod_cursor,
+                f"SELECT MIN(timestamp) AS min_time, MAX(timestamp) AS max_time FROM {table}"
+            )
+            result = db_conn.fetch_one(db_conn.prod_cursor)
+            if not result or result['min_time'] is None:
+                print(f"{table}中没有数据")
+                continue
+
+            # 最新数据所在月份及之前keep_months个月保留在MySQL中
+            cutoff = month_start(result['max_time'])
+            for _ in range(keep_months):
+                cutoff = month_start(cutoff - timedelta(days=1))
+            month = month_start(result['min_time'])
+            while month < cutoff:
+                count = cold_store.archive_month(db_conn, table, month)
+                print(f"已归档 {table} {month:%Y-%m}: {count}行")
+                month = next_month(month)
+        return True
+    except Exception as e:
+        print(f"归档失败: {e}")
+        return False
+    finally:
+        db_conn.disconnect_prod_db()
+
+
+if __name__ == "__main__":
+    archive_cold_months()
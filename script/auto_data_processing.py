@@ -32,6 +32,7 @@ sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../b
 try:
     from db.db_connection import DatabaseConnection
     from calculation.main_calculator import MainCalculator
+    from db import time_keys
 except ImportError as e:
     logging.error(f"导入backend模块失败: {e}")
     sys.exit(1)
@@ -122,7 +123,7 @@ def save_data_to_file(data: Dict[str, Any], output_dir: str, hour: int, day: int
         logger.error(traceback.format_exc())
 
 # API调用函数
-def call_api(api_url: str, endpoint: str, params: Dict[str, Any] = None, retries: int = 3):
+def call_api(api_url: str, endpoint: str, params: Dict[str, Any] = None, retries: int = 3, timeout: int = 30):
     """调用API接口，支持重试"""
     full_url = f"{api_url}{endpoint}"
     headers = {"Content-Type": "application/json"}
@@ -130,7 +131,7 @@ def call_api(api_url: str, endpoint: str, params: Dict[str, Any] = None, retries
     for i in range(retries):
         try:
             logger.info(f"API调用: {full_url}, 参数: {params}")
-            response = requests.get(full_url, params=params, headers=headers, timeout=30)
+            response = requests.get(full_url, params=params, headers=headers, timeout=timeout)
             response.raise_for_status()
             data = response.json()
             logger.info(f"API调用成功，返回状态: {data.get('status')}")
@@ -144,6 +145,41 @@ def call_api(api_url: str, endpoint: str, params: Dict[str, Any] = None, retries
     logger.warning(f"API调用失败，已达到最大重试次数 {retries}")
     return None
 
+# 按时间范围批量输出结果文件
+def export_performance_range(start_day: int, end_day: int):
+    """一次请求/performance/range获取第start_day天到第end_day天的性能数据，按小时拆分后写入结果文件
+
+    返回值: 是否获取成功
+    """
+    api_params = {
+        "heat_exchanger_id": 1,
+        "start_day": start_day,
+        "start_hour": 0,
+        "end_day": end_day,
+        "end_hour": 23
+    }
+    # 范围查询的数据量随天数增长，超时时间按天数放大
+    timeout = config.get("api_timeout", 30) * max(1, end_day - start_day + 1)
+    performance_data = call_api(config["api_url"], "/performance/range", api_params, timeout=timeout)
+    if not performance_data or performance_data.get("status") != "success":
+        return False
+    
+    # 按(天, 小时)分组，第1天为配置的基准日期
+    rows_by_hour = {}
+    for record in performance_data["data"]:
+        timestamp = datetime.datetime.fromisoformat(str(record["timestamp"]))
+        record_day = time_keys.timestamp_to_day(timestamp)
+        rows_by_hour.setdefault((record_day, timestamp.hour), []).append(record)
+    
+    for output_day in range(start_day, end_day + 1):
+        for output_hour in range(24):
+            hour_records = rows_by_hour.get((output_day, output_hour), [])
+            save_data_to_file(
+                {"status": "success", "count": len(hour_records), "data": hour_records},
+                output_dir, output_hour, output_day
+            )
+    return True
+
 # Stage1完成回调函数
 def on_stage1_complete(day):
     """Stage1训练完成后的回调函数，统一输出所有相关结果文件"""
@@ -151,25 +187,10 @@ def on_stage1_complete(day):
     
     logger.info(f"Stage1训练完成，开始输出第1天到第{day}天的所有结果文件")
     
-    # 遍历所有天数，输出文件
-    for output_day in range(1, day + 1):
-        for output_hour in range(24):
-            # 调用API获取性能数据
-            api_params = {
-                "heat_exchanger_id": 1,
-                "day": output_day,
-                "hour": output_hour
-            }
-            
-            performance_data = call_api(config["api_url"], "/performance", api_params)
-            
-            if performance_data and performance_data["status"] == "success":
-                logger.info(f"输出第{output_day}天第{output_hour}小时的结果文件")
-                save_data_to_file(performance_data, output_dir, output_hour, output_day)
-            else:
-                logger.warning(f"获取第{output_day}天第{output_hour}小时的数据失败，跳过")
-    
-    logger.info(f"Stage1训练完成，已输出第1天到第{day}天的所有结果文件")
+    if export_performance_range(1, day):
+        logger.info(f"Stage1训练完成，已输出第1天到第{day}天的所有结果文件")
+    else:
+        logger.warning(f"获取第1天到第{day}天的性能数据失败，未输出结果文件")
 
 # Stage2完成回调函数
 def on_stage2_complete(day):
@@ -178,24 +199,10 @@ def on_stage2_complete(day):
     
     logger.info(f"Stage2优化完成，开始输出第{day}天的所有结果文件")
     
-    # 输出当天的所有小时文件
-    for output_hour in range(24):
-        # 调用API获取性能数据
-        api_params = {
-            "heat_exchanger_id": 1,
-            "day": day,
-            "hour": output_hour
-        }
-        
-        performance_data = call_api(config["api_url"], "/performance", api_params)
-        
-        if performance_data and performance_data["status"] == "success":
-            logger.info(f"输出第{day}天第{output_hour}小时的结果文件（覆盖原有文件）")
-            save_data_to_file(performance_data, output_dir, output_hour, day)
-        else:
-            logger.warning(f"获取第{day}天第{output_hour}小时的数据失败，跳过")
-    
-    logger.info(f"Stage2优化完成，已输出第{day}天的所有结果文件")
+    if export_performance_range(day, day):
+        logger.info(f"Stage2优化完成，已输出第{day}天的所有结果文件")
+    else:
+        logger.warning(f"获取第{day}天的性能数据失败，未输出结果文件")
 
 # 误差超限重新训练完成回调函数
 def on_error_retrain_complete(start_day, end_day):
@@ -204,25 +211,10 @@ def on_error_retrain_complete(start_day, end_day):
     
     logger.info(f"误差超限重新训练完成，开始覆盖第{start_day}天到第{end_day}天的结果文件")
     
-    # 覆盖指定天数范围内的所有文件
-    for output_day in range(start_day, end_day + 1):
-        for output_hour in range(24):
-            # 调用API获取性能数据
-            api_params = {
-                "heat_exchanger_id": 1,
-                "day": output_day,
-                "hour": output_hour
-            }
-            
-            performance_data = call_api(config["api_url"], "/performance", api_params)
-            
-            if performance_data and performance_data["status"] == "success":
-                logger.info(f"覆盖第{output_day}天第{output_hour}小时的结果文件")
-                save_data_to_file(performance_data, output_dir, output_hour, output_day)
-            else:
-                logger.warning(f"获取第{output_day}天第{output_hour}小时的数据失败，跳过")
-    
-    logger.info(f"误差超限重新训练完成，已覆盖第{start_day}天到第{end_day}天的所有结果文件")
+    if export_performance_range(start_day, end_day):
+        logger.info(f"误差超限重新训练完成，已覆盖第{start_day}天到第{end_day}天的所有结果文件")
+    else:
+        logger.warning(f"获取第{start_day}天到第{end_day}天的性能数据失败，未覆盖结果文件")
 
 # 主处理函数
 def main_processing():
@@ -307,6 +299,12 @@ def main():
     config_path = os.path.join(backend_dir, 'config', 'config.json')
     calculator = MainCalculator(config_path)
     
+    # 计算器从持久化状态恢复时，从上次处理完成的下一个小时继续
+    resume_position = calculator.get_resume_position()
+    if resume_position:
+        current_day, current_hour = resume_position
+        logger.info(f"从上次处理位置继续: 第{current_day}天第{current_hour}小时")
+    
     # 设置回调函数
     calculator.set_stage1_complete_callback(on_stage1_complete)
     calculator.set_stage2_complete_callback(on_stage2_complete)
@@ -3,11 +3,13 @@
 
 import sys
 import os
+import json
 
 # 添加backend目录到Python路径
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../backend')))
 
 from db.db_connection import DatabaseConnection
+from db import time_keys
 
 def check_day_data(day):
     """检查指定天数的performance_parameters数据"""
@@ -19,11 +21,12 @@ def check_day_data(day):
         cursor = db.test_cursor
         
         # 查询测试数据库
-        start_time = f"2022-01-{day:02d} 00:00:00"
-        end_time = f"2022-01-{day:02d} 23:59:59"
+        with open(config_path, 'r', encoding='utf-8') as f:
+            time_keys.configure(json.load(f))
+        start_time, end_time = time_keys.day_bounds(day)
         
         db.execute_query(cursor, 
-            'SELECT COUNT(*) as count FROM performance_parameters WHERE timestamp BETWEEN %s AND %s', 
+            'SELECT COUNT(*) as count FROM performance_parameters WHERE timestamp >= %s AND timestamp < %s', 
             (start_time, end_time))
         test_result = db.fetch_all(cursor)
         test_count = test_result[0]['count']
@@ -33,7 +36,7 @@ def check_day_data(day):
         cursor = db.prod_cursor
         
         db.execute_query(cursor, 
-            'SELECT COUNT(*) as count FROM performance_parameters WHERE timestamp BETWEEN %s AND %s', 
+            'SELECT COUNT(*) as count FROM performance_parameters WHERE timestamp >= %s AND timestamp < %s', 
             (start_time, end_time))
         prod_result = db.fetch_all(cursor)
         prod_count = prod_result[0]['count']
@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+把MySQL中的数据复制到嵌入式（SQLite）数据库文件
+
+复制后把config.json中的storage_backend设为"sqlite"，MainCalculator即可不连接MySQL
+离线重放。默认复制测试库的全部表和生产库的换热器表（重放从空的生产库开始）。
+目标表中已有的数据会先清空。
+
+用法:
+    python script/export_embedded_db.py              # 测试库全部表 + 生产库heat_exchanger
+    python script/export_embedded_db.py --all-prod   # 测试库和生产库的全部表
+"""
+
+import sys
+import os
+import json
+
+# 添加backend目录到Python路径
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'backend')))
+
+from db.db_connection import DatabaseConnection
+from db.embedded_schema import EMBEDDED_TABLES
+from db.storage_backends import SQLiteBackend
+
+# 每批复制的行数
+CHUNK_SIZE = 5000
+
+
+def copy_table(source, target_db, table, kind):
+    """把MySQL中的一张表复制到SQLite，源表不存在时跳过
+
+    返回值: 复制的行数
+    """
+    target_cursor = target_db.cursor()
+    target_cursor.execute(f"PRAGMA table_info({table})")
+    target_columns = [row['name'] for row in target_cursor.fetchall()]
+    target_cursor.execute(f"DELETE FROM {table}")
+
+    count = 0
+    try:
+        for rows in source.stream_query(f"SELECT * FROM {table}", chunk_size=CHUNK_SIZE, kind=kind):
+            columns = [column for column in rows[0] if column in target_columns]
+            query = (f"INSERT INTO {table} ({', '.join(columns)}) "
+                     f"VALUES ({', '.join(['%s'] * len(columns))})")
+            target_cursor.executemany(query, [tuple(row[column] for column in columns) for row in rows])
+            count += len(rows)
+    except source.errors as e:
+        print(f"跳过{kind}库的{table}: {e}")
+    target_db.commit()
+    return count
+
+
+def export_embedded_db(all_prod=False):
+    config_path = os.path.join(os.path.dirname(__file__), '..', 'backend', 'config', 'config.json')
+    with open(config_path, 'r', encoding='utf-8') as f:
+        config = json.load(f)
+
+    # 源数据始终从MySQL读取，与配置中当前使用的后端无关
+    source = DatabaseConnection(dict(config, storage_backend="mysql"))
+    target = SQLiteBackend(config)
+
+    plan = {
+        'test': EMBEDDED_TABLES,
+        'prod': EMBEDDED_TABLES if all_prod else ("heat_exchanger",)
+    }
+    for kind, tables in plan.items():
+        target_db = target.connect(kind)
+        try:
+            for table in tables:
+                count = copy_table(source, target_db, table, kind)
+                print(f"{kind}库 {table}: 已复制{count}行 -> {target.path(kind)}")
+        finally:
+            target_db.close()
+
+
+if __name__ == "__main__":
+    export_embedded_db(all_prod="--all-prod" in sys.argv[1:])
@@ -0,0 +1,51 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+多换热器并行处理
+
+用ExchangerSupervisor在进程池中并行处理多个换热器在指定时间范围内的数据，
+每个换热器的阶段、模型参数和处理进度相互独立。
+
+用法:
+    python script/process_all_exchangers.py 1 30              # 处理全部换热器第1天到第30天的数据
+    python script/process_all_exchangers.py 1 30 --ids 1 2 3  # 只处理指定的换热器
+    python script/process_all_exchangers.py 1 30 --discard-no-k
+"""
+
+import sys
+import os
+import argparse
+
+# 添加backend目录到Python路径
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'backend')))
+
+from calculation.exchanger_supervisor import ExchangerSupervisor
+
+
+def process_all_exchangers(start_day, end_day, heat_exchanger_ids=None, discard_no_k=False):
+    """处理换热器在第start_day天0时到第end_day天23时的数据
+
+    参数:
+        start_day, end_day: 起止天数（包含两端）
+        heat_exchanger_ids: 要处理的换热器ID列表，为None时处理heat_exchanger表中的全部换热器
+        discard_no_k: 是否弃用没有K值的数据
+
+    返回值: 各换热器的处理进度
+    """
+    config_path = os.path.join(os.path.dirname(__file__), '..', 'backend', 'config', 'config.json')
+    supervisor = ExchangerSupervisor(config_path, heat_exchanger_ids=heat_exchanger_ids)
+    progress = supervisor.run(start_day, 0, end_day, 23, discard_no_k=discard_no_k)
+    for heat_exchanger_id, stats in progress.items():
+        print(f"换热器{heat_exchanger_id}: 成功{stats['succeeded']}/{stats['total']}小时，耗时{stats['elapsed']:.1f}秒")
+    return progress
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="多换热器并行处理")
+    parser.add_argument("start_day", type=int, help="起始天数")
+    parser.add_argument("end_day", type=int, help="结束天数（包含）")
+    parser.add_argument("--ids", type=int, nargs="+", help="要处理的换热器ID，默认处理全部换热器")
+    parser.add_argument("--discard-no-k", action="store_true", help="弃用没有K值的数据")
+    args = parser.parse_args()
+    process_all_exchangers(args.start_day, args.end_day, args.ids, args.discard_no_k)
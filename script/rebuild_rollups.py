@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+重建性能小时/日汇总表
+
+新建汇总表后对已有数据执行一次；之后汇总行随数据写入和重新预测自动更新。
+按天分批重算并提交，避免长事务。
+
+用法:
+    python script/rebuild_rollups.py                         # 重建全部数据
+    python script/rebuild_rollups.py 2022-01-01 2022-03-31   # 重建指定日期范围（包含两端）
+"""
+
+import sys
+import os
+import json
+from datetime import datetime, timedelta
+
+# 添加backend目录到Python路径
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'backend')))
+
+from db.db_connection import DatabaseConnection
+from db.rollups import rebuild_rollup_range
+
+
+def rebuild_rollups(start_date=None, end_date=None):
+    """按天重建汇总表
+
+    参数:
+        start_date, end_date: 日期字符串（YYYY-MM-DD），为None时使用performance_parameters中的最早/最晚日期
+    """
+    config_path = os.path.join(os.path.dirname(__file__), '..', 'backend', 'config', 'config.json')
+    with open(config_path, 'r', encoding='utf-8') as f:
+        config = json.load(f)
+    db_conn = DatabaseConnection(config)
+    if not db_conn.connect_prod_db():
+        print("连接生产数据库失败")
+        return False
+
+    try:
+        if start_date is None or end_date is None:
+            db_conn.execute_query(
+                db_conn.prod_cursor,
+                "SELECT MIN(timestamp) AS min_time, MAX(timestamp) AS max_time FROM performance_parameters"
+            )
+            result = db_conn.fetch_one(db_conn.prod_cursor)
+            if not result or result['min_time'] is None:
+                print("performance_parameters中没有数据")
+                return True
+            start_day = result['min_time'].date()
+            end_day = result['max_time'].date()
+        else:
+            start_day = datetime.strptime(start_date, "%Y-%m-%d").date()
+            end_day = datetime.strptime(end_date, "%Y-%m-%d").date()
+
+        day = start_day
+        while day <= end_day:
+            day_start = datetime(day.year, day.month, day.day)
+            rebuild_rollup_range(db_conn.prod_cursor, day_start, day_start + timedelta(hours=23, minutes=59, seconds=59))
+            db_conn.commit(db_conn.prod_db)
+            print(f"已重建 {day} 的汇总")
+            day += timedelta(days=1)
+        return True
+    except Exception as e:
+        print(f"重建汇总表失败: {e}")
+        db_conn.rollback(db_conn.prod_db)
+        return False
+    finally:
+        db_conn.disconnect_prod_db()
+
+
+if __name__ == "__main__":
+    if len(sys.argv) == 3:
+        rebuild_rollups(sys.argv[1], sys.argv[2])
+    else:
+        rebuild_rollups()
@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+测试LTTB降采样的桶划分和保留点
+
+用法:
+    python script/test_downsampling.py
+    python -m pytest script/test_downsampling.py
+"""
+
+import sys
+import os
+
+import numpy as np
+
+# 添加backend目录到Python路径
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'backend')))
+
+from calculation.downsampling import lttb_indices
+
+
+def test_keeps_all_points_below_threshold():
+    assert lttb_indices(np.arange(5), np.arange(5), 10).tolist() == [0, 1, 2, 3, 4]
+    assert lttb_indices(np.arange(5), np.arange(5), 2).tolist() == [0, 1, 2, 3, 4]
+
+
+def test_every_point_can_be_selected():
+    # 每个中间点依次作为唯一的尖峰，必须能被选中（包括倒数第二个点n-2）
+    for n in range(4, 100):
+        for threshold in range(3, n):
+            spike = n - 2
+            y = np.zeros(n)
+            y[spike] = 1.0
+            indices = lttb_indices(np.arange(n), y, threshold)
+            assert len(indices) == threshold
+            assert indices[0] == 0 and indices[-1] == n - 1
+            assert np.all(np.diff(indices) > 0)
+            assert spike in indices, (n, threshold)
+
+
+def test_keeps_peak_of_each_bucket():
+    x = np.arange(1000, dtype=float)
+    y = np.zeros(1000)
+    y[[123, 500, 876]] = [5.0, -3.0, 2.0]
+    indices = lttb_indices(x, y, 50)
+    assert len(indices) == 50
+    assert {123, 500, 876} <= set(indices.tolist())
+
+
+if __name__ == "__main__":
+    test_keeps_all_points_below_threshold()
+    test_every_point_can_be_selected()
+    test_keeps_peak_of_each_bucket()
+    print("LTTB降采样测试通过")
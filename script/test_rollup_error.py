@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+测试日汇总表误差与k_management原始数据误差的一致性
+
+使用嵌入式（SQLite）存储后端，不需要MySQL。按MainCalculator.process_data_by_hour的顺序
+写入一天的数据：每小时先写入k_management（步骤2-4），再写入性能参数（步骤8），第23小时的
+误差检查（步骤7）发生在第23小时的性能参数写入之前，此时日汇总表中的误差须已包含第23小时。
+
+用法:
+    python script/test_rollup_error.py
+    python -m pytest script/test_rollup_error.py
+"""
+
+import sys
+import os
+import shutil
+import tempfile
+
+# 添加backend目录到Python路径
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'backend')))
+
+from db.db_connection import DatabaseConnection
+from db.data_loader import DataLoader
+from db import time_keys
+
+DAY = 21
+POINTS = (1, 2, 3)
+
+
+def k_record(hour, points, K_predicted):
+    return {
+        'heat_exchanger_id': 1,
+        'timestamp': time_keys.hour_start(DAY, hour),
+        'points': points,
+        'side': 'tube',
+        'K_LMTD': 300.0,
+        'K_predicted': K_predicted,
+        'K_actual': 300.0 + points
+    }
+
+
+def performance_record(hour, points):
+    return {
+        'heat_exchanger_id': 1,
+        'timestamp': time_keys.hour_start(DAY, hour),
+        'points': points,
+        'side': 'tube',
+        'K': 300.0,
+        'heat_duty': 1000.0,
+        'lmtd': 10.0
+    }
+
+
+def raw_error(loader):
+    """直接从k_management计算当天的平均误差"""
+    return loader.calculate_average_error(DAY, hours=(0, 23))
+
+
+def open_loader(directory):
+    time_keys.configure({})
+    db_conn = DatabaseConnection({
+        'storage_backend': 'sqlite',
+        'embedded_db': {
+            'test': os.path.join(directory, 'test.sqlite3'),
+            'prod': os.path.join(directory, 'prod.sqlite3')
+        }
+    })
+    assert db_conn.connect_prod_db()
+    return db_conn, DataLoader(db_conn, 1)
+
+
+def process_hour(loader, hour):
+    # 第23小时的K_predicted偏差更大，使缺少该小时的汇总误差与原始误差明显不同
+    offset = 30.0 if hour == 23 else 5.0
+    assert loader.insert_k_management([k_record(hour, points, 300.0 + points + offset) for points in POINTS])
+
+
+def test_error_at_hour_23_matches_raw():
+    directory = tempfile.mkdtemp()
+    db_conn, loader = open_loader(directory)
+    try:
+        for hour in range(24):
+            process_hour(loader, hour)
+            if hour == 23:
+                # 步骤7：第23小时的性能参数尚未写入，日汇总表中的误差已包含该小时
+                expected = raw_error(loader)
+                rollup = loader.get_daily_rollup_error(DAY)
+                assert rollup is not None and abs(rollup - expected) < 1e-9
+                assert abs(loader.calculate_average_error(DAY) - expected) < 1e-9
+            # 步骤8：写入性能参数，不覆盖汇总行中的误差
+            assert loader.insert_performance_parameters([performance_record(hour, points) for points in POINTS])
+
+        expected = raw_error(loader)
+        assert abs(loader.get_daily_rollup_error(DAY) - expected) < 1e-9
+
+        # 只更新k_management的K_predicted时汇总表同步重算
+        assert loader.update_k_management_with_predicted([k_record(23, points, 300.0 + points) for points in POINTS])
+        expected = raw_error(loader)
+        assert abs(loader.get_daily_rollup_error(DAY) - expected) < 1e-9
+
+        # 性能指标按性能参数记录数汇总
+        db_conn.prod_cursor.execute(
+            "SELECT SUM(sample_count) AS samples, SUM(error_count) AS errors FROM performance_rollup_daily"
+        )
+        counts = db_conn.prod_cursor.fetchone()
+        assert counts['samples'] == 24 * len(POINTS) and counts['errors'] == 24 * len(POINTS)
+    finally:
+        db_conn.disconnect_prod_db()
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    test_error_at_hour_23_matches_raw()
+    print("汇总表误差与原始数据误差一致")